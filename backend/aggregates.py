@@ -0,0 +1,88 @@
+import os
+
+AGGREGATES_PATH = os.path.join(os.path.dirname(__file__), 'aggregates.sql')
+
+# How each summary table is computed from scratch, as (columns, query). The
+# triggers in aggregates.sql keep the tables equal to these queries.
+AGGREGATE_QUERIES = {
+    'table_row_counts': (
+        ('table_name', 'row_count'),
+        "SELECT 'departments', COUNT(*) FROM departments "
+        "UNION ALL SELECT 'students', COUNT(*) FROM students "
+        "UNION ALL SELECT 'faculty', COUNT(*) FROM faculty "
+        "UNION ALL SELECT 'courses', COUNT(*) FROM courses "
+        "UNION ALL SELECT 'enrollments', COUNT(*) FROM enrollments"
+    ),
+    'department_student_counts': (
+        ('department_id', 'students'),
+        'SELECT department_id, COUNT(*) FROM students '
+        'WHERE department_id IS NOT NULL GROUP BY department_id'
+    ),
+    'enrollment_year_student_counts': (
+        ('enrollment_year', 'students'),
+        'SELECT enrollment_year, COUNT(*) FROM students '
+        'WHERE enrollment_year IS NOT NULL GROUP BY enrollment_year'
+    ),
+    'course_enrollment_counts': (
+        ('course_code', 'enrollments'),
+        'SELECT course_code, COUNT(*) FROM enrollments GROUP BY course_code'
+    ),
+    'course_grade_counts': (
+        ('course_code', 'grade', 'enrollments'),
+        "SELECT course_code, grade, COUNT(*) FROM enrollments "
+        "WHERE grade IS NOT NULL AND grade != '' GROUP BY course_code, grade"
+    ),
+    'yearly_enrollment_counts': (
+        ('year', 'enrollments'),
+        "SELECT CAST(strftime('%Y', enrolled_at) AS INTEGER), COUNT(*) FROM enrollments "
+        "WHERE enrolled_at IS NOT NULL GROUP BY 1"
+    ),
+    'department_grade_points': (
+        ('department_id', 'enrollments', 'graded', 'points'),
+        'SELECT s.department_id, COUNT(*), COUNT(g.points), COALESCE(SUM(g.points), 0) '
+        'FROM enrollments e JOIN students s ON s.id = e.student_id '
+        'LEFT JOIN grade_points g ON g.grade = e.grade '
+        'WHERE s.department_id IS NOT NULL GROUP BY s.department_id'
+    ),
+}
+
+def rebuild_statements(tables=None):
+    """Return the statements that recompute ``tables``, by default every summary table."""
+    statements = []
+    for table, (columns, query) in AGGREGATE_QUERIES.items():
+        if tables is not None and table not in tables:
+            continue
+        statements.append(f'DELETE FROM {table}')
+        statements.append(f'INSERT INTO {table} ({", ".join(columns)}) {query}')
+    return statements
+
+def rebuild_aggregates(conn):
+    """Recompute every summary table in one transaction."""
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        for statement in rebuild_statements():
+            conn.execute(statement)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+def check_aggregates(conn):
+    """Compare each summary table against a full recomputation.
+
+    Returns a dict mapping each inconsistent table to its ``missing`` rows
+    (expected but absent or different) and ``unexpected`` rows (stored but
+    not expected). An empty dict means every aggregate is consistent.
+    """
+    problems = {}
+    for table, (columns, query) in AGGREGATE_QUERIES.items():
+        stored = f'SELECT {", ".join(columns)} FROM {table}'
+        expected = f'SELECT * FROM ({query})'
+        missing = conn.execute(f'{expected} EXCEPT {stored}').fetchall()
+        unexpected = conn.execute(f'{stored} EXCEPT {expected}').fetchall()
+        if missing or unexpected:
+            problems[table] = {
+                'missing': [tuple(row) for row in missing],
+                'unexpected': [tuple(row) for row in unexpected],
+            }
+    return problems
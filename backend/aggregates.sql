@@ -0,0 +1,246 @@
+-- Summary tables for the analytics dashboard, kept current by triggers so
+-- that dashboard reads cost O(number of groups) rather than O(rows).
+-- Every statement is idempotent; see MIGRATIONS in db.py.
+
+CREATE TABLE IF NOT EXISTS table_row_counts (
+    table_name TEXT PRIMARY KEY,
+    row_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS department_student_counts (
+    department_id INTEGER PRIMARY KEY,
+    students INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS enrollment_year_student_counts (
+    enrollment_year INTEGER PRIMARY KEY,
+    students INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS course_enrollment_counts (
+    course_code TEXT PRIMARY KEY,
+    enrollments INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS course_grade_counts (
+    course_code TEXT NOT NULL,
+    grade TEXT NOT NULL,
+    enrollments INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (course_code, grade)
+);
+
+CREATE TABLE IF NOT EXISTS yearly_enrollment_counts (
+    year INTEGER PRIMARY KEY,
+    enrollments INTEGER NOT NULL DEFAULT 0
+);
+
+-- Grade points on a 4.0 scale, in tenths so sums stay exact; grades not
+-- listed are ignored in GPA averages.
+CREATE TABLE IF NOT EXISTS grade_points (
+    grade TEXT PRIMARY KEY,
+    points INTEGER NOT NULL
+);
+
+INSERT OR IGNORE INTO grade_points (grade, points) VALUES
+    ('A+', 40), ('A', 40), ('A-', 37),
+    ('B+', 33), ('B', 30), ('B-', 27),
+    ('C+', 23), ('C', 20), ('C-', 17),
+    ('D+', 13), ('D', 10), ('D-', 7),
+    ('F', 0);
+
+-- Enrollments of each department's students, by the student's current department
+CREATE TABLE IF NOT EXISTS department_grade_points (
+    department_id INTEGER PRIMARY KEY,
+    enrollments INTEGER NOT NULL DEFAULT 0,
+    graded INTEGER NOT NULL DEFAULT 0,
+    points INTEGER NOT NULL DEFAULT 0
+);
+
+-- Row counts for the tables without other aggregates
+CREATE TRIGGER IF NOT EXISTS aggregates_departments_insert AFTER INSERT ON departments
+BEGIN
+    INSERT INTO table_row_counts (table_name, row_count) VALUES ('departments', 1)
+        ON CONFLICT(table_name) DO UPDATE SET row_count = row_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_departments_delete AFTER DELETE ON departments
+BEGIN
+    UPDATE table_row_counts SET row_count = row_count - 1 WHERE table_name = 'departments';
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_faculty_insert AFTER INSERT ON faculty
+BEGIN
+    INSERT INTO table_row_counts (table_name, row_count) VALUES ('faculty', 1)
+        ON CONFLICT(table_name) DO UPDATE SET row_count = row_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_faculty_delete AFTER DELETE ON faculty
+BEGIN
+    UPDATE table_row_counts SET row_count = row_count - 1 WHERE table_name = 'faculty';
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_courses_insert AFTER INSERT ON courses
+BEGIN
+    INSERT INTO table_row_counts (table_name, row_count) VALUES ('courses', 1)
+        ON CONFLICT(table_name) DO UPDATE SET row_count = row_count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_courses_delete AFTER DELETE ON courses
+BEGIN
+    UPDATE table_row_counts SET row_count = row_count - 1 WHERE table_name = 'courses';
+END;
+
+-- Students: row count, students per department and per enrollment year
+CREATE TRIGGER IF NOT EXISTS aggregates_students_insert AFTER INSERT ON students
+BEGIN
+    INSERT INTO table_row_counts (table_name, row_count) VALUES ('students', 1)
+        ON CONFLICT(table_name) DO UPDATE SET row_count = row_count + 1;
+    INSERT INTO department_student_counts (department_id, students)
+        SELECT NEW.department_id, 1 WHERE NEW.department_id IS NOT NULL
+        ON CONFLICT(department_id) DO UPDATE SET students = students + 1;
+    INSERT INTO enrollment_year_student_counts (enrollment_year, students)
+        SELECT NEW.enrollment_year, 1 WHERE NEW.enrollment_year IS NOT NULL
+        ON CONFLICT(enrollment_year) DO UPDATE SET students = students + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_students_delete AFTER DELETE ON students
+BEGIN
+    UPDATE table_row_counts SET row_count = row_count - 1 WHERE table_name = 'students';
+    UPDATE department_student_counts SET students = students - 1 WHERE department_id = OLD.department_id;
+    DELETE FROM department_student_counts WHERE department_id = OLD.department_id AND students <= 0;
+    UPDATE enrollment_year_student_counts SET students = students - 1 WHERE enrollment_year = OLD.enrollment_year;
+    DELETE FROM enrollment_year_student_counts WHERE enrollment_year = OLD.enrollment_year AND students <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_students_update AFTER UPDATE OF department_id, enrollment_year ON students
+BEGIN
+    UPDATE department_student_counts SET students = students - 1 WHERE department_id = OLD.department_id;
+    DELETE FROM department_student_counts WHERE department_id = OLD.department_id AND students <= 0;
+    INSERT INTO department_student_counts (department_id, students)
+        SELECT NEW.department_id, 1 WHERE NEW.department_id IS NOT NULL
+        ON CONFLICT(department_id) DO UPDATE SET students = students + 1;
+    UPDATE enrollment_year_student_counts SET students = students - 1 WHERE enrollment_year = OLD.enrollment_year;
+    DELETE FROM enrollment_year_student_counts WHERE enrollment_year = OLD.enrollment_year AND students <= 0;
+    INSERT INTO enrollment_year_student_counts (enrollment_year, students)
+        SELECT NEW.enrollment_year, 1 WHERE NEW.enrollment_year IS NOT NULL
+        ON CONFLICT(enrollment_year) DO UPDATE SET students = students + 1;
+END;
+
+-- Enrollments: row count, enrollments and grades per course, enrollments per year
+CREATE TRIGGER IF NOT EXISTS aggregates_enrollments_insert AFTER INSERT ON enrollments
+BEGIN
+    INSERT INTO table_row_counts (table_name, row_count) VALUES ('enrollments', 1)
+        ON CONFLICT(table_name) DO UPDATE SET row_count = row_count + 1;
+    INSERT INTO course_enrollment_counts (course_code, enrollments) VALUES (NEW.course_code, 1)
+        ON CONFLICT(course_code) DO UPDATE SET enrollments = enrollments + 1;
+    INSERT INTO course_grade_counts (course_code, grade, enrollments)
+        SELECT NEW.course_code, NEW.grade, 1 WHERE NEW.grade IS NOT NULL AND NEW.grade != ''
+        ON CONFLICT(course_code, grade) DO UPDATE SET enrollments = enrollments + 1;
+    INSERT INTO yearly_enrollment_counts (year, enrollments)
+        SELECT CAST(strftime('%Y', NEW.enrolled_at) AS INTEGER), 1 WHERE NEW.enrolled_at IS NOT NULL
+        ON CONFLICT(year) DO UPDATE SET enrollments = enrollments + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_enrollments_delete AFTER DELETE ON enrollments
+BEGIN
+    UPDATE table_row_counts SET row_count = row_count - 1 WHERE table_name = 'enrollments';
+    UPDATE course_enrollment_counts SET enrollments = enrollments - 1 WHERE course_code = OLD.course_code;
+    DELETE FROM course_enrollment_counts WHERE course_code = OLD.course_code AND enrollments <= 0;
+    UPDATE course_grade_counts SET enrollments = enrollments - 1 WHERE course_code = OLD.course_code AND grade = OLD.grade;
+    DELETE FROM course_grade_counts WHERE course_code = OLD.course_code AND grade = OLD.grade AND enrollments <= 0;
+    UPDATE yearly_enrollment_counts SET enrollments = enrollments - 1
+        WHERE year = CAST(strftime('%Y', OLD.enrolled_at) AS INTEGER);
+    DELETE FROM yearly_enrollment_counts
+        WHERE year = CAST(strftime('%Y', OLD.enrolled_at) AS INTEGER) AND enrollments <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_enrollments_update AFTER UPDATE OF course_code, grade, enrolled_at ON enrollments
+BEGIN
+    UPDATE course_enrollment_counts SET enrollments = enrollments - 1 WHERE course_code = OLD.course_code;
+    DELETE FROM course_enrollment_counts WHERE course_code = OLD.course_code AND enrollments <= 0;
+    INSERT INTO course_enrollment_counts (course_code, enrollments) VALUES (NEW.course_code, 1)
+        ON CONFLICT(course_code) DO UPDATE SET enrollments = enrollments + 1;
+    UPDATE course_grade_counts SET enrollments = enrollments - 1 WHERE course_code = OLD.course_code AND grade = OLD.grade;
+    DELETE FROM course_grade_counts WHERE course_code = OLD.course_code AND grade = OLD.grade AND enrollments <= 0;
+    INSERT INTO course_grade_counts (course_code, grade, enrollments)
+        SELECT NEW.course_code, NEW.grade, 1 WHERE NEW.grade IS NOT NULL AND NEW.grade != ''
+        ON CONFLICT(course_code, grade) DO UPDATE SET enrollments = enrollments + 1;
+    UPDATE yearly_enrollment_counts SET enrollments = enrollments - 1
+        WHERE year = CAST(strftime('%Y', OLD.enrolled_at) AS INTEGER);
+    DELETE FROM yearly_enrollment_counts
+        WHERE year = CAST(strftime('%Y', OLD.enrolled_at) AS INTEGER) AND enrollments <= 0;
+    INSERT INTO yearly_enrollment_counts (year, enrollments)
+        SELECT CAST(strftime('%Y', NEW.enrolled_at) AS INTEGER), 1 WHERE NEW.enrolled_at IS NOT NULL
+        ON CONFLICT(year) DO UPDATE SET enrollments = enrollments + 1;
+END;
+
+-- Grade points per department: enrollments follow their student's department
+CREATE TRIGGER IF NOT EXISTS aggregates_enrollments_insert_grade_points AFTER INSERT ON enrollments
+BEGIN
+    INSERT INTO department_grade_points (department_id, enrollments, graded, points)
+        SELECT s.department_id, 1, g.points IS NOT NULL, COALESCE(g.points, 0)
+        FROM students s LEFT JOIN grade_points g ON g.grade = NEW.grade
+        WHERE s.id = NEW.student_id AND s.department_id IS NOT NULL
+        ON CONFLICT(department_id) DO UPDATE SET enrollments = enrollments + 1,
+            graded = graded + excluded.graded, points = points + excluded.points;
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_enrollments_delete_grade_points AFTER DELETE ON enrollments
+BEGIN
+    UPDATE department_grade_points SET enrollments = enrollments - 1,
+            graded = graded - (SELECT COUNT(*) FROM grade_points WHERE grade = OLD.grade),
+            points = points - COALESCE((SELECT points FROM grade_points WHERE grade = OLD.grade), 0)
+        WHERE department_id = (SELECT department_id FROM students WHERE id = OLD.student_id);
+    DELETE FROM department_grade_points
+        WHERE department_id = (SELECT department_id FROM students WHERE id = OLD.student_id) AND enrollments <= 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS aggregates_enrollments_update_grade_points AFTER UPDATE OF student_id, grade ON enrollments
+BEGIN
+    UPDATE department_grade_points SET enrollments = enrollments - 1,
+            graded = graded - (SELECT COUNT(*) FROM grade_points WHERE grade = OLD.grade),
+            points = points - COALESCE((SELECT points FROM grade_points WHERE grade = OLD.grade), 0)
+        WHERE department_id = (SELECT department_id FROM students WHERE id = OLD.student_id);
+    DELETE FROM department_grade_points
+        WHERE department_id = (SELECT department_id FROM students WHERE id = OLD.student_id) AND enrollments <= 0;
+    INSERT INTO department_grade_points (department_id, enrollments, graded, points)
+        SELECT s.department_id, 1, g.points IS NOT NULL, COALESCE(g.points, 0)
+        FROM students s LEFT JOIN grade_points g ON g.grade = NEW.grade
+        WHERE s.id = NEW.student_id AND s.department_id IS NOT NULL
+        ON CONFLICT(department_id) DO UPDATE SET enrollments = enrollments + 1,
+            graded = graded + excluded.graded, points = points + excluded.points;
+END;
+
+-- A student changing department takes their enrollments along
+CREATE TRIGGER IF NOT EXISTS aggregates_students_update_grade_points AFTER UPDATE OF department_id ON students
+WHEN OLD.department_id IS NOT NEW.department_id
+BEGIN
+    UPDATE department_grade_points SET enrollments = enrollments - t.student_enrollments,
+            graded = graded - t.student_graded, points = points - t.student_points
+        FROM (SELECT COUNT(*) AS student_enrollments, COUNT(g.points) AS student_graded,
+                     COALESCE(SUM(g.points), 0) AS student_points
+              FROM enrollments e LEFT JOIN grade_points g ON g.grade = e.grade
+              WHERE e.student_id = NEW.id) AS t
+        WHERE department_id = OLD.department_id;
+    DELETE FROM department_grade_points WHERE department_id = OLD.department_id AND enrollments <= 0;
+    INSERT INTO department_grade_points (department_id, enrollments, graded, points)
+        SELECT NEW.department_id, COUNT(*), COUNT(g.points), COALESCE(SUM(g.points), 0)
+        FROM enrollments e LEFT JOIN grade_points g ON g.grade = e.grade
+        WHERE e.student_id = NEW.id AND NEW.department_id IS NOT NULL
+        HAVING COUNT(*) > 0
+        ON CONFLICT(department_id) DO UPDATE SET enrollments = enrollments + excluded.enrollments,
+            graded = graded + excluded.graded, points = points + excluded.points;
+END;
+
+-- Enrollments left behind by a deleted student no longer count
+CREATE TRIGGER IF NOT EXISTS aggregates_students_delete_grade_points AFTER DELETE ON students
+BEGIN
+    UPDATE department_grade_points SET enrollments = enrollments - t.student_enrollments,
+            graded = graded - t.student_graded, points = points - t.student_points
+        FROM (SELECT COUNT(*) AS student_enrollments, COUNT(g.points) AS student_graded,
+                     COALESCE(SUM(g.points), 0) AS student_points
+              FROM enrollments e LEFT JOIN grade_points g ON g.grade = e.grade
+              WHERE e.student_id = OLD.id) AS t
+        WHERE department_id = OLD.department_id;
+    DELETE FROM department_grade_points WHERE department_id = OLD.department_id AND enrollments <= 0;
+END;
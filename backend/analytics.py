@@ -0,0 +1,107 @@
+from flask import Blueprint, request
+from backend.cache import ALL_TABLES, cached
+from backend.db import get_db_connection, with_query_logs
+from backend.utils import format_records, to_camel_case
+
+bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+DEFAULT_TOP_COURSES = 5
+
+def totals(conn):
+    counts = dict(conn.execute('SELECT table_name, row_count FROM table_row_counts').fetchall())
+    return {table: counts.get(table, 0) for table in ('students', 'departments', 'courses', 'enrollments')}
+
+def students_by_department(conn):
+    return format_records(conn.execute(
+        'SELECT d.id AS department_id, d.name, COALESCE(c.students, 0) AS students '
+        'FROM departments d LEFT JOIN department_student_counts c ON c.department_id = d.id '
+        'ORDER BY d.name'
+    ).fetchall())
+
+def students_by_enrollment_year(conn):
+    return format_records(conn.execute(
+        'SELECT enrollment_year AS year, students AS count FROM enrollment_year_student_counts '
+        'ORDER BY enrollment_year'
+    ).fetchall())
+
+def top_courses(conn):
+    limit = request.args.get('top', DEFAULT_TOP_COURSES, type=int)
+    return format_records(conn.execute(
+        'SELECT code, course, enrollments, rank FROM ('
+        '  SELECT e.course_code AS code, COALESCE(c.name, e.course_code) AS course, e.enrollments,'
+        '         RANK() OVER (ORDER BY e.enrollments DESC) AS rank'
+        '  FROM course_enrollment_counts e'
+        '  LEFT JOIN courses c ON c.code = e.course_code'
+        ') ORDER BY rank, code LIMIT ?',
+        (limit,)
+    ).fetchall())
+
+def enrollments_by_course(conn):
+    return format_records(conn.execute(
+        'SELECT course_code, enrollments FROM course_enrollment_counts ORDER BY course_code'
+    ).fetchall())
+
+def enrollments_by_department(conn):
+    return format_records(conn.execute(
+        'SELECT d.id AS department_id, d.name, COALESCE(SUM(e.enrollments), 0) AS enrollments '
+        'FROM departments d '
+        'LEFT JOIN courses c ON c.department_id = d.id '
+        'LEFT JOIN course_enrollment_counts e ON e.course_code = c.code '
+        'GROUP BY d.id ORDER BY d.name'
+    ).fetchall())
+
+def grade_distribution(conn):
+    return format_records(conn.execute(
+        'SELECT grade, SUM(enrollments) AS count FROM course_grade_counts '
+        'GROUP BY grade ORDER BY grade'
+    ).fetchall())
+
+def gpa_by_department(conn):
+    # Grade points are summed in tenths (see grade_points in aggregates.sql).
+    return format_records(conn.execute(
+        'SELECT d.id AS department_id, d.name, '
+        'ROUND(p.points / 10.0 / NULLIF(p.graded, 0), 2) AS gpa, p.graded '
+        'FROM departments d JOIN department_grade_points p ON p.department_id = d.id '
+        'ORDER BY d.name'
+    ).fetchall())
+
+def enrollment_trend(conn):
+    return format_records(conn.execute(
+        'SELECT year, enrollments, SUM(enrollments) OVER (ORDER BY year) AS cumulative '
+        'FROM yearly_enrollment_counts ORDER BY year'
+    ).fetchall())
+
+REPORTS = {
+    'totals': totals,
+    'students-by-department': students_by_department,
+    'students-by-enrollment-year': students_by_enrollment_year,
+    'top-courses': top_courses,
+    'enrollments-by-course': enrollments_by_course,
+    'enrollments-by-department': enrollments_by_department,
+    'grade-distribution': grade_distribution,
+    'gpa-by-department': gpa_by_department,
+    'enrollment-trend': enrollment_trend,
+}
+
+@bp.route('/', methods=['GET'])
+@cached(*ALL_TABLES)
+def get_dashboard():
+    """Get every dashboard aggregate in one response."""
+    conn = get_db_connection()
+    try:
+        return with_query_logs({to_camel_case(name.replace('-', '_')): report(conn) for name, report in REPORTS.items()})
+    except Exception as e:
+        return with_query_logs({'error': str(e)}, 500)
+
+@bp.route('/<name>', methods=['GET'])
+@cached(*ALL_TABLES)
+def get_report(name):
+    """Get a single dashboard aggregate."""
+    report = REPORTS.get(name)
+    if report is None:
+        return with_query_logs({'error': 'Report not found'}, 404)
+    conn = get_db_connection()
+    try:
+        return with_query_logs(report(conn))
+    except Exception as e:
+        return with_query_logs({'error': str(e)}, 500)
@@ -1,14 +1,16 @@
 from flask import Flask
 from flask_cors import CORS
 import os
-from backend import db
+from backend import cache, db, encoding, replica
+from backend.utils import FastJSONProvider
 
 def create_app():
     """Create and configure the Flask application."""
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
 
     # Enable CORS for all routes
-    CORS(app, resources={r"/api/*": {"origins": "*"}})
+    CORS(app, resources={r"/api/*": {"origins": "*", "expose_headers": ["X-Next-Cursor", "ETag", "X-Cache", "X-Replica-Age", "X-Replica-Seq"]}})
 
     # Set the secret key
     app.config['SECRET_KEY'] = os.environ.get('FLASK_SECRET_KEY', 'your_secret_key')
@@ -16,20 +18,50 @@ def create_app():
     # Set the database path
     app.config['DATABASE'] = os.path.join(os.path.dirname(__file__), 'database.db')
 
-    # Initialize the database
+    # Query instrumentation: fraction of statements timed, and whether every
+    # response carries its query logs (otherwise clients send X-Query-Logs: 1)
+    app.config['QUERY_SAMPLE_RATE'] = float(os.environ.get('QUERY_SAMPLE_RATE', 1.0))
+    app.config['QUERY_LOGS'] = os.environ.get('QUERY_LOGS') == '1'
+    app.config['SLOW_QUERY_MS'] = float(os.environ.get('SLOW_QUERY_MS', 100))
+
+    # Shared read cache for GET endpoints; READ_CACHE_PATH shares it across workers
+    app.config['READ_CACHE_PATH'] = os.environ.get('READ_CACHE_PATH')
+
+    # Opt-in group commit: concurrent single-row writes share one transaction
+    app.config['GROUP_COMMIT'] = os.environ.get('GROUP_COMMIT') == '1'
+    app.config['GROUP_COMMIT_WINDOW_MS'] = float(os.environ.get('GROUP_COMMIT_WINDOW_MS', 2))
+
+    # Read replicas: GET requests read the snapshot published in REPLICA_DIR
+    # while it lags by at most REPLICA_MAX_STALENESS seconds. With
+    # REPLICA_PUBLISH=1 the workers also publish them (one at a time).
+    app.config['REPLICA_DIR'] = os.environ.get('REPLICA_DIR')
+    app.config['REPLICA_PUBLISH'] = os.environ.get('REPLICA_PUBLISH') == '1'
+    app.config['REPLICA_PUBLISH_INTERVAL'] = float(os.environ.get('REPLICA_PUBLISH_INTERVAL', 1))
+    app.config['REPLICA_MAX_STALENESS'] = float(os.environ.get('REPLICA_MAX_STALENESS', 5))
+
+    # Initialize the database, read replicas, the read cache and response compression
     db.init_app(app)
+    replica.init_app(app)
+    cache.init_app(app)
+    encoding.init_app(app)
 
     @app.route('/')
     def index():
         return "Backend server is running!"
 
     # Import and register blueprints
-    from backend import students, departments, faculty, courses, enrollments
+    from backend import students, departments, faculty, courses, enrollments, analytics, metrics, debug, search, changes, query
     app.register_blueprint(students.bp)
     app.register_blueprint(departments.bp)
     app.register_blueprint(faculty.bp)
     app.register_blueprint(courses.bp)
     app.register_blueprint(enrollments.bp)
+    app.register_blueprint(analytics.bp)
+    app.register_blueprint(metrics.bp)
+    app.register_blueprint(debug.bp)
+    app.register_blueprint(search.bp)
+    app.register_blueprint(changes.bp)
+    app.register_blueprint(query.bp)
 
     return app
 
@@ -0,0 +1,192 @@
+import asyncio
+import contextvars
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from backend import db
+from backend.app import create_app
+
+# Threads running read requests. Open streams keep their connection between
+# chunks while their thread serves others, so the default leaves room in the
+# pool for STREAM_MAX_OPEN streams and the writer: no request waits for a
+# connection held by a slow client.
+READ_WORKERS = int(os.environ.get('ASGI_READ_WORKERS', max(1, db.POOL_MAX_SIZE - db.STREAM_MAX_OPEN - 1)))
+# Methods that write. They all run on one thread, in arrival order, so this
+# process never has two write transactions competing for SQLite's lock.
+WRITE_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+# Paths taking a POST body that only read, which run on the read executor.
+READ_ONLY_PATHS = ('/api/query',)
+# Threads for server-sent event streams, which block between events and so
+# are kept off the read executor.
+EVENT_STREAM_WORKERS = int(os.environ.get('ASGI_EVENT_STREAM_WORKERS', 256))
+
+_DONE = object()
+
+
+def build_environ(scope, body):
+    """Builds a WSGI environ for an ASGI HTTP scope and its buffered body."""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    # PATH_INFO is the decoded path as latin-1 bytes (PEP 3333); the raw,
+    # still percent-encoded form is only passed on as REQUEST_URI.
+    path = scope['path']
+    root_path = scope.get('root_path', '')
+    if path.startswith(root_path):
+        path = path[len(root_path):]
+    query_string = scope.get('query_string', b'')
+    raw_path = scope.get('raw_path') or scope['path'].encode('utf-8')
+    if query_string:
+        raw_path += b'?' + query_string
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': query_string.decode('latin-1'),
+        'REQUEST_URI': raw_path.decode('latin-1'),
+        'RAW_URI': raw_path.decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope.get("http_version", "1.1")}',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class ASGIApp:
+    """Serves a WSGI app over ASGI with SQLite work kept off the event loop.
+
+    The event loop only reads request bodies and writes responses, so slow
+    clients cost a coroutine rather than a thread. The WSGI app, and each
+    step of its response iterator, runs on a bounded read executor or, for
+    WRITE_METHODS, on a single writer thread that serializes every write.
+    Streamed responses hand the thread back between chunks; server-sent
+    event streams, which block waiting for events, use their own threads.
+    """
+
+    def __init__(self, wsgi_app, read_workers=READ_WORKERS, event_stream_workers=EVENT_STREAM_WORKERS):
+        self.wsgi_app = wsgi_app
+        self.read_executor = ThreadPoolExecutor(read_workers, thread_name_prefix='sqlite-read')
+        self.write_executor = ThreadPoolExecutor(1, thread_name_prefix='sqlite-write')
+        self.event_stream_executor = ThreadPoolExecutor(event_stream_workers, thread_name_prefix='event-stream')
+
+    def executor_for(self, method, path=''):
+        if method in WRITE_METHODS and not path.startswith(READ_ONLY_PATHS):
+            return self.write_executor
+        return self.read_executor
+
+    def shutdown(self):
+        self.read_executor.shutdown(wait=True)
+        self.write_executor.shutdown(wait=True)
+        # Open event streams never finish on their own.
+        self.event_stream_executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f'Unsupported ASGI scope type: {scope["type"]}')
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await asyncio.get_running_loop().run_in_executor(None, self.shutdown)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, receive):
+        chunks = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+            chunks.append(message.get('body', b''))
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def _disconnected(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def _http(self, scope, receive, send):
+        body = await self._read_body(receive)
+        if body is None:
+            return
+        loop = asyncio.get_running_loop()
+        executor = self.executor_for(scope['method'], scope['path'])
+        # Flask keeps its request context in context variables, and a streamed
+        # response is resumed on whichever thread is free, so every step runs
+        # in the same copied context.
+        context = contextvars.copy_context()
+        # Watched while the response runs: a client that goes away ends it,
+        # even an event stream with nothing to send.
+        disconnected = asyncio.ensure_future(self._disconnected(receive))
+
+        def run(func, *args):
+            return loop.run_in_executor(executor, context.run, func, *args)
+
+        async def next_chunk():
+            # A step already running cannot be interrupted (an idle event
+            # stream returns within HEARTBEAT_INTERVAL); its chunk is then
+            # dropped if the client has gone.
+            step = run(next, iterator, _DONE)
+            await asyncio.wait((step, disconnected), return_when=asyncio.FIRST_COMPLETED)
+            chunk = await step
+            return _DONE if disconnected.done() else chunk
+
+        started = {}
+
+        def start_response(status, headers, exc_info=None):
+            started['status'] = int(status.split(' ', 1)[0])
+            started['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+
+        iterable = None
+        try:
+            iterable = await run(self.wsgi_app, build_environ(scope, body), start_response)
+            iterator = iter(iterable)
+            # WSGI lets the app defer start_response until the first chunk.
+            chunk = await next_chunk()
+            if disconnected.done():
+                return
+            await send({
+                'type': 'http.response.start',
+                'status': started['status'],
+                'headers': started['headers'],
+            })
+            if dict(started['headers']).get(b'content-type', b'').startswith(b'text/event-stream'):
+                executor = self.event_stream_executor
+            while chunk is not _DONE:
+                if chunk:
+                    await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                chunk = await next_chunk()
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            disconnected.cancel()
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                await run(close)
+
+app = ASGIApp(create_app())
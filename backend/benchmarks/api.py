@@ -0,0 +1,372 @@
+"""Load test of every API endpoint at several database sizes.
+
+Seeds a synthetic database per scale with backend.seed (kept between
+runs), then drives each endpoint through Flask's test client or a
+pre-forked multi-worker HTTP server and reports throughput, latency
+percentiles and peak RSS. Results are compared with baseline.json; a drop
+in throughput, or a rise in p99 latency or RSS, beyond the threshold is
+reported and fails the run. Run from the repository root:
+
+    python -m backend.benchmarks.api --scale 10k,100k --mode client
+    python -m backend.benchmarks.api --scale 100k --mode server --workers 4 --clients 16
+    python -m backend.benchmarks.api --scale 100k --mode server --replicas
+    python -m backend.benchmarks.api --scale 10k --save-baseline
+
+The read cache is disabled unless --cache is given, so every request runs
+its queries. Seeded databases are kept in --data-dir and copied before each
+run, so writes made by one run do not leak into the next. With --replicas
+the workers publish snapshots and serve GET requests from them, and results
+are compared with a separate baseline.
+"""
+import argparse
+import contextlib
+import http.client
+import json
+import logging
+import os
+import random
+import resource
+import shutil
+import signal
+import socket
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import namedtuple
+from werkzeug.serving import make_server
+from backend import db, replica
+from backend.app import create_app
+from backend.seed import FIRST_NAMES, LAST_NAMES, seed_database, table_sizes
+
+SCALES = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+DATA_DIR = os.path.join(tempfile.gettempdir(), 'sql-insight-bench')
+# Fractional change from the baseline reported as a regression.
+DEFAULT_THRESHOLD = 0.25
+# p99 rises smaller than this are scheduling and fsync jitter, not regressions;
+# throughput still catches slower fast endpoints.
+P99_NOISE_MS = 5
+# Seconds between RSS samples while an endpoint runs.
+RSS_SAMPLE_INTERVAL = 0.01
+
+# An endpoint to drive. ``path`` and ``body`` are templates filled from
+# ``ids`` per request, so reads and writes touch rows across the table.
+Endpoint = namedtuple('Endpoint', ('name', 'method', 'path', 'body'), defaults=(None,))
+
+ENDPOINTS = (
+    Endpoint('departments.list', 'GET', '/api/departments/'),
+    Endpoint('departments.get', 'GET', '/api/departments/{department}'),
+    Endpoint('students.page', 'GET', '/api/students/?limit=50'),
+    Endpoint('students.filter', 'GET', '/api/students/?departmentId={department}&sort=-enrollmentYear&limit=50'),
+    Endpoint('students.expand', 'GET', '/api/students/?expand=department&limit=50'),
+    Endpoint('students.get', 'GET', '/api/students/{student}'),
+    Endpoint('students.all', 'GET', '/api/students/'),
+    Endpoint('students.patch', 'PATCH', '/api/students/{student}', {'phone': '555-{n:04d}'}),
+    Endpoint('faculty.list', 'GET', '/api/faculty/'),
+    Endpoint('faculty.get', 'GET', '/api/faculty/{faculty}'),
+    Endpoint('courses.list', 'GET', '/api/courses/'),
+    Endpoint('courses.get', 'GET', '/api/courses/{course}'),
+    Endpoint('enrollments.page', 'GET', '/api/enrollments/?courseCode={course}&limit=100'),
+    Endpoint('enrollments.expand', 'GET', '/api/enrollments/?expand=student,course&limit=100'),
+    Endpoint('enrollments.get', 'GET', '/api/enrollments/{enrollment}'),
+    Endpoint('enrollments.stream', 'GET', '/api/enrollments/?format=ndjson'),
+    Endpoint('enrollments.create', 'POST', '/api/enrollments/',
+             {'studentId': '{student}', 'courseCode': '{course}', 'grade': 'B'}),
+    Endpoint('analytics.dashboard', 'GET', '/api/analytics/'),
+    Endpoint('analytics.gpa', 'GET', '/api/analytics/gpa-by-department'),
+    Endpoint('search.all', 'GET', '/api/search/?q={name}'),
+    Endpoint('search.students', 'GET', '/api/search/students?q={name}'),
+    Endpoint('changes.seq', 'GET', '/api/changes/'),
+    Endpoint('query.report', 'POST', '/api/query/', {
+        'sql': "SELECT grade, COUNT(*) FROM enrollments WHERE course_code = '{course}' GROUP BY grade"}),
+    Endpoint('metrics', 'GET', '/api/metrics/'),
+    Endpoint('debug.slow_queries', 'GET', '/api/debug/slow-queries'),
+)
+
+def seeded_database(scale, data_dir):
+    """Returns a fresh working copy of the seeded database for ``scale``."""
+    os.makedirs(data_dir, exist_ok=True)
+    seeded = os.path.join(data_dir, f'{scale}.db')
+    if os.path.exists(seeded):
+        conn = sqlite3.connect(seeded)
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        conn.close()
+        if version != db.MIGRATIONS[-1][0]:
+            os.remove(seeded)
+    if not os.path.exists(seeded):
+        print(f'Seeding {scale} ({SCALES[scale]} enrollments)...', end=' ', flush=True)
+        start = time.perf_counter()
+        seed_database(seeded, SCALES[scale])
+        print(f'{time.perf_counter() - start:.1f}s')
+    working = os.path.join(data_dir, f'{scale}-run.db')
+    for suffix in ('', '-wal', '-shm'):
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(working + suffix)
+    shutil.copyfile(seeded, working)
+    return working
+
+
+def request_for(endpoint, rng, sizes, n):
+    ids = {
+        'department': rng.randint(1, sizes['departments']),
+        'faculty': rng.randint(1, sizes['faculty']),
+        'course': f'C{rng.randint(1, sizes["courses"]):05d}',
+        'student': rng.randint(1, sizes['students']),
+        'enrollment': rng.randint(1, sizes['enrollments']),
+        'name': rng.choice(FIRST_NAMES + LAST_NAMES)[:3],
+        'n': n,
+    }
+    path = endpoint.path.format(**ids)
+    body = None
+    if endpoint.body is not None:
+        body = {k: v.format(**ids) for k, v in endpoint.body.items()}
+        if 'studentId' in body:
+            body['studentId'] = int(body['studentId'])
+    return path, body
+
+
+def _rss_bytes(pid):
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        # No procfs: fall back to this process's peak so far.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class RSSSampler:
+    """Samples the summed RSS of ``pids`` in the background and keeps the peak."""
+
+    def __init__(self, pids):
+        self.pids = pids
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            self.peak = max(self.peak, sum(_rss_bytes(pid) for pid in self.pids))
+            if self._stop.wait(RSS_SAMPLE_INTERVAL):
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def summarize(latencies, elapsed, errors, rss):
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0.0
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(0.5), 2),
+        'p90_ms': round(percentile(0.9), 2),
+        'p99_ms': round(percentile(0.99), 2),
+        'rss_mb': round(rss / 2**20, 1),
+    }
+
+
+def run_client(app, endpoint, sizes, seconds):
+    """Drives one endpoint through the test client from a single thread."""
+    client = app.test_client()
+    rng = random.Random(endpoint.name)
+    latencies = []
+    errors = 0
+    n = 0
+    with RSSSampler([os.getpid()]) as sampler:
+        started = time.perf_counter()
+        stop_at = started + seconds
+        while time.perf_counter() < stop_at:
+            path, body = request_for(endpoint, rng, sizes, n)
+            start = time.perf_counter()
+            response = client.open(path, method=endpoint.method, json=body)
+            response.get_data()
+            if response.status_code < 400:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+            n += 1
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, errors, sampler.peak)
+
+
+def start_workers(app, workers):
+    """Forks ``workers`` threaded servers accepting on one shared socket."""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind(('127.0.0.1', 0))
+    sock.listen(1024)
+    port = sock.getsockname()[1]
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                logging.getLogger('werkzeug').setLevel(logging.ERROR)
+                make_server('127.0.0.1', port, app, threaded=True, fd=sock.fileno()).serve_forever()
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    sock.close()
+    return port, pids
+
+
+def stop_workers(pids):
+    for pid in pids:
+        os.kill(pid, signal.SIGTERM)
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+
+def run_server(port, pids, endpoint, sizes, seconds, clients):
+    """Drives one endpoint over HTTP from ``clients`` concurrent threads."""
+    latencies = []
+    errors = []
+
+    def client(i):
+        rng = random.Random(f'{endpoint.name}-{i}')
+        n = i
+        while time.perf_counter() < stop_at:
+            path, body = request_for(endpoint, rng, sizes, n)
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+            start = time.perf_counter()
+            try:
+                conn.request(endpoint.method, path, json.dumps(body) if body is not None else None,
+                             {'Content-Type': 'application/json'})
+                response = conn.getresponse()
+                response.read()
+                if response.status < 400:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors.append(response.status)
+            except OSError as e:
+                errors.append(str(e))
+            finally:
+                conn.close()
+            n += clients
+
+    with RSSSampler(pids) as sampler:
+        started = time.perf_counter()
+        stop_at = started + seconds
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    return summarize(latencies, elapsed, len(errors), sampler.peak)
+
+
+def compare(results, baseline, threshold):
+    """Returns a description of each metric that regressed beyond ``threshold``."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if result['rps'] < base['rps'] * (1 - threshold):
+            regressions.append(f'{name}: {result["rps"]} req/s, baseline {base["rps"]}')
+        if result['p99_ms'] > max(base['p99_ms'] * (1 + threshold), base['p99_ms'] + P99_NOISE_MS):
+            regressions.append(f'{name}: p99 {result["p99_ms"]} ms, baseline {base["p99_ms"]}')
+        if result['rss_mb'] > base['rss_mb'] * (1 + threshold):
+            regressions.append(f'{name}: {result["rss_mb"]} MB RSS, baseline {base["rss_mb"]}')
+    return regressions
+
+
+def print_results(results):
+    print(f'  {"endpoint":<22} {"req/s":>9} {"p50 ms":>8} {"p90 ms":>8} {"p99 ms":>8} {"RSS MB":>8} {"errors":>7}')
+    for name, r in results.items():
+        print(f'  {name:<22} {r["rps"]:9.1f} {r["p50_ms"]:8.2f} {r["p90_ms"]:8.2f} {r["p99_ms"]:8.2f} '
+              f'{r["rss_mb"]:8.1f} {r["errors"]:7}')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='python -m backend.benchmarks.api', description=__doc__.split('\n')[0])
+    parser.add_argument('--scale', default='10k', help=f'comma-separated scales: {", ".join(SCALES)}')
+    parser.add_argument('--mode', choices=('client', 'server'), default='client')
+    parser.add_argument('--workers', type=int, default=4, help='server processes (server mode)')
+    parser.add_argument('--clients', type=int, default=16, help='concurrent client threads (server mode)')
+    parser.add_argument('--seconds', type=float, default=2, help='seconds per endpoint')
+    parser.add_argument('--endpoints', help='comma-separated endpoint name prefixes to run')
+    parser.add_argument('--cache', action='store_true', help='keep the read cache enabled')
+    parser.add_argument('--replicas', action='store_true', help='serve reads from published snapshots')
+    parser.add_argument('--data-dir', default=DATA_DIR, help='where seeded databases are kept')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument('--save-baseline', action='store_true', help='record these results as the baseline')
+    args = parser.parse_args(argv)
+    args.scale = [s.strip().lower() for s in args.scale.split(',')]
+    for scale in args.scale:
+        if scale not in SCALES:
+            parser.error(f'unknown scale: {scale}')
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    endpoints = ENDPOINTS
+    if args.endpoints:
+        prefixes = tuple(p.strip() for p in args.endpoints.split(','))
+        endpoints = [e for e in ENDPOINTS if e.name.startswith(prefixes)]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    regressions = []
+    for scale in args.scale:
+        key = f'{args.mode}/{scale}' + ('+replicas' if args.replicas else '')
+        sizes = table_sizes(SCALES[scale])
+        db.DATABASE_PATH = seeded_database(scale, args.data_dir)
+        app = create_app()
+        if not args.cache:
+            # The cache is installed by create_app; removing it serves uncached.
+            app.extensions.pop('read_cache', None)
+        if args.replicas:
+            replica_dir = tempfile.mkdtemp(prefix='replicas-', dir=args.data_dir)
+            app.config.update(REPLICA_DIR=replica_dir, REPLICA_PUBLISH=True)
+            # Publish once up front so the first reads already use a snapshot.
+            replica.ReplicaPublisher(replica_dir).publish()
+        if args.mode == 'server':
+            print(f'{key}: {args.workers} workers, {args.clients} clients, {args.seconds:g}s per endpoint')
+            port, pids = start_workers(app, args.workers)
+            try:
+                results = {e.name: run_server(port, pids, e, sizes, args.seconds, args.clients) for e in endpoints}
+            finally:
+                stop_workers(pids)
+        else:
+            print(f'{key}: test client, {args.seconds:g}s per endpoint')
+            results = {e.name: run_client(app, e, sizes, args.seconds) for e in endpoints}
+        if args.replicas:
+            shutil.rmtree(replica_dir, ignore_errors=True)
+        print_results(results)
+
+        found = compare(results, baseline.get(key, {}), args.threshold)
+        for regression in found:
+            print(f'  REGRESSION {regression}')
+        regressions += found
+        if args.save_baseline:
+            baseline.setdefault(key, {}).update(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Baseline written to {args.baseline}')
+    return 1 if regressions and not args.save_baseline else 0
+
+
+if __name__ == '__main__':
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""Benchmark of list response sizes and encoding time per representation.
+
+Requests one list endpoint from a seeded database in each representation
+(JSON, columnar JSON and, when installed, MessagePack) and content coding
+(none, gzip and, when installed, zstd), with the read cache off. Run from
+the repository root:
+
+    python -m backend.benchmarks.encoding [enrollments] [path]
+"""
+import os
+import sys
+import tempfile
+import time
+from backend import db, encoding
+from backend.app import create_app
+from backend.seed import seed_database
+
+def best_of(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main(enrollments=100_000, path='/api/enrollments/?limit=1000'):
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_PATH = os.path.join(tmp, 'encoding.db')
+        seed_database(db.DATABASE_PATH, enrollments)
+        app = create_app()
+        app.extensions.pop('read_cache', None)
+        client = app.test_client()
+
+        accepts = {'json': 'application/json', 'columns': encoding.COLUMNS_MIMETYPE}
+        if encoding.msgpack is not None:
+            accepts['msgpack'] = encoding.MSGPACK_MIMETYPE
+        codings = [None, 'gzip'] + (['zstd'] if encoding.zstandard is not None else [])
+
+        print(f'GET {path}')
+        baseline = None
+        for name, accept in accepts.items():
+            for coding in codings:
+                headers = {'Accept': accept, 'Accept-Encoding': coding or 'identity'}
+                seconds, size = best_of(lambda: len(client.get(path, headers=headers).data))
+                baseline = baseline or size
+                print(f'  {name:<8} {coding or "identity":<9} {size:>9} bytes  {baseline / size:5.1f}x'
+                      f'  {seconds * 1000:7.2f} ms')
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]), *sys.argv[2:3])
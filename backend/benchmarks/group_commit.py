@@ -0,0 +1,85 @@
+"""Load test of concurrent single-row writes with and without group commit.
+
+Starts the app on a threaded local server backed by a fresh database, then
+has many clients POST students as fast as they can, first committing each
+write on its own and then through the write coordinator. Run from the
+repository root:
+
+    python -m backend.benchmarks.group_commit [clients] [seconds]
+"""
+import contextlib
+import http.client
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from werkzeug.serving import make_server
+from backend import db
+from backend.app import create_app
+
+def client(port, client_id, stop_at, latencies, errors):
+    n = 0
+    while time.perf_counter() < stop_at:
+        body = json.dumps({'firstName': 'Load', 'lastName': f'Client{client_id}', 'email': f'load{client_id}-{n}-{time.time_ns()}@example.edu'})
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        try:
+            conn.request('POST', '/api/students/', body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            if response.status == 201:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(response.status)
+        except OSError as e:
+            errors.append(str(e))
+        finally:
+            conn.close()
+        n += 1
+
+def run(group_commit, clients, seconds):
+    app = create_app()
+    app.config['GROUP_COMMIT'] = group_commit
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    latencies = []
+    errors = []
+    batches, writes = db.write_coordinator.batches, db.write_coordinator.writes
+    stop_at = time.perf_counter() + seconds
+    threads = [threading.Thread(target=client, args=(server.port, i, stop_at, latencies, errors))
+               for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    latencies.sort()
+    label = 'group commit' if group_commit else 'commit per write'
+    print(f'  {label:<18} {len(latencies) / seconds:8.0f} writes/s'
+          f'  p50 {latencies[len(latencies) // 2] * 1000:6.1f} ms'
+          f'  p99 {latencies[int(len(latencies) * 0.99)] * 1000:6.1f} ms'
+          f'  errors {len(errors)}', end='')
+    if group_commit:
+        batches = db.write_coordinator.batches - batches
+        writes = db.write_coordinator.writes - writes
+        print(f'  {writes / max(batches, 1):.1f} writes/commit', end='')
+    print()
+
+def main(clients=64, seconds=5):
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DATABASE_PATH = os.path.join(tmp, 'load.db')
+        with contextlib.redirect_stdout(io.StringIO()):
+            db.create_database()
+        print(f'{clients} clients, {seconds}s each')
+        run(False, clients, seconds)
+        run(True, clients, seconds)
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
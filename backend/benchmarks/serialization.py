@@ -0,0 +1,78 @@
+"""Benchmark of the row-to-JSON path for large list responses.
+
+Compares the original per-row format_record (sqlite3.Row, camelCase keys
+recomputed for every row, sorted-key JSON) with fetch_records and
+FastJSONProvider. Run from the repository root:
+
+    python -m backend.benchmarks.serialization [rows]
+"""
+import sqlite3
+import sys
+import time
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from backend.utils import FastJSONProvider, fetch_records, orjson
+
+SQL = 'SELECT id, first_name, last_name, email, phone, department_id, enrollment_year FROM students'
+
+def legacy_format_record(record):
+    # The implementation this benchmark measures against.
+    def to_camel_case(snake_str):
+        components = snake_str.split('_')
+        return components[0] + ''.join(x.title() for x in components[1:])
+
+    return {to_camel_case(key): record[key] for key in record.keys()}
+
+def seed(rows):
+    conn = sqlite3.connect(':memory:')
+    conn.execute(
+        'CREATE TABLE students (id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, '
+        'email TEXT, phone TEXT, department_id INTEGER, enrollment_year INTEGER)'
+    )
+    conn.executemany(
+        'INSERT INTO students VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ((i, f'First{i}', f'Last{i}', f'student{i}@example.edu', '555-0100', i % 20, 2015 + i % 10)
+         for i in range(1, rows + 1))
+    )
+    conn.commit()
+    return conn
+
+def best_of(fn, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main(rows=100_000):
+    conn = seed(rows)
+    app = Flask(__name__)
+    legacy_json = DefaultJSONProvider(app)
+    fast_json = FastJSONProvider(app)
+
+    def legacy_format():
+        conn.row_factory = sqlite3.Row
+        return [legacy_format_record(row) for row in conn.execute(SQL).fetchall()]
+
+    def fast_format():
+        conn.row_factory = sqlite3.Row
+        return fetch_records(conn.execute(SQL))
+
+    records = fast_format()
+    results = [
+        ('fetch + format (legacy)', best_of(legacy_format)),
+        ('fetch + format (fetch_records)', best_of(fast_format)),
+        ('encode (Flask default provider)', best_of(lambda: legacy_json.dumps({'data': records}))),
+        (f'encode (FastJSONProvider, orjson={"yes" if orjson else "no"})', best_of(lambda: fast_json.dumps({'data': records}))),
+    ]
+
+    print(f'{rows} rows')
+    for label, seconds in results:
+        print(f'  {label:<45} {seconds * 1000:8.1f} ms  {seconds / rows * 1e6:6.2f} us/row')
+    legacy_total = results[0][1] + results[2][1]
+    fast_total = results[1][1] + results[3][1]
+    print(f'  end to end speedup: {legacy_total / fast_total:.1f}x')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,166 @@
+import csv
+import io
+import json
+import sqlite3
+from itertools import groupby
+from flask import request
+from backend.db import get_db_connection, with_query_logs
+from backend.utils import to_camel_case
+
+# Rows validated and written per executemany call.
+BULK_BATCH_SIZE = 1000
+
+
+def parse_bulk_rows():
+    """Parses the request body as a JSON array, NDJSON or CSV into dicts."""
+    mimetype = request.mimetype
+    text = request.get_data(as_text=True)
+    if mimetype == 'text/csv':
+        return list(csv.DictReader(io.StringIO(text)))
+    if mimetype == 'application/x-ndjson':
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    rows = json.loads(text)
+    if not isinstance(rows, list):
+        raise ValueError('Expected a JSON array of records')
+    return rows
+
+
+def _normalize(record, columns):
+    """Maps a camelCase or snake_case record onto the column order.
+
+    Returns the values and the columns the record provides.
+    """
+    values = []
+    provided = []
+    for column in columns:
+        value = record.get(to_camel_case(column), record.get(column))
+        if value == '':
+            # CSV has no null; treat empty cells as missing.
+            value = None
+        elif to_camel_case(column) in record or column in record:
+            provided.append(column)
+        values.append(value)
+    return values, tuple(provided)
+
+
+def integer_columns(conn, table):
+    """The columns of ``table`` declared with INTEGER affinity."""
+    # A bare cursor keeps the lookup out of the request's query logs.
+    info = conn.cursor().execute(f'PRAGMA table_info({table})').fetchall()
+    return frozenset(row[1] for row in info if 'INT' in row[2].upper())
+
+
+def _check_types(values, columns, integers):
+    """Coerces integer strings (as CSV sends them) in place; returns the first type error."""
+    for i, (column, value) in enumerate(zip(columns, values)):
+        if value is None:
+            continue
+        if not isinstance(value, (str, int, float)) or isinstance(value, bool):
+            return f'{to_camel_case(column)} must be a string or a number'
+        if column in integers:
+            if isinstance(value, str):
+                try:
+                    value = values[i] = int(value)
+                except ValueError:
+                    pass
+            if not isinstance(value, int):
+                return f'{to_camel_case(column)} must be an integer'
+    return None
+
+
+def _validate(batch, start, columns, required, integers=frozenset()):
+    rows = []
+    errors = []
+    for offset, record in enumerate(batch):
+        index = start + offset
+        if not isinstance(record, dict):
+            errors.append({'row': index, 'error': 'Record must be an object'})
+            continue
+        values, provided = _normalize(record, columns)
+        missing = [to_camel_case(c) for c, v in zip(columns, values) if c in required and v is None]
+        if missing:
+            errors.append({'row': index, 'error': f'Missing required fields: {", ".join(missing)}'})
+            continue
+        error = _check_types(values, columns, integers)
+        if error:
+            errors.append({'row': index, 'error': error})
+            continue
+        rows.append((index, values, provided))
+    return rows, errors
+
+
+def upsert_sql(table, columns, conflict_key, updated=None):
+    """Builds an INSERT ... ON CONFLICT statement for the columns.
+
+    An existing row gets the new values of the ``updated`` columns (by
+    default all of them) and keeps the rest.
+    """
+    placeholders = ', '.join('?' for _ in columns)
+    updates = ', '.join(f'{c} = excluded.{c}' for c in (columns if updated is None else updated) if c != conflict_key)
+    action = f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+    return (
+        f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders}) '
+        f'ON CONFLICT({conflict_key}) {action}'
+    )
+
+
+def bulk_upsert(table, columns, required, conflict_key, statement=None):
+    """Validates and upserts the request's records in a single transaction.
+
+    Records are processed in batches of BULK_BATCH_SIZE. Each run of records
+    providing the same columns is written with one executemany, inside a
+    savepoint per batch; if the batch hits a database error it is rolled back
+    and replayed row by row so the failing rows can be reported individually
+    while the rest are still written. Rows that match an existing
+    ``conflict_key`` update the columns the record provides and keep the
+    others. ``statement(updated)`` returns the upsert statement for a set of
+    updated columns, when the caller caches them. Values must be scalars, and
+    integer columns take integers or integer strings.
+    """
+    try:
+        records = parse_bulk_rows()
+    except (ValueError, csv.Error) as e:
+        return with_query_logs({'error': f'Invalid request body: {e}'}, 400)
+    if not records:
+        return with_query_logs({'error': 'No data provided'}, 400)
+
+    statement = statement or (lambda updated: upsert_sql(table, columns, conflict_key, updated))
+    conn = get_db_connection()
+    integers = integer_columns(conn, table)
+    errors = []
+    written = 0
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        for start in range(0, len(records), BULK_BATCH_SIZE):
+            rows, batch_errors = _validate(records[start:start + BULK_BATCH_SIZE], start, columns, required, integers)
+            errors.extend(batch_errors)
+            if not rows:
+                continue
+            # Consecutive runs keep the records in order when they touch the same row.
+            runs = [
+                (statement(tuple(c for c in provided if c != conflict_key)), list(run))
+                for provided, run in groupby(rows, key=lambda row: row[2])
+            ]
+            conn.execute('SAVEPOINT bulk_batch')
+            try:
+                for sql, run in runs:
+                    conn.executemany(sql, [values for _, values, _ in run])
+                written += len(rows)
+            except sqlite3.Error:
+                conn.execute('ROLLBACK TO bulk_batch')
+                for sql, run in runs:
+                    for index, values, _ in run:
+                        try:
+                            conn.execute(sql, values)
+                            written += 1
+                        except sqlite3.Error as e:
+                            errors.append({'row': index, 'error': str(e)})
+            conn.execute('RELEASE bulk_batch')
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        return with_query_logs({'error': str(e)}, 500)
+
+    errors.sort(key=lambda error: error['row'])
+    status = 400 if errors and not written else 200
+    return with_query_logs({'written': written, 'errors': errors}, status)
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import current_app, request, Response
+from backend.db import get_db_connection, query_logs_requested, requested_stream_format
+from backend.encoding import compress_response, requested_encoding, requested_representation
+from backend.listing import requested_relations
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 256
+# Responses larger than this are served but not cached.
+DEFAULT_MAX_ENTRY_BYTES = 8 * 1024 * 1024
+
+ALL_TABLES = ('departments', 'students', 'faculty', 'courses', 'enrollments')
+
+class MemoryCache:
+    """A thread-safe, in-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class SQLiteCache:
+    """A cache stored in a local SQLite file, shared by every worker on the host."""
+
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            'key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB, expires REAL)'
+        )
+        conn.commit()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1)
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = OFF')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT status, headers, body FROM cache WHERE key = ? AND expires >= ?',
+            (key, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def set(self, key, value):
+        status, headers, body = value
+        conn = self._connection()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, status, headers, body, expires) VALUES (?, ?, ?, ?, ?)',
+                (key, status, json.dumps(headers), body, time.time() + self.ttl)
+            )
+            conn.execute(
+                'DELETE FROM cache WHERE expires < ? OR key NOT IN '
+                '(SELECT key FROM cache ORDER BY expires DESC LIMIT ?)',
+                (time.time(), self.max_entries)
+            )
+            conn.commit()
+        except sqlite3.OperationalError:
+            # A busy cache is not worth failing the request over.
+            conn.rollback()
+
+    def clear(self):
+        conn = self._connection()
+        conn.execute('DELETE FROM cache')
+        conn.commit()
+
+def init_app(app):
+    """Install the read cache configured by READ_CACHE_* settings.
+
+    READ_CACHE_BACKEND may be any object with get/set/clear; otherwise a
+    SQLiteCache is used when READ_CACHE_PATH is set and a MemoryCache if not.
+    Set READ_CACHE_ENABLED to False to turn caching off.
+    """
+    if not app.config.get('READ_CACHE_ENABLED', True):
+        return
+    backend = app.config.get('READ_CACHE_BACKEND')
+    if backend is None:
+        max_entries = app.config.get('READ_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+        ttl = app.config.get('READ_CACHE_TTL', DEFAULT_TTL)
+        if app.config.get('READ_CACHE_PATH'):
+            backend = SQLiteCache(app.config['READ_CACHE_PATH'], max_entries, ttl)
+        else:
+            backend = MemoryCache(max_entries, ttl)
+    app.extensions['read_cache'] = backend
+
+def table_versions(conn, tables):
+    """Return the current version of each table, in the given order."""
+    placeholders = ', '.join('?' for _ in tables)
+    versions = dict(conn.execute(
+        f'SELECT table_name, version FROM table_versions WHERE table_name IN ({placeholders})',
+        tuple(tables)
+    ).fetchall())
+    return tuple(versions.get(table, 0) for table in tables)
+
+def _request_key():
+    args = sorted(request.args.items(multi=True))
+    return f'{request.path}?{urlencode(args)}'
+
+def cached(*tables, relations=None):
+    """Serve a GET view from the read cache, keyed by the request and table versions.
+
+    Any write to one of ``tables`` bumps its version and so invalidates the
+    entry; so does a write to the table of any of ``relations`` the request
+    expands. The key includes the negotiated representation and content coding,
+    and entries hold the compressed body. The ETag is derived from the same
+    key, so a matching If-None-Match is answered with 304 before the view or
+    the cache is consulted. Requests for query logs bypass the cache.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            backend = current_app.extensions.get('read_cache')
+            # Query logs describe statements that just ran, so a request for
+            # them always runs the view.
+            if backend is None or requested_stream_format() or query_logs_requested():
+                return view(*args, **kwargs)
+            depends_on = tables + tuple(
+                relations[name].table for name in requested_relations(relations)
+            )
+            try:
+                versions = table_versions(get_db_connection(), depends_on)
+            except sqlite3.OperationalError:
+                # Database not migrated yet; serve uncached.
+                return view(*args, **kwargs)
+
+            key = f'{_request_key()}|{versions}|{requested_representation()}|{requested_encoding()}'
+            etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+            if request.if_none_match.contains(etag):
+                response = Response(status=304)
+                response.set_etag(etag)
+                return response
+
+            entry = backend.get(key)
+            cache_status = 'HIT'
+            if entry is None:
+                cache_status = 'MISS'
+                response = view(*args, **kwargs)
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+                # Cache the compressed body, so hits are served without recompressing.
+                compress_response(response)
+                headers = [(k, v) for k, v in response.headers.items() if k != 'Content-Length']
+                entry = (response.status_code, headers, response.get_data())
+                max_bytes = current_app.config.get('READ_CACHE_MAX_ENTRY_BYTES', DEFAULT_MAX_ENTRY_BYTES)
+                if len(entry[2]) <= max_bytes:
+                    backend.set(key, entry)
+
+            status, headers, body = entry
+            response = Response(body, status=status, headers=headers)
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.headers['X-Cache'] = cache_status
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from flask import Blueprint, Response, request
+from backend import db
+from backend.db import get_db_connection, with_query_logs
+from backend.replica import primary
+from backend.utils import format_records
+
+bp = Blueprint('changes', __name__, url_prefix='/api/changes')
+
+# The key logged for each table's rows in changes.sql.
+CHANGE_KEYS = {
+    'departments': 'id',
+    'students': 'id',
+    'faculty': 'id',
+    'courses': 'code',
+    'enrollments': 'id',
+}
+
+# Seconds between the feed's checks of the change log.
+CHANGE_POLL_INTERVAL = 0.5
+# Seconds between keepalive comments on an idle event stream.
+HEARTBEAT_INTERVAL = 15
+# Milliseconds a disconnected EventSource waits before reconnecting.
+RETRY_MS = 2000
+
+
+class ChangeFeed:
+    """Watches the change log for this process and wakes streams waiting on it.
+
+    One thread polls the log however many clients are connected; each event
+    stream only waits on a condition variable, so idle streams cost no queries.
+    """
+
+    def __init__(self, interval=CHANGE_POLL_INTERVAL):
+        self.interval = interval
+        self.seq = 0
+        self._table_seqs = {}
+        self._condition = threading.Condition()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._conn = None
+        self._path = None
+
+    def _poll(self):
+        if self._conn is None or self._path != db.DATABASE_PATH:
+            if self._path != db.DATABASE_PATH:
+                with self._condition:
+                    self.seq = 0
+                    self._table_seqs = {}
+            self._path = db.DATABASE_PATH
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+        rows = self._conn.execute(
+            'SELECT table_name, MAX(seq) FROM change_log WHERE seq > ? GROUP BY table_name',
+            (self.seq,)
+        ).fetchall()
+        if rows:
+            with self._condition:
+                self._table_seqs.update(rows)
+                self.seq = max(self._table_seqs.values())
+                self._condition.notify_all()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self._poll()
+            except sqlite3.Error:
+                # The database may be mid-migration; try again next round.
+                self._conn = None
+
+    def start(self):
+        """Start polling if this process is not already, after one synchronous poll."""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._conn = None
+                self._poll()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='change-feed', daemon=True)
+                self._thread.start()
+
+    def wait(self, seq, timeout):
+        """Block until the log passes ``seq`` or ``timeout`` elapses.
+
+        Returns the latest sequence number and the tables changed after ``seq``.
+        """
+        with self._condition:
+            self._condition.wait_for(lambda: self.seq > seq, timeout)
+            return self.seq, sorted(t for t, s in self._table_seqs.items() if s > seq)
+
+
+change_feed = ChangeFeed()
+
+
+def _tables():
+    tables = request.args.get('tables')
+    if not tables:
+        return list(CHANGE_KEYS)
+    tables = [t.strip() for t in tables.split(',')]
+    for table in tables:
+        if table not in CHANGE_KEYS:
+            raise ValueError(f'Unknown table: {table}')
+    return tables
+
+
+@bp.route('/', methods=['GET'])
+@primary
+def get_changes():
+    """Return the rows changed since ``since``, per table.
+
+    Each table lists the current ``upserts`` and the keys in ``deletes``.
+    ``seq`` is the position to pass as ``since`` next time; without ``since``
+    only ``seq`` is returned. A ``since`` older than the retained log is
+    answered with 410, and the client should reload the table instead.
+    Always read from the primary, so a delta is never older than the event
+    stream that announced it.
+    """
+    try:
+        tables = _tables()
+        since = request.args.get('since', type=int)
+    except ValueError as e:
+        return with_query_logs({'error': str(e)}, 400)
+
+    conn = get_db_connection()
+    # Read the position and the rows from one snapshot.
+    conn.execute('BEGIN')
+    try:
+        seq, oldest = conn.execute('SELECT COALESCE(MAX(seq), 0), MIN(seq) FROM change_log').fetchone()
+        if since is None:
+            return with_query_logs({'seq': seq, 'changes': {}})
+        if oldest is not None and since < oldest - 1:
+            return with_query_logs({'error': 'Changes since this position are no longer available'}, 410)
+
+        changes = {}
+        for table in tables:
+            key = CHANGE_KEYS[table]
+            changed = 'SELECT row_key FROM change_log WHERE table_name = ? AND seq > ?'
+            upserts = conn.execute(
+                f'SELECT * FROM {table} WHERE {key} IN ({changed})', (table, since)
+            ).fetchall()
+            deletes = conn.execute(
+                f'SELECT DISTINCT row_key FROM change_log c WHERE table_name = ? AND seq > ? '
+                f'AND NOT EXISTS (SELECT 1 FROM {table} WHERE {key} = c.row_key)',
+                (table, since)
+            ).fetchall()
+            if upserts or deletes:
+                changes[table] = {
+                    'upserts': format_records(upserts),
+                    'deletes': [row[0] for row in deletes],
+                }
+    finally:
+        conn.rollback()
+    return with_query_logs({'seq': seq, 'changes': changes})
+
+
+@bp.route('/stream', methods=['GET'])
+def stream_changes():
+    """Server-sent events announcing which tables changed.
+
+    Each ``change`` event carries ``{"seq", "tables"}``; clients fetch the rows
+    from ``/api/changes?since=``. Streaming starts from ``since``, the
+    EventSource ``Last-Event-ID`` on reconnect, or the current position.
+    """
+    change_feed.start()
+    since = request.args.get('since', type=int)
+    if since is None:
+        since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = change_feed.seq
+
+    def generate():
+        seq = since
+        yield f'retry: {RETRY_MS}\n\n'
+        while True:
+            latest, tables = change_feed.wait(seq, HEARTBEAT_INTERVAL)
+            if latest > seq:
+                data = json.dumps({'seq': latest, 'tables': tables})
+                yield f'id: {latest}\nevent: change\ndata: {data}\n\n'
+                seq = latest
+            else:
+                yield ': keepalive\n\n'
+
+    return Response(
+        generate(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
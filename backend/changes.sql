@@ -0,0 +1,99 @@
+-- An append-only log of changed rows, read by /api/changes. Every insert,
+-- update and delete appends the affected key; whether it is now an upsert or
+-- a delete is decided when the log is read, by checking whether the row still
+-- exists. A row whose key changes logs both the old and the new key.
+-- Every statement is idempotent; see MIGRATIONS in db.py.
+
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    row_key NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_log_table_name ON change_log (table_name, seq);
+
+-- Keep the most recent 100000 entries; clients further behind reload.
+CREATE TRIGGER IF NOT EXISTS changes_prune AFTER INSERT ON change_log
+BEGIN
+    DELETE FROM change_log WHERE seq <= new.seq - 100000;
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_departments_insert AFTER INSERT ON departments
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('departments', new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_departments_update AFTER UPDATE ON departments
+BEGIN
+    INSERT INTO change_log (table_name, row_key) SELECT 'departments', old.id WHERE old.id IS NOT new.id;
+    INSERT INTO change_log (table_name, row_key) VALUES ('departments', new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_departments_delete AFTER DELETE ON departments
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('departments', old.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_students_insert AFTER INSERT ON students
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('students', new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_students_update AFTER UPDATE ON students
+BEGIN
+    INSERT INTO change_log (table_name, row_key) SELECT 'students', old.id WHERE old.id IS NOT new.id;
+    INSERT INTO change_log (table_name, row_key) VALUES ('students', new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_students_delete AFTER DELETE ON students
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('students', old.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_faculty_insert AFTER INSERT ON faculty
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('faculty', new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_faculty_update AFTER UPDATE ON faculty
+BEGIN
+    INSERT INTO change_log (table_name, row_key) SELECT 'faculty', old.id WHERE old.id IS NOT new.id;
+    INSERT INTO change_log (table_name, row_key) VALUES ('faculty', new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_faculty_delete AFTER DELETE ON faculty
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('faculty', old.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_courses_insert AFTER INSERT ON courses
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('courses', new.code);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_courses_update AFTER UPDATE ON courses
+BEGIN
+    INSERT INTO change_log (table_name, row_key) SELECT 'courses', old.code WHERE old.code IS NOT new.code;
+    INSERT INTO change_log (table_name, row_key) VALUES ('courses', new.code);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_courses_delete AFTER DELETE ON courses
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('courses', old.code);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_enrollments_insert AFTER INSERT ON enrollments
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('enrollments', new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_enrollments_update AFTER UPDATE ON enrollments
+BEGIN
+    INSERT INTO change_log (table_name, row_key) SELECT 'enrollments', old.id WHERE old.id IS NOT new.id;
+    INSERT INTO change_log (table_name, row_key) VALUES ('enrollments', new.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS changes_enrollments_delete AFTER DELETE ON enrollments
+BEGIN
+    INSERT INTO change_log (table_name, row_key) VALUES ('enrollments', old.id);
+END;
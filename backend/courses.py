@@ -1,21 +1,35 @@
+import sqlite3
 from flask import Blueprint, request
-from backend.db import get_db_connection, with_query_logs
-from backend.utils import format_record, format_records
+from backend.cache import cached
+from backend.db import WriteTimeout, get_db_connection, requested_stream_format, run_write, stream_with_query_logs, with_query_logs
+from backend.repository import REPOSITORIES
+from backend.utils import fetch_records, format_record
 
 bp = Blueprint('courses', __name__, url_prefix='/api/courses')
 
+repository = REPOSITORIES['courses']
+
 @bp.route('/', methods=['GET'])
+@cached('courses', relations=repository.relations)
 def get_courses():
-    """Get all courses."""
+    """Get courses, optionally filtered, sorted, projected, paginated and expanded."""
+    try:
+        query = repository.list_query()
+    except ValueError as e:
+        return with_query_logs({'error': str(e)}, 400)
+
     conn = get_db_connection()
-    courses = conn.execute('SELECT * FROM courses').fetchall()
-    return with_query_logs(format_records(courses))
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_with_query_logs(conn.execute(*query.build()), stream_format, filename='courses', page=query)
+    courses, headers = query.paginate(fetch_records(conn.execute(*query.build())))
+    return with_query_logs(courses, headers=headers)
 
 @bp.route('/<code>', methods=['GET'])
+@cached('courses')
 def get_course(code):
     """Get a single course by code."""
-    conn = get_db_connection()
-    course = conn.execute('SELECT * FROM courses WHERE code = ?', (code,)).fetchone()
+    course = repository.get(get_db_connection(), code)
     if course is None:
         return with_query_logs({'error': 'Course not found'}, 404)
     return with_query_logs(format_record(course))
@@ -24,67 +38,50 @@ def get_course(code):
 def create_course():
     """Create a new course."""
     data = request.get_json()
-    if not data or not 'code' in data or not 'name' in data or not 'credits' in data:
+    if not data or repository.missing(data):
         return with_query_logs({'error': 'Missing required fields'}, 400)
 
-    conn = get_db_connection()
     try:
-        cursor = conn.execute(
-            'INSERT INTO courses (code, name, credits, description, department_id, faculty_id) VALUES (?, ?, ?, ?, ?, ?)',
-            (data['code'], data['name'], data['credits'], data.get('description'), data.get('departmentId'), data.get('facultyId'))
-        )
-        conn.commit()
-
-        new_course = conn.execute('SELECT * FROM courses WHERE code = ?', (data['code'],)).fetchone()
-        return with_query_logs(format_record(new_course), 201)
-    except conn.IntegrityError:
+        new_course = run_write(lambda conn: repository.create(conn, data))
+    except sqlite3.IntegrityError:
         return with_query_logs({'error': 'Course code already exists'}, 409)
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    return with_query_logs(format_record(new_course), 201)
 
-@bp.route('/<code>', methods=['PUT'])
+@bp.route('/bulk', methods=['POST'])
+def bulk_create_courses():
+    """Create or update many courses in one transaction."""
+    return repository.bulk_upsert()
+
+@bp.route('/<code>', methods=['PUT', 'PATCH'])
 def update_course(code):
-    """Update an existing course."""
+    """Update the given fields of an existing course."""
     data = request.get_json()
     if not data:
         return with_query_logs({'error': 'No data provided'}, 400)
 
-    conn = get_db_connection()
     try:
-        course = conn.execute('SELECT * FROM courses WHERE code = ?', (code,)).fetchone()
-        if course is None:
-            return with_query_logs({'error': 'Course not found'}, 404)
-
-        update_fields = {
-            'name': data.get('name', course['name']),
-            'credits': data.get('credits', course['credits']),
-            'description': data.get('description', course['description']),
-            'departmentId': data.get('departmentId', course['department_id']),
-            'facultyId': data.get('facultyId', course['faculty_id'])
-        }
-
-        conn.execute(
-            'UPDATE courses SET name = ?, credits = ?, description = ?, department_id = ?, faculty_id = ? WHERE code = ?',
-            (update_fields['name'], update_fields['credits'], update_fields['description'], update_fields['departmentId'], update_fields['facultyId'], code)
-        )
-        conn.commit()
-
-        updated_course = conn.execute('SELECT * FROM courses WHERE code = ?', (code,)).fetchone()
-        return with_query_logs(format_record(updated_course))
+        updated_course = run_write(lambda conn: repository.update(conn, code, data))
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    if updated_course is None:
+        return with_query_logs({'error': 'Course not found'}, 404)
+    return with_query_logs(format_record(updated_course))
 
 @bp.route('/<code>', methods=['DELETE'])
 def delete_course(code):
     """Delete a course."""
-    conn = get_db_connection()
     try:
-        course = conn.execute('SELECT * FROM courses WHERE code = ?', (code,)).fetchone()
-        if course is None:
-            return with_query_logs({'error': 'Course not found'}, 404)
-
-        conn.execute('DELETE FROM courses WHERE code = ?', (code,))
-        conn.commit()
-        return with_query_logs({'message': 'Course deleted successfully'}, 200)
+        deleted = run_write(lambda conn: repository.delete(conn, code))
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    if not deleted:
+        return with_query_logs({'error': 'Course not found'}, 404)
+    return with_query_logs({'message': 'Course deleted successfully'}, 200)
@@ -1,48 +1,669 @@
+import contextvars
+import csv
+import io
+import re
+import queue
+import random
 import sqlite3
 import os
+import sys
+import threading
 import time
-from flask import g, jsonify, Response
+import urllib.parse
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from flask import current_app, g, has_app_context, has_request_context, request, Response, stream_with_context
+from backend import aggregates
+from backend.encoding import encoded_response
+from backend.metrics import normalize_statement, query_metrics, statement_cache_stats
+from backend.utils import cursor_keys, is_nested, nest_record
 
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'database.db')
 SCHEMA_PATH = os.path.join(os.path.dirname(__file__), 'schema.sql')
+VERSIONS_PATH = os.path.join(os.path.dirname(__file__), 'versions.sql')
+SEARCH_PATH = os.path.join(os.path.dirname(__file__), 'search.sql')
+CHANGES_PATH = os.path.join(os.path.dirname(__file__), 'changes.sql')
+
+# Full-text indexes kept by search.sql; 'rebuild' re-reads the base table.
+SEARCH_TABLES = ('students_fts', 'faculty_fts', 'courses_fts')
+
+# Rows fetched from the cursor per chunk when streaming a response.
+STREAM_BATCH_SIZE = 500
+
+# Connections kept per worker process; requests beyond this wait for a free one.
+POOL_MAX_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+# Seconds a request waits for a pooled connection before giving up.
+POOL_TIMEOUT = 10
+# Streamed responses open at once per worker. Each holds a pooled connection
+# until its client has read it, however slowly, so the rest of the pool is
+# kept for other requests; more streams are answered with 429.
+STREAM_MAX_OPEN = max(1, int(os.environ.get('DB_STREAM_MAX_OPEN', POOL_MAX_SIZE // 2)))
+# Prepared statements kept per connection, keyed by SQL text. Room for every
+# statement the repositories generate (repository.statement_count(), about
+# 175) plus the list query shapes in use; sqlite3's default is 128.
+STATEMENT_CACHE_SIZE = int(os.environ.get('DB_STATEMENT_CACHE_SIZE', 512))
+
+# Group commit: how long the writer waits for concurrent writes to join a
+# batch, and the most writes committed in one transaction.
+GROUP_COMMIT_WINDOW_MS = 2
+GROUP_COMMIT_MAX_BATCH = 64
+# Seconds a request waits for its group-committed write to start before giving up.
+GROUP_COMMIT_TIMEOUT = 10
+
+# Applied once when a pooled connection is opened. WAL lets readers proceed
+# while a writer holds the lock; synchronous=NORMAL is durable under WAL.
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -20000',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA busy_timeout = 5000',
+    'PRAGMA temp_store = MEMORY',
+)
+# For read-only replica snapshots (see replica.py), which have no journal to set up.
+REPLICA_PRAGMAS = (
+    'PRAGMA cache_size = -20000',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA temp_store = MEMORY',
+)
+
+def sql_statements(path):
+    """Split a SQL script file into individual statements.
+
+    Unlike executescript, running the statements one by one keeps them inside
+    the caller's transaction.
+    """
+    statements = []
+    pending = ''
+    with open(path, 'r') as f:
+        for line in f:
+            pending += line
+            if sqlite3.complete_statement(pending):
+                statements.append(pending.strip())
+                pending = ''
+    return statements
+
+# Schema migrations as (version, description, statements). The applied version
+# is stored in PRAGMA user_version; append new entries, never edit old ones.
+MIGRATIONS = [
+    (1, 'Add indexes for foreign key and date access paths', (
+        'CREATE INDEX IF NOT EXISTS idx_students_department_id ON students (department_id)',
+        'CREATE INDEX IF NOT EXISTS idx_students_enrollment_year ON students (enrollment_year)',
+        'CREATE INDEX IF NOT EXISTS idx_faculty_department_id ON faculty (department_id)',
+        'CREATE INDEX IF NOT EXISTS idx_courses_department_id ON courses (department_id)',
+        'CREATE INDEX IF NOT EXISTS idx_courses_faculty_id ON courses (faculty_id)',
+        'CREATE INDEX IF NOT EXISTS idx_enrollments_student_id ON enrollments (student_id, course_code)',
+        'CREATE INDEX IF NOT EXISTS idx_enrollments_course_code ON enrollments (course_code, student_id)',
+        'CREATE INDEX IF NOT EXISTS idx_enrollments_enrolled_at ON enrollments (enrolled_at)',
+    )),
+    (2, 'Add trigger-maintained summary tables for analytics', (
+        *sql_statements(aggregates.AGGREGATES_PATH),
+        *aggregates.rebuild_statements(),
+    )),
+    (3, 'Add per-table version counters for the read cache', (
+        *sql_statements(VERSIONS_PATH),
+    )),
+    (4, 'Add full-text search indexes', (
+        *sql_statements(SEARCH_PATH),
+        *(f"INSERT INTO {table} ({table}) VALUES ('rebuild')" for table in SEARCH_TABLES),
+    )),
+    (5, 'Add the change log for /api/changes', (
+        *sql_statements(CHANGES_PATH),
+    )),
+    (6, 'Add per-department grade point sums for the GPA report', (
+        *sql_statements(aggregates.AGGREGATES_PATH),
+        *aggregates.rebuild_statements(('department_grade_points',)),
+    )),
+]
+
+# Representative lookups whose plans are reported before and after migrating.
+PLAN_QUERIES = (
+    ('enrollments by student', 'SELECT * FROM enrollments WHERE student_id = ?', (1,)),
+    ('enrollments by course', 'SELECT student_id FROM enrollments WHERE course_code = ?', ('CS101',)),
+    ('enrollments by date', 'SELECT * FROM enrollments WHERE enrolled_at >= ? ORDER BY enrolled_at', ('2024-01-01',)),
+    ('students by department', 'SELECT * FROM students WHERE department_id = ?', (1,)),
+    ('faculty by department', 'SELECT * FROM faculty WHERE department_id = ?', (1,)),
+    ('courses by department', 'SELECT * FROM courses WHERE department_id = ?', (1,)),
+    ('courses by faculty', 'SELECT * FROM courses WHERE faculty_id = ?', (1,)),
+)
+
+# Statements at least this slow (execute plus fetch) go to the slow query log,
+# unless overridden by the SLOW_QUERY_MS config value.
+SLOW_QUERY_MS = 100
+# Slow executions kept in the ring buffer.
+SLOW_QUERY_LOG_SIZE = 500
+
+STREAM_MIMETYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+def query_logs_requested():
+    """Whether the client asked for per-query logs in the response body.
+
+    Logs are opt-in with an ``X-Query-Logs: 1`` request header, or on for
+    every request when the QUERY_LOGS config flag is set.
+    """
+    if request.headers.get('X-Query-Logs', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return bool(current_app.config.get('QUERY_LOGS', False))
+
+def _query_log():
+    """Return the request's query log list, or None when logs are off."""
+    if not has_request_context():
+        return None
+    if 'query_logs' not in g:
+        g.query_logs = [] if query_logs_requested() else None
+    return g.query_logs
+
+def _sampled():
+    """Decide whether to time this statement, per QUERY_SAMPLE_RATE (default 1.0)."""
+    rate = current_app.config.get('QUERY_SAMPLE_RATE', 1.0) if has_app_context() else 1.0
+    return rate >= 1.0 or random.random() < rate
+
+# A table read in full: not an index scan, an FTS or other virtual table
+# lookup, or the constant row of a table-less SELECT.
+_FULL_SCAN = re.compile(r'^SCAN (?!CONSTANT ROW)(\w+)\b(?! USING| VIRTUAL TABLE)')
+
+class SlowQueryLog:
+    """A bounded ring buffer of slow statement executions.
+
+    Recording is cheap: only the statement, its parameters and timings are
+    kept. Query plans are captured with EXPLAIN QUERY PLAN, once per
+    statement shape, each time the log is read, on a fresh connection so
+    they reflect the indexes and ANALYZE statistics in place then.
+    """
+
+    def __init__(self, size=SLOW_QUERY_LOG_SIZE):
+        self._entries = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, sql, parameters, duration_ns, rows):
+        entry = {
+            'shape': normalize_statement(sql),
+            'sql': sql,
+            'params': list(parameters) if isinstance(parameters, (list, tuple)) else parameters,
+            'duration': round(duration_ns / 1e6, 2), # in ms
+            'rows': rows,
+            'timestamp': time.time(),
+        }
+        with self._lock:
+            self._entries.append(entry)
+
+    def entries(self):
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _plan(self, conn, entry):
+        try:
+            rows = conn.execute('EXPLAIN QUERY PLAN ' + entry['sql'], entry['params']).fetchall()
+            return [row[-1] for row in rows]
+        except sqlite3.Error as e:
+            return [f'Unable to explain: {e}']
+
+    def report(self, pool):
+        """Group the buffered executions by shape, slowest first, with plans
+        explained against ``pool``'s database."""
+        groups = {}
+        for entry in self.entries():
+            group = groups.get(entry['shape'])
+            if group is None:
+                group = groups[entry['shape']] = {
+                    'shape': entry['shape'],
+                    'count': 0,
+                    'totalDuration': 0,
+                    'maxDuration': 0,
+                }
+            group['count'] += 1
+            group['totalDuration'] += entry['duration']
+            if entry['duration'] >= group['maxDuration']:
+                group['maxDuration'] = entry['duration']
+                group['slowest'] = entry
+            group['lastSeen'] = entry['timestamp']
+
+        report = []
+        # Kept out of the request's logs and metrics, like the EXPLAIN itself.
+        conn = pool.connect_uncached() if groups else None
+        try:
+            plans = {shape: self._plan(conn, group['slowest']) for shape, group in groups.items()}
+        finally:
+            if conn is not None:
+                conn.close()
+        for group in groups.values():
+            plan = plans[group['shape']]
+            full_scans = [m.group(1) for m in (_FULL_SCAN.match(step) for step in plan) if m]
+            report.append({
+                'shape': group['shape'],
+                'count': group['count'],
+                'avgDuration': round(group['totalDuration'] / group['count'], 2),
+                'maxDuration': group['maxDuration'],
+                'lastSeen': group['lastSeen'],
+                'example': {key: group['slowest'][key] for key in ('sql', 'params', 'rows')},
+                'plan': plan,
+                'fullScans': full_scans,
+            })
+        report.sort(key=lambda item: item['maxDuration'], reverse=True)
+        return report
+
+slow_query_log = SlowQueryLog()
+
+def _slow_query_threshold_ns():
+    threshold = current_app.config.get('SLOW_QUERY_MS', SLOW_QUERY_MS) if has_app_context() else SLOW_QUERY_MS
+    return threshold * 1_000_000
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """A cursor that adds its fetch time and row count to its statement's timing.
+
+    The observation is recorded in the query metrics once the cursor is
+    exhausted, closed or garbage collected, so it covers the fetches that
+    do the real work and not just ``execute``.
+    """
+
+    _finished = True
+
+    def _begin(self, sql, parameters, duration_ns, log_entry):
+        self._sql = sql
+        self._parameters = parameters
+        self._duration_ns = duration_ns
+        self._rows = 0
+        self._log_entry = log_entry
+        self._finished = False
+
+    def _add(self, start_ns, rows):
+        self._duration_ns += time.perf_counter_ns() - start_ns
+        self._rows += rows
+        if self._log_entry is not None:
+            self._log_entry['duration'] = round(self._duration_ns / 1e6, 2) # in ms
+            self._log_entry['rows'] = self._rows
+
+    def _finish(self):
+        if self._finished:
+            return
+        self._finished = True
+        query_metrics.observe(self._sql, self._duration_ns, self._rows)
+        if self._duration_ns >= _slow_query_threshold_ns():
+            slow_query_log.record(self._sql, self._parameters, self._duration_ns, self._rows)
+
+    def fetchone(self):
+        start_ns = time.perf_counter_ns()
+        row = super().fetchone()
+        self._add(start_ns, 0 if row is None else 1)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        size = self.arraysize if size is None else size
+        start_ns = time.perf_counter_ns()
+        rows = super().fetchmany(size)
+        self._add(start_ns, len(rows))
+        if len(rows) < size:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start_ns = time.perf_counter_ns()
+        rows = super().fetchall()
+        self._add(start_ns, len(rows))
+        self._finish()
+        return rows
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        self._finish()
 
 class LoggingConnection(sqlite3.Connection):
+    def __init__(self, *args, cached_statements=STATEMENT_CACHE_SIZE, **kwargs):
+        super().__init__(*args, cached_statements=cached_statements, **kwargs)
+        # The SQL texts in sqlite3's statement cache, in LRU order, so hits
+        # can be counted; sqlite3 itself does not report them.
+        self._prepared = OrderedDict()
+        self._prepared_capacity = cached_statements
+
+    def _track_statement(self, sql):
+        prepared = self._prepared
+        if sql in prepared:
+            prepared.move_to_end(sql)
+            statement_cache_stats.record(True)
+            return
+        prepared[sql] = None
+        evicted = len(prepared) > self._prepared_capacity
+        if evicted:
+            prepared.popitem(last=False)
+        statement_cache_stats.record(False, evicted)
+
     def execute(self, sql, parameters=()):
-        start_time = time.time()
-        result = super().execute(sql, parameters)
-        duration = time.time() - start_time
+        self._track_statement(sql)
+        log = _query_log()
+        if log is None and not _sampled():
+            query_metrics.count(sql)
+            return super().execute(sql, parameters)
 
-        if 'query_logs' not in g:
-            g.query_logs = []
+        cursor = self.cursor(InstrumentedCursor)
+        start_ns = time.perf_counter_ns()
+        cursor.execute(sql, parameters)
+        duration_ns = time.perf_counter_ns() - start_ns
 
-        g.query_logs.append({
-            'sql': sql,
-            'params': parameters,
-            'duration': round(duration * 1000, 2) # in ms
-        })
+        entry = None
+        if log is not None:
+            entry = {
+                'sql': sql,
+                'params': parameters,
+                'duration': round(duration_ns / 1e6, 2), # in ms
+                'rows': 0
+            }
+            log.append(entry)
+        cursor._begin(sql, parameters, duration_ns, entry)
+        return cursor
+
+    def executemany(self, sql, seq_of_parameters):
+        self._track_statement(sql)
+        seq_of_parameters = list(seq_of_parameters)
+        log = _query_log()
+        if log is None and not _sampled():
+            query_metrics.count(sql)
+            return super().executemany(sql, seq_of_parameters)
+
+        start_ns = time.perf_counter_ns()
+        result = super().executemany(sql, seq_of_parameters)
+        duration_ns = time.perf_counter_ns() - start_ns
+        query_metrics.observe(sql, duration_ns, len(seq_of_parameters))
+        if duration_ns >= _slow_query_threshold_ns() and seq_of_parameters:
+            slow_query_log.record(sql, seq_of_parameters[0], duration_ns, len(seq_of_parameters))
+
+        if log is not None:
+            log.append({
+                'sql': sql,
+                'params': [],
+                'rows': len(seq_of_parameters),
+                'duration': round(duration_ns / 1e6, 2) # in ms
+            })
 
         return result
 
-def get_db_connection():
-    """Create a database connection."""
-    if 'db' not in g:
-        g.db = sqlite3.connect(
-            DATABASE_PATH,
+class ConnectionPool:
+    """A bounded pool of configured connections, reused across requests.
+
+    Connections are opened lazily, configured once with CONNECTION_PRAGMAS and
+    handed out most-recently-used first so their page caches stay warm. Each
+    checkout runs a cheap health check and replaces broken connections.
+    """
+
+    def __init__(self, path, max_size=POOL_MAX_SIZE, read_only=False):
+        self.path = path
+        self.max_size = max_size
+        self.read_only = read_only
+        self.pid = os.getpid()
+        self.closed = False
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def _database(self):
+        if self.read_only:
+            # A snapshot that never changes: no locks and no change checks.
+            return f'file:{urllib.parse.quote(self.path)}?mode=ro&immutable=1'
+        return self.path
+
+    def _connect(self):
+        database = self._database()
+        pragmas = REPLICA_PRAGMAS if self.read_only else CONNECTION_PRAGMAS
+        conn = sqlite3.connect(
+            database,
             factory=LoggingConnection,
-            detect_types=sqlite3.PARSE_DECLTYPES
+            cached_statements=STATEMENT_CACHE_SIZE,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            check_same_thread=False,
+            uri=self.read_only
         )
-        g.db.row_factory = sqlite3.Row
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        # Use a cursor so setup statements bypass the request query log.
+        cursor = conn.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+        return conn
+
+    def connect_uncached(self):
+        """Open a plain connection to the pool's database, outside the pool.
+
+        It has no statement cache and reads the schema and statistics afresh,
+        where a pooled connection may still hold EXPLAIN output prepared
+        before another connection added an index.
+        """
+        return sqlite3.connect(self._database(), uri=self.read_only, cached_statements=0)
+
+    def _is_healthy(self, conn):
+        try:
+            conn.cursor().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self):
+        """Check out a connection, opening one if none is idle."""
+        if not self._slots.acquire(timeout=POOL_TIMEOUT):
+            raise sqlite3.OperationalError('Timed out waiting for a database connection')
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if self._is_healthy(conn):
+                    return conn
+                conn.close()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding any open transaction."""
+        try:
+            if self.closed:
+                conn.close()
+                return
+            if conn.in_transaction:
+                conn.rollback()
+            self._idle.put(conn)
+        except sqlite3.Error:
+            conn.close()
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Close every idle connection, and the others as they are released."""
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pool = None
+_pool_lock = threading.Lock()
+_stream_slots = threading.BoundedSemaphore(STREAM_MAX_OPEN)
+
+def get_pool():
+    """Return this process's connection pool for DATABASE_PATH."""
+    global _pool
+    pool = _pool
+    # A forked worker must not reuse connections inherited from its parent.
+    if pool is None or pool.path != DATABASE_PATH or pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.path != DATABASE_PATH or _pool.pid != os.getpid():
+                _pool = ConnectionPool(DATABASE_PATH)
+            pool = _pool
+    return pool
+
+def get_db_connection():
+    """Get the request's database connection from the pool.
+
+    Reads routed to a replica (see replica.py) take it from the snapshot's
+    pool instead, and fall back to the primary if the snapshot cannot be opened.
+    """
+    if 'db' not in g:
+        read_pool = g.get('read_pool')
+        if read_pool is not None:
+            try:
+                g.db = read_pool.acquire()
+                return g.db
+            except sqlite3.OperationalError:
+                g.pop('read_pool')
+        g.db = get_pool().acquire()
     return g.db
 
+def release_db_connection(db):
+    """Return a connection to the pool it was taken from."""
+    db.pool.release(db)
+
 def close_db_connection(e=None):
-    """Close the database connection."""
+    """Return the request's database connection to the pool."""
     db = g.pop('db', None)
     if db is not None:
-        db.close()
+        release_db_connection(db)
+
+class WriteTimeout(Exception):
+    """A group-committed write was not started within GROUP_COMMIT_TIMEOUT."""
+
+class WriteCoordinator:
+    """Commits concurrent write requests together in one transaction.
+
+    Requests hand a function of a connection to ``submit`` and block until it
+    has run. One writer thread collects the writes that arrive within
+    ``window_ms`` of the first, runs each in its own savepoint so a failing
+    write only undoes itself, and commits the batch once: one lock
+    acquisition and one WAL sync for many writes. Each caller gets back its
+    function's return value, or its exception re-raised.
+    """
+
+    def __init__(self, window_ms=GROUP_COMMIT_WINDOW_MS, max_batch=GROUP_COMMIT_MAX_BATCH):
+        self.window_ms = window_ms
+        self.max_batch = max_batch
+        self.batches = 0
+        self.writes = 0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._pool = None
+
+    def submit(self, func, timeout=GROUP_COMMIT_TIMEOUT):
+        """Run ``func(conn)`` in the next group commit and return its result.
+
+        Raises WriteTimeout if it has not started within ``timeout`` seconds;
+        it is then cancelled and never runs, so it is safe to retry. A write
+        that has started is waited for, since its batch may still commit.
+        """
+        future = Future()
+        # Run in the caller's context so its query logs and app config apply.
+        self._queue.put((contextvars.copy_context(), func, future))
+        self._ensure_running()
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            if future.cancel():
+                raise WriteTimeout('The write was not started in time and was not applied; try again') from None
+        return future.result()
+
+    def _ensure_running(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='group-commit', daemon=True)
+                self._thread.start()
+
+    def _connection_pool(self):
+        # The writer keeps its own connection so it never waits on requests.
+        pool = self._pool
+        if pool is None or pool.path != DATABASE_PATH or pool.pid != os.getpid():
+            pool = self._pool = ConnectionPool(DATABASE_PATH, max_size=1)
+        return pool
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window_ms / 1000
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        # Writes whose callers timed out were cancelled and are dropped.
+        batch = [item for item in batch if item[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        pool = self._connection_pool()
+        conn = None
+        try:
+            conn = pool.acquire()
+            conn.execute('BEGIN IMMEDIATE')
+            results = []
+            for context, func, future in batch:
+                conn.execute('SAVEPOINT group_write')
+                try:
+                    results.append((future, context.run(func, conn), None))
+                except Exception as e:
+                    conn.execute('ROLLBACK TO group_write')
+                    results.append((future, None, e))
+                conn.execute('RELEASE group_write')
+            conn.commit()
+        except Exception as e:
+            # Nothing in the batch was committed, so every write fails.
+            if conn is not None:
+                conn.rollback()
+            results = [(future, None, e) for _, _, future in batch]
+        finally:
+            if conn is not None:
+                pool.release(conn)
+
+        self.batches += 1
+        self.writes += len(batch)
+        for future, result, error in results:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+write_coordinator = WriteCoordinator()
+
+def run_write(func):
+    """Run ``func(conn)`` as a write transaction and return its result.
+
+    With GROUP_COMMIT enabled the write goes through the write coordinator and
+    is committed together with concurrent writes; otherwise it runs on the
+    request's connection and commits alone. Either way an exception raised by
+    ``func`` rolls back its writes and propagates to the caller. A group
+    commit that does not start in time raises WriteTimeout, and was not applied.
+    """
+    if current_app.config.get('GROUP_COMMIT'):
+        return write_coordinator.submit(func)
+    conn = get_db_connection()
+    try:
+        result = func(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return result
 
 def init_app(app):
     """Initialize the app with the database."""
     app.teardown_appcontext(close_db_connection)
+    write_coordinator.window_ms = app.config.get('GROUP_COMMIT_WINDOW_MS', GROUP_COMMIT_WINDOW_MS)
 
 def create_database():
     """Create the database tables from the schema file."""
@@ -55,6 +676,12 @@ def create_database():
         conn = sqlite3.connect(DATABASE_PATH)
         with open(SCHEMA_PATH, 'r') as f:
             conn.executescript(f.read())
+        for path in (aggregates.AGGREGATES_PATH, VERSIONS_PATH, SEARCH_PATH, CHANGES_PATH):
+            with open(path, 'r') as f:
+                conn.executescript(f.read())
+        aggregates.rebuild_aggregates(conn)
+        # The schema files are always current, so mark every migration as applied.
+        conn.execute(f'PRAGMA user_version = {MIGRATIONS[-1][0]}')
         conn.close()
         print("Database created successfully.")
     except Exception as e:
@@ -63,17 +690,230 @@ def create_database():
         if os.path.exists(DATABASE_PATH):
             os.remove(DATABASE_PATH)
 
-def with_query_logs(response_data, status_code=200):
-    """Add query logs to the response."""
+def explain_query_plans(conn):
+    """Return the EXPLAIN QUERY PLAN details for each of PLAN_QUERIES."""
+    plans = {}
+    for label, sql, params in PLAN_QUERIES:
+        rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+        plans[label] = [row[-1] for row in rows]
+    return plans
+
+def migrate(db_path=None):
+    """Apply pending migrations to an existing database without losing data.
+
+    Each migration runs in its own transaction together with the
+    user_version bump, so an interrupted run can simply be repeated.
+    Query plans are printed before and after so removed table scans can be
+    confirmed. Returns the (before, after) plans.
+    """
+    conn = sqlite3.connect(db_path or DATABASE_PATH)
+    try:
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        pending = [m for m in MIGRATIONS if m[0] > version]
+        if not pending:
+            print(f"Database is up to date (version {version}).")
+            return None
+
+        before = explain_query_plans(conn)
+        for version, description, statements in pending:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                for statement in statements:
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {version}')
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            print(f"Applied migration {version}: {description}")
+        after = explain_query_plans(conn)
+
+        for label, _, _ in PLAN_QUERIES:
+            print(f"{label}:")
+            print(f"  before: {'; '.join(before[label])}")
+            print(f"  after:  {'; '.join(after[label])}")
+        return before, after
+    finally:
+        conn.close()
+
+def with_query_logs(response_data, status_code=200, headers=None):
+    """Add query logs to the response, encoded as the client accepts (see encoding.py)."""
     response = {
         'data': response_data,
-        'query_logs': g.get('query_logs', [])
+        'query_logs': g.get('query_logs') or []
     }
-    return Response(
-        response=jsonify(response).get_data(),
-        status=status_code,
-        mimetype='application/json'
+    return encoded_response(response, status_code, headers)
+
+def requested_stream_format():
+    """Return the streaming format asked for by the request, or None.
+
+    Streaming is selected with ``?format=json|ndjson|csv`` or an ``Accept``
+    header of ``application/x-ndjson`` or ``text/csv``.
+    """
+    fmt = request.args.get('format')
+    if fmt in STREAM_MIMETYPES:
+        return fmt
+    best = request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson', 'text/csv'])
+    if best == 'application/x-ndjson':
+        return 'ndjson'
+    if best == 'text/csv':
+        return 'csv'
+    return None
+
+def _row_builder(keys):
+    if is_nested(keys):
+        return lambda row: nest_record(keys, row)
+    return lambda row: dict(zip(keys, row))
+
+def _batches(cursor, limit, tail):
+    """Yield the cursor's rows in batches, stopping after ``limit`` rows if set.
+
+    Paged queries fetch one row past the limit; when it is there, ``tail``
+    gets ``more`` set. ``tail['last']`` is the last row yielded.
+    """
+    sent = 0
+    while limit is None or sent < limit:
+        rows = cursor.fetchmany(STREAM_BATCH_SIZE if limit is None else min(STREAM_BATCH_SIZE, limit - sent))
+        if not rows:
+            return
+        sent += len(rows)
+        tail['last'] = rows[-1]
+        yield rows
+    tail['more'] = cursor.fetchone() is not None
+
+def _stream_json(batches, keys, trailer):
+    dumps = current_app.json.dumps
+    build = _row_builder(keys)
+    yield '{"data":['
+    first = True
+    for rows in batches:
+        chunk = ','.join(dumps(build(row)) for row in rows)
+        yield chunk if first else ',' + chunk
+        first = False
+    yield '],' + dumps(trailer())[1:]
+
+def _stream_ndjson(batches, keys, trailer):
+    dumps = current_app.json.dumps
+    build = _row_builder(keys)
+    for rows in batches:
+        yield ''.join(dumps(build(row)) + '\n' for row in rows)
+    # The trailer line carries the next cursor and the query logs, as the JSON body does.
+    yield dumps(trailer()) + '\n'
+
+def _stream_csv(batches, keys, trailer):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    for rows in batches:
+        writer.writerows(tuple(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def stream_with_query_logs(cursor, fmt, filename=None, page=None):
+    """Stream the rows of an executed cursor in chunks.
+
+    Rows are read with ``fetchmany`` so memory stays bounded regardless of the
+    result size. JSON and NDJSON bodies end with the query logs; CSV has no
+    place for them and omits them. Expanded relations are nested objects in
+    JSON and NDJSON and ``relation.column`` headers in CSV. At most
+    STREAM_MAX_OPEN streams are open at once; others are answered with 429.
+
+    ``page`` is the ListQuery the cursor was built from. The header is sent
+    before the rows, so instead of X-Next-Cursor, JSON and NDJSON bodies end
+    with a ``nextCursor`` (null on the last page).
+    """
+    if not _stream_slots.acquire(blocking=False):
+        return with_query_logs({'error': 'Too many downloads are running; try again shortly'}, 429)
+    cursor.row_factory = None
+    keys = cursor_keys(cursor)
+    generators = {'json': _stream_json, 'ndjson': _stream_ndjson, 'csv': _stream_csv}
+    logs = g.get('query_logs') or []
+    tail = {}
+    batches = _batches(cursor, page.limit if page is not None else None, tail)
+
+    def trailer():
+        fields = {}
+        if page is not None:
+            last = tail.get('last') if tail.get('more') else None
+            fields['nextCursor'] = None if last is None else page.cursor_for(_row_builder(keys)(last))
+        fields['query_logs'] = logs
+        return fields
+
+    # The app context is torn down before the body is sent, so the stream
+    # takes ownership of the connection and releases it once exhausted.
+    conn = g.pop('db', None)
+    released = []
+
+    def release():
+        if not released:
+            released.append(True)
+            if conn is not None:
+                release_db_connection(conn)
+            _stream_slots.release()
+
+    def generate():
+        try:
+            yield from generators[fmt](batches, keys, trailer)
+        finally:
+            release()
+
+    headers = {}
+    if fmt == 'csv' and filename:
+        headers['Content-Disposition'] = f'attachment; filename={filename}.csv'
+    response = Response(
+        stream_with_context(generate()),
+        headers=headers,
+        mimetype=STREAM_MIMETYPES[fmt]
     )
+    # Also run when the body is never started: HEAD requests, or clients
+    # that go away before the first chunk.
+    response.call_on_close(release)
+    return response
+
+def rebuild_aggregates(db_path=None):
+    """Recompute the analytics summary tables from the base tables."""
+    conn = sqlite3.connect(db_path or DATABASE_PATH)
+    try:
+        aggregates.rebuild_aggregates(conn)
+        print("Aggregates rebuilt.")
+    finally:
+        conn.close()
+
+def check_aggregates(db_path=None):
+    """Report summary tables that disagree with the base tables."""
+    conn = sqlite3.connect(db_path or DATABASE_PATH)
+    try:
+        problems = aggregates.check_aggregates(conn)
+    finally:
+        conn.close()
+    if not problems:
+        print("All aggregates are consistent.")
+    for table, rows in problems.items():
+        print(f"{table}: {len(rows['missing'])} missing, {len(rows['unexpected'])} unexpected")
+    return problems
+
+def rebuild_search(db_path=None):
+    """Rebuild the full-text search indexes from the base tables."""
+    conn = sqlite3.connect(db_path or DATABASE_PATH)
+    try:
+        with conn:
+            for table in SEARCH_TABLES:
+                conn.execute(f"INSERT INTO {table} ({table}) VALUES ('rebuild')")
+        print("Search indexes rebuilt.")
+    finally:
+        conn.close()
+
+COMMANDS = {
+    'migrate': migrate,
+    'rebuild-aggregates': rebuild_aggregates,
+    'check-aggregates': check_aggregates,
+    'rebuild-search': rebuild_search,
+}
 
 if __name__ == '__main__':
-    create_database()
+    if len(sys.argv) > 1:
+        COMMANDS[sys.argv[1]]()
+    else:
+        create_database()
@@ -0,0 +1,35 @@
+from flask import Blueprint, current_app
+from backend.db import SLOW_QUERY_MS, STATEMENT_CACHE_SIZE, get_db_connection, slow_query_log, with_query_logs
+from backend.metrics import statement_cache_stats
+from backend.repository import statement_count
+
+bp = Blueprint('debug', __name__, url_prefix='/api/debug')
+
+@bp.route('/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """Get recent slow statements grouped by shape, with their query plans."""
+    return with_query_logs({
+        'thresholdMs': current_app.config.get('SLOW_QUERY_MS', SLOW_QUERY_MS),
+        'queries': slow_query_log.report(get_db_connection().pool),
+    })
+
+@bp.route('/slow-queries', methods=['DELETE'])
+def clear_slow_queries():
+    """Clear the slow query log."""
+    slow_query_log.clear()
+    return with_query_logs({'message': 'Slow query log cleared'}, 200)
+
+@bp.route('/statement-cache', methods=['GET'])
+def get_statement_cache():
+    """Get prepared statement cache hits and misses for this process."""
+    return with_query_logs({
+        'capacity': STATEMENT_CACHE_SIZE,
+        'generatedStatements': statement_count(),
+        **statement_cache_stats.snapshot(),
+    })
+
+@bp.route('/statement-cache', methods=['DELETE'])
+def clear_statement_cache_stats():
+    """Reset the statement cache counters."""
+    statement_cache_stats.clear()
+    return with_query_logs({'message': 'Statement cache stats cleared'}, 200)
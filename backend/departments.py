@@ -1,21 +1,35 @@
+import sqlite3
 from flask import Blueprint, request
-from backend.db import get_db_connection, with_query_logs
-from backend.utils import format_record, format_records
+from backend.cache import cached
+from backend.db import WriteTimeout, get_db_connection, requested_stream_format, run_write, stream_with_query_logs, with_query_logs
+from backend.repository import REPOSITORIES
+from backend.utils import fetch_records, format_record
 
 bp = Blueprint('departments', __name__, url_prefix='/api/departments')
 
+repository = REPOSITORIES['departments']
+
 @bp.route('/', methods=['GET'])
+@cached('departments')
 def get_departments():
-    """Get all departments."""
+    """Get departments, optionally filtered, sorted, projected and paginated."""
+    try:
+        query = repository.list_query()
+    except ValueError as e:
+        return with_query_logs({'error': str(e)}, 400)
+
     conn = get_db_connection()
-    departments = conn.execute('SELECT * FROM departments').fetchall()
-    return with_query_logs(format_records(departments))
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_with_query_logs(conn.execute(*query.build()), stream_format, filename='departments', page=query)
+    departments, headers = query.paginate(fetch_records(conn.execute(*query.build())))
+    return with_query_logs(departments, headers=headers)
 
 @bp.route('/<int:id>', methods=['GET'])
+@cached('departments')
 def get_department(id):
     """Get a single department by ID."""
-    conn = get_db_connection()
-    department = conn.execute('SELECT * FROM departments WHERE id = ?', (id,)).fetchone()
+    department = repository.get(get_db_connection(), id)
     if department is None:
         return with_query_logs({'error': 'Department not found'}, 404)
     return with_query_logs(format_record(department))
@@ -24,67 +38,52 @@ def get_department(id):
 def create_department():
     """Create a new department."""
     data = request.get_json()
-    if not data or not 'name' in data:
+    if not data or repository.missing(data):
         return with_query_logs({'error': 'Missing required fields'}, 400)
 
-    conn = get_db_connection()
     try:
-        cursor = conn.execute(
-            'INSERT INTO departments (name, head) VALUES (?, ?)',
-            (data['name'], data.get('head'))
-        )
-        conn.commit()
-        new_department_id = cursor.lastrowid
-
-        new_department = conn.execute('SELECT * FROM departments WHERE id = ?', (new_department_id,)).fetchone()
-        return with_query_logs(format_record(new_department), 201)
-    except conn.IntegrityError:
+        new_department = run_write(lambda conn: repository.create(conn, data))
+    except sqlite3.IntegrityError:
         return with_query_logs({'error': 'Department name already exists'}, 409)
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    return with_query_logs(format_record(new_department), 201)
 
-@bp.route('/<int:id>', methods=['PUT'])
+@bp.route('/bulk', methods=['POST'])
+def bulk_create_departments():
+    """Create or update many departments in one transaction."""
+    return repository.bulk_upsert()
+
+@bp.route('/<int:id>', methods=['PUT', 'PATCH'])
 def update_department(id):
-    """Update an existing department."""
+    """Update the given fields of an existing department."""
     data = request.get_json()
     if not data:
         return with_query_logs({'error': 'No data provided'}, 400)
 
-    conn = get_db_connection()
     try:
-        department = conn.execute('SELECT * FROM departments WHERE id = ?', (id,)).fetchone()
-        if department is None:
-            return with_query_logs({'error': 'Department not found'}, 404)
-
-        update_fields = {
-            'name': data.get('name', department['name']),
-            'head': data.get('head', department['head'])
-        }
-
-        conn.execute(
-            'UPDATE departments SET name = ?, head = ? WHERE id = ?',
-            (update_fields['name'], update_fields['head'], id)
-        )
-        conn.commit()
-
-        updated_department = conn.execute('SELECT * FROM departments WHERE id = ?', (id,)).fetchone()
-        return with_query_logs(format_record(updated_department))
-    except conn.IntegrityError:
+        updated_department = run_write(lambda conn: repository.update(conn, id, data))
+    except sqlite3.IntegrityError:
         return with_query_logs({'error': 'Department name already exists'}, 409)
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    if updated_department is None:
+        return with_query_logs({'error': 'Department not found'}, 404)
+    return with_query_logs(format_record(updated_department))
 
 @bp.route('/<int:id>', methods=['DELETE'])
 def delete_department(id):
     """Delete a department."""
-    conn = get_db_connection()
     try:
-        department = conn.execute('SELECT * FROM departments WHERE id = ?', (id,)).fetchone()
-        if department is None:
-            return with_query_logs({'error': 'Department not found'}, 404)
-
-        conn.execute('DELETE FROM departments WHERE id = ?', (id,))
-        conn.commit()
-        return with_query_logs({'message': 'Department deleted successfully'}, 200)
+        deleted = run_write(lambda conn: repository.delete(conn, id))
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    if not deleted:
+        return with_query_logs({'error': 'Department not found'}, 404)
+    return with_query_logs({'message': 'Department deleted successfully'}, 200)
@@ -0,0 +1,141 @@
+import gzip
+import zlib
+from operator import itemgetter
+from flask import current_app, request, Response
+
+try:
+    import zstandard
+except ImportError:  # Optional: zstd compression when installed.
+    zstandard = None
+
+try:
+    import msgpack
+except ImportError:  # Optional: MessagePack bodies when installed.
+    msgpack = None
+
+COLUMNS_MIMETYPE = 'application/vnd.columns+json'
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# Smaller bodies are sent as they are; the framing would eat most of the gain.
+MIN_COMPRESS_BYTES = 1024
+# Level 3 gets most of level 6's ratio on list bodies at about half the CPU.
+GZIP_LEVEL = 3
+ZSTD_LEVEL = 3
+
+def _representations():
+    offered = {'json': 'application/json', 'columns': COLUMNS_MIMETYPE}
+    if msgpack is not None:
+        offered['msgpack'] = MSGPACK_MIMETYPE
+    return offered
+
+def requested_representation():
+    """Return the body representation asked for: 'json', 'columns' or 'msgpack'.
+
+    Selected with ``?format=columns|msgpack`` or the ``Accept`` header;
+    'msgpack' is only offered when the msgpack package is installed.
+    """
+    offered = _representations()
+    fmt = request.args.get('format')
+    if fmt in offered:
+        return fmt
+    best = request.accept_mimetypes.best_match(list(offered.values()))
+    for name, mimetype in offered.items():
+        if mimetype == best:
+            return name
+    return 'json'
+
+def requested_encoding():
+    """Return the content coding the client accepts, 'zstd' or 'gzip', or None."""
+    offered = ('zstd', 'gzip') if zstandard is not None else ('gzip',)
+    return request.accept_encodings.best_match(offered)
+
+def columnar(data):
+    """Turn a list of records into ``{"columns": [...], "rows": [[...], ...]}``.
+
+    Keys are sent once instead of on every row. Anything other than a list of
+    records is returned unchanged.
+    """
+    if not isinstance(data, list) or not all(isinstance(record, dict) for record in data[:1]):
+        return data
+    columns = list(data[0]) if data else []
+    if len(columns) == 1:
+        rows = [[record[columns[0]]] for record in data]
+    elif columns:
+        get = itemgetter(*columns)
+        rows = [get(record) for record in data]
+    else:
+        rows = [[] for _ in data]
+    return {'columns': columns, 'rows': rows}
+
+def encoded_response(body, status_code=200, headers=None):
+    """Build a response for ``body`` in the representation the client asked for.
+
+    The ``data`` of 'columns' and 'msgpack' bodies is made columnar; the rest
+    of the body is encoded as it is.
+    """
+    representation = requested_representation()
+    if representation != 'json':
+        body = dict(body, data=columnar(body['data']))
+    if representation == 'msgpack':
+        response = Response(msgpack.packb(body, default=str), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = current_app.json.response(body)
+        if representation == 'columns':
+            response.mimetype = COLUMNS_MIMETYPE
+    response.status_code = status_code
+    if headers:
+        response.headers.update(headers)
+    response.vary.add('Accept')
+    return response
+
+def compress(data, encoding):
+    if encoding == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, GZIP_LEVEL, mtime=0)
+
+def _compress_stream(chunks, encoding):
+    # Each chunk is flushed, so clients still receive rows as they are read.
+    if encoding == 'zstd':
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+        flush_block = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        flush_block = zlib.Z_SYNC_FLUSH
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            yield compressor.compress(chunk) + compressor.flush(flush_block)
+        yield compressor.flush()
+    finally:
+        # The wrapped stream releases its database connection when closed.
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+def compress_response(response):
+    """Compress the body with the negotiated content coding, in place.
+
+    Streamed bodies are compressed chunk by chunk. Event streams, small
+    bodies and bodies that already have a Content-Encoding are left alone.
+    """
+    response.vary.add('Accept-Encoding')
+    encoding = requested_encoding()
+    if (encoding is None or request.method == 'HEAD' or response.status_code in (204, 304)
+            or response.direct_passthrough or 'Content-Encoding' in response.headers
+            or response.mimetype == 'text/event-stream'):
+        return response
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < MIN_COMPRESS_BYTES:
+            return response
+        response.set_data(compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def init_app(app):
+    """Compress every response the client accepts compressed."""
+    app.after_request(compress_response)
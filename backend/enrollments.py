@@ -1,21 +1,34 @@
 from flask import Blueprint, request
-from backend.db import get_db_connection, with_query_logs
-from backend.utils import format_record, format_records
+from backend.cache import cached
+from backend.db import WriteTimeout, get_db_connection, requested_stream_format, run_write, stream_with_query_logs, with_query_logs
+from backend.repository import REPOSITORIES
+from backend.utils import fetch_records, format_record
 
 bp = Blueprint('enrollments', __name__, url_prefix='/api/enrollments')
 
+repository = REPOSITORIES['enrollments']
+
 @bp.route('/', methods=['GET'])
+@cached('enrollments', relations=repository.relations)
 def get_enrollments():
-    """Get all enrollments."""
+    """Get enrollments, optionally filtered, sorted, projected, paginated and expanded."""
+    try:
+        query = repository.list_query()
+    except ValueError as e:
+        return with_query_logs({'error': str(e)}, 400)
+
     conn = get_db_connection()
-    enrollments = conn.execute('SELECT * FROM enrollments').fetchall()
-    return with_query_logs(format_records(enrollments))
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_with_query_logs(conn.execute(*query.build()), stream_format, filename='enrollments', page=query)
+    enrollments, headers = query.paginate(fetch_records(conn.execute(*query.build())))
+    return with_query_logs(enrollments, headers=headers)
 
 @bp.route('/<int:id>', methods=['GET'])
+@cached('enrollments')
 def get_enrollment(id):
     """Get a single enrollment by ID."""
-    conn = get_db_connection()
-    enrollment = conn.execute('SELECT * FROM enrollments WHERE id = ?', (id,)).fetchone()
+    enrollment = repository.get(get_db_connection(), id)
     if enrollment is None:
         return with_query_logs({'error': 'Enrollment not found'}, 404)
     return with_query_logs(format_record(enrollment))
@@ -24,64 +37,48 @@ def get_enrollment(id):
 def create_enrollment():
     """Create a new enrollment."""
     data = request.get_json()
-    if not data or not 'studentId' in data or not 'courseCode' in data:
+    if not data or repository.missing(data):
         return with_query_logs({'error': 'Missing required fields'}, 400)
 
-    conn = get_db_connection()
     try:
-        cursor = conn.execute(
-            'INSERT INTO enrollments (student_id, course_code, grade) VALUES (?, ?, ?)',
-            (data['studentId'], data['courseCode'], data.get('grade'))
-        )
-        conn.commit()
-        new_enrollment_id = cursor.lastrowid
-
-        new_enrollment = conn.execute('SELECT * FROM enrollments WHERE id = ?', (new_enrollment_id,)).fetchone()
-        return with_query_logs(format_record(new_enrollment), 201)
+        new_enrollment = run_write(lambda conn: repository.create(conn, data))
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    return with_query_logs(format_record(new_enrollment), 201)
 
-@bp.route('/<int:id>', methods=['PUT'])
+@bp.route('/bulk', methods=['POST'])
+def bulk_create_enrollments():
+    """Create or update many enrollments in one transaction."""
+    return repository.bulk_upsert()
+
+@bp.route('/<int:id>', methods=['PUT', 'PATCH'])
 def update_enrollment(id):
-    """Update an existing enrollment."""
+    """Update the given fields of an existing enrollment."""
     data = request.get_json()
     if not data:
         return with_query_logs({'error': 'No data provided'}, 400)
 
-    conn = get_db_connection()
     try:
-        enrollment = conn.execute('SELECT * FROM enrollments WHERE id = ?', (id,)).fetchone()
-        if enrollment is None:
-            return with_query_logs({'error': 'Enrollment not found'}, 404)
-
-        update_fields = {
-            'studentId': data.get('studentId', enrollment['student_id']),
-            'courseCode': data.get('courseCode', enrollment['course_code']),
-            'grade': data.get('grade', enrollment['grade'])
-        }
-
-        conn.execute(
-            'UPDATE enrollments SET student_id = ?, course_code = ?, grade = ? WHERE id = ?',
-            (update_fields['studentId'], update_fields['courseCode'], update_fields['grade'], id)
-        )
-        conn.commit()
-
-        updated_enrollment = conn.execute('SELECT * FROM enrollments WHERE id = ?', (id,)).fetchone()
-        return with_query_logs(format_record(updated_enrollment))
+        updated_enrollment = run_write(lambda conn: repository.update(conn, id, data))
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    if updated_enrollment is None:
+        return with_query_logs({'error': 'Enrollment not found'}, 404)
+    return with_query_logs(format_record(updated_enrollment))
 
 @bp.route('/<int:id>', methods=['DELETE'])
 def delete_enrollment(id):
     """Delete an enrollment."""
-    conn = get_db_connection()
     try:
-        enrollment = conn.execute('SELECT * FROM enrollments WHERE id = ?', (id,)).fetchone()
-        if enrollment is None:
-            return with_query_logs({'error': 'Enrollment not found'}, 404)
-
-        conn.execute('DELETE FROM enrollments WHERE id = ?', (id,))
-        conn.commit()
-        return with_query_logs({'message': 'Enrollment deleted successfully'}, 200)
+        deleted = run_write(lambda conn: repository.delete(conn, id))
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    if not deleted:
+        return with_query_logs({'error': 'Enrollment not found'}, 404)
+    return with_query_logs({'message': 'Enrollment deleted successfully'}, 200)
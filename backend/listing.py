@@ -0,0 +1,282 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import date
+from flask import request
+from backend.utils import to_camel_case
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# A to-one join available through ``?expand=<name>``: rows of ``table`` whose
+# ``key`` equals this table's ``column``. ``columns`` are those it may return.
+Relation = namedtuple('Relation', ('table', 'column', 'key', 'columns'))
+
+
+def requested_relations(relations, args=None):
+    """Returns the relation names a request expands, in request order.
+
+    A relation is expanded when listed in ``expand`` or when ``fields`` names
+    one of its columns as ``relation.column``. Unknown names are ignored here;
+    ListQuery rejects them.
+    """
+    args = request.args if args is None else args
+    names = [name.strip() for name in args.get('expand', '').split(',') if name.strip()]
+    for field in args.get('fields', '').split(','):
+        if '.' in field:
+            names.append(field.split('.', 1)[0].strip())
+    return [name for name in dict.fromkeys(names) if name in (relations or {})]
+
+
+def encode_cursor(value, key):
+    """Encodes a (sort value, key) pair as an opaque URL-safe cursor."""
+    if isinstance(value, date):
+        # Timestamps come back parsed; compare against the stored text form.
+        value = str(value)
+    raw = json.dumps([value, key], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _bindable(value):
+    return value is None or isinstance(value, (str, int, float))
+
+
+def decode_cursor(token, key_parts=1):
+    """Decodes a cursor produced by encode_cursor.
+
+    The sort value and key must be strings, numbers or null; a compound key
+    of ``key_parts`` values is a list. Raises ValueError for anything else,
+    so a tampered cursor never reaches the database.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (binascii.Error, ValueError, TypeError, UnicodeError):
+        raise ValueError('Invalid cursor')
+    if not isinstance(decoded, list) or len(decoded) != 2:
+        raise ValueError('Invalid cursor')
+    value, key = decoded
+    keys = [key] if key_parts == 1 else key
+    if not isinstance(keys, list) or len(keys) != key_parts or not all(map(_bindable, [value, *keys])):
+        raise ValueError('Invalid cursor')
+    return value, key
+
+
+class ListQuery:
+    """A validated list request: projection, filters, ordering and keyset cursor.
+
+    Query string parameters (column names may be given in snake_case or camelCase):
+
+    * ``fields=a,b``   -- return only these columns (the key is always included)
+    * ``<column>=v``   -- equality filter on one of the table's indexed columns
+    * ``sort=col``     -- order by an indexed column, ``-col`` for descending
+    * ``limit=n``      -- page size, capped at MAX_PAGE_SIZE
+    * ``after=c``      -- keyset cursor from the previous page's X-Next-Cursor
+      (or ``nextCursor`` at the end of a streamed page)
+    * ``expand=r,s``   -- join these ``relations`` into the same query; each
+      comes back as a nested object, and ``fields=r.col`` projects its columns
+
+    Without ``limit`` or ``after`` the whole table is returned, as before.
+    """
+
+    def __init__(self, table, columns, key='id', key_type=int, filterable=(), args=None, relations=None):
+        self.table = table
+        self.columns = tuple(columns)
+        self.key = key
+        self.key_type = key_type
+        self.filterable = tuple(filterable)
+        self.relations = relations or {}
+        self.args = request.args if args is None else args
+
+        self.names = {}
+        for column in self.columns:
+            self.names[column] = column
+            self.names[to_camel_case(column)] = column
+
+        self.expand = self._parse_expand()
+        self.related_fields = {}
+        self.fields = self._parse_fields()
+        self.filters = self._parse_filters()
+        self.sort, self.descending = self._parse_sort()
+        self.limit = self._parse_limit()
+        self.cursor = self._parse_cursor()
+
+    def _column(self, name):
+        column = self.names.get(name.strip())
+        if column is None:
+            raise ValueError(f'Unknown column: {name}')
+        return column
+
+    def _parse_expand(self):
+        expand = self.args.get('expand')
+        if not expand:
+            return []
+        names = []
+        for name in expand.split(','):
+            name = name.strip()
+            if name not in self.relations:
+                raise ValueError(f'Cannot expand: {name}')
+            if name not in names:
+                names.append(name)
+        return names
+
+    def _related_field(self, name):
+        relation_name, field = name.strip().split('.', 1)
+        relation = self.relations.get(relation_name)
+        if relation is None:
+            raise ValueError(f'Cannot expand: {relation_name}')
+        for column in relation.columns:
+            if field in (column, to_camel_case(column)):
+                break
+        else:
+            raise ValueError(f'Unknown column: {name}')
+        if relation_name not in self.expand:
+            self.expand.append(relation_name)
+        selected = self.related_fields.setdefault(relation_name, [relation.key])
+        if column not in selected:
+            selected.append(column)
+
+    def _parse_fields(self):
+        fields = self.args.get('fields')
+        if not fields:
+            return list(self.columns)
+        selected = [self.key]
+        for name in fields.split(','):
+            if '.' in name:
+                self._related_field(name)
+                continue
+            column = self._column(name)
+            if column not in selected:
+                selected.append(column)
+        return selected
+
+    def _parse_filters(self):
+        filters = []
+        for name in self.args:
+            column = self.names.get(name)
+            if column is None:
+                continue
+            if column not in self.filterable and column != self.key:
+                raise ValueError(f'Cannot filter on column: {name}')
+            filters.append((column, self.args.get(name)))
+        return filters
+
+    def _parse_sort(self):
+        sort = self.args.get('sort')
+        if not sort:
+            return self.key, False
+        descending = sort.startswith('-')
+        column = self._column(sort.lstrip('-'))
+        if column not in self.filterable and column != self.key:
+            raise ValueError(f'Cannot sort on column: {sort.lstrip("-")}')
+        if column not in self.fields:
+            self.fields.append(column)
+        return column, descending
+
+    def _parse_limit(self):
+        limit = self.args.get('limit')
+        if limit is None:
+            return DEFAULT_PAGE_SIZE if 'after' in self.args else None
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be an integer')
+        if limit < 1:
+            raise ValueError('limit must be positive')
+        return min(limit, MAX_PAGE_SIZE)
+
+    def _parse_cursor(self):
+        after = self.args.get('after')
+        if after is None:
+            return None
+        if self.sort == self.key:
+            try:
+                return None, self.key_type(after)
+            except ValueError:
+                raise ValueError('Invalid cursor')
+        return decode_cursor(after)
+
+    def _qualified(self, column):
+        # Joined relations share column names such as id, so qualify ours.
+        return f'{self.table}.{column}' if self.expand else column
+
+    def _keyset_clause(self):
+        value, key = self.cursor
+        op = '<' if self.descending else '>'
+        sort = self._qualified(self.sort)
+        key_column = self._qualified(self.key)
+        if self.sort == self.key:
+            return f'{key_column} {op} ?', [key]
+        if value is None:
+            # NULLs sort first ascending and last descending.
+            if self.descending:
+                return f'({sort} IS NULL AND {key_column} < ?)', [key]
+            return f'(({sort} IS NULL AND {key_column} > ?) OR {sort} IS NOT NULL)', [key]
+        clause = f'({sort} {op} ? OR ({sort} = ? AND {key_column} {op} ?)'
+        if self.descending:
+            clause += f' OR {sort} IS NULL'
+        return clause + ')', [value, value, key]
+
+    def _from_clause(self):
+        """Returns the selected columns and FROM clause, with any joins.
+
+        Each expanded relation is a LEFT JOIN aliased by its name; its columns
+        are returned as ``relation.column`` and nested by fetch_records.
+        """
+        columns = [self._qualified(column) for column in self.fields]
+        joins = []
+        for name in self.expand:
+            relation = self.relations[name]
+            for column in self.related_fields.get(name, relation.columns):
+                columns.append(f'{name}.{column} AS "{name}.{column}"')
+            joins.append(
+                f' LEFT JOIN {relation.table} AS {name} '
+                f'ON {name}.{relation.key} = {self.table}.{relation.column}'
+            )
+        return f'{", ".join(columns)} FROM {self.table}' + ''.join(joins)
+
+    def build(self):
+        """Returns the (sql, params) pair for this page."""
+        conditions = []
+        params = []
+        for column, value in self.filters:
+            conditions.append(f'{self._qualified(column)} = ?')
+            params.append(value)
+        if self.cursor is not None:
+            clause, clause_params = self._keyset_clause()
+            conditions.append(clause)
+            params.extend(clause_params)
+
+        sql = f'SELECT {self._from_clause()}'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        direction = ' DESC' if self.descending else ''
+        sort = self._qualified(self.sort)
+        key = self._qualified(self.key)
+        if self.sort == self.key:
+            sql += f' ORDER BY {key}{direction}'
+        else:
+            sql += f' ORDER BY {sort}{direction}, {key}{direction}'
+        if self.limit is not None:
+            # Fetch one extra row to learn whether another page exists.
+            sql += ' LIMIT ?'
+            params.append(self.limit + 1)
+        return sql, params
+
+    def paginate(self, records):
+        """Trims the look-ahead record and returns (records, response headers).
+
+        ``records`` are the camelCase dictionaries built by fetch_records.
+        """
+        if self.limit is None or len(records) <= self.limit:
+            return records, {}
+        records = records[:self.limit]
+        return records, {'X-Next-Cursor': self.cursor_for(records[-1])}
+
+    def cursor_for(self, record):
+        """Returns the cursor for the page after ``record``, a camelCase dictionary."""
+        key = record[to_camel_case(self.key)]
+        if self.sort == self.key:
+            return str(key)
+        return encode_cursor(record[to_camel_case(self.sort)], key)
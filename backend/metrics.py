@@ -0,0 +1,178 @@
+import re
+import threading
+from collections import deque
+from functools import lru_cache
+from flask import Blueprint, Response
+
+bp = Blueprint('metrics', __name__, url_prefix='/api/metrics')
+
+# Durations kept per statement for quantile estimates.
+RESERVOIR_SIZE = 1024
+# Distinct statements tracked; anything beyond is folded into 'other'.
+MAX_STATEMENTS = 500
+QUANTILES = (0.5, 0.95, 0.99)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\?(?:\s*,\s*\?)+')
+
+# Statement texts are a small, fixed set, so each is normalized only once.
+@lru_cache(maxsize=1024)
+def normalize_statement(sql):
+    """Reduces a statement to its shape: literals become ?, whitespace collapses.
+
+    Statements that differ only in parameters or formatting share one series.
+    """
+    shape = _STRING_LITERAL.sub('?', sql)
+    shape = _NUMBER_LITERAL.sub('?', shape)
+    shape = _PLACEHOLDER_LIST.sub('?, ...', shape)
+    return ' '.join(shape.split())
+
+class StatementStats:
+    __slots__ = ('count', 'sampled', 'duration_ns', 'rows', 'durations')
+
+    def __init__(self):
+        self.count = 0
+        self.sampled = 0
+        self.duration_ns = 0
+        self.rows = 0
+        self.durations = deque(maxlen=RESERVOIR_SIZE)
+
+class QueryMetrics:
+    """Per-statement query counters and duration summaries for this process."""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _get(self, statement):
+        stats = self._stats.get(statement)
+        if stats is None:
+            if len(self._stats) >= MAX_STATEMENTS:
+                statement = 'other'
+                stats = self._stats.get(statement)
+            if stats is None:
+                stats = self._stats[statement] = StatementStats()
+        return stats
+
+    def count(self, sql):
+        """Counts an execution that was not sampled for timing."""
+        statement = normalize_statement(sql)
+        with self._lock:
+            self._get(statement).count += 1
+
+    def observe(self, sql, duration_ns, rows):
+        """Records a sampled execution with its execute+fetch time and row count."""
+        statement = normalize_statement(sql)
+        with self._lock:
+            stats = self._get(statement)
+            stats.count += 1
+            stats.sampled += 1
+            stats.duration_ns += duration_ns
+            stats.rows += rows
+            stats.durations.append(duration_ns)
+
+    def snapshot(self):
+        """Returns {statement: dict} with counts, totals and quantiles in seconds."""
+        with self._lock:
+            items = [(s, st.count, st.sampled, st.duration_ns, st.rows, sorted(st.durations))
+                     for s, st in self._stats.items()]
+        result = {}
+        for statement, count, sampled, duration_ns, rows, durations in items:
+            quantiles = {}
+            for q in QUANTILES:
+                if durations:
+                    index = min(len(durations) - 1, int(q * len(durations)))
+                    quantiles[q] = durations[index] / 1e9
+            result[statement] = {
+                'count': count,
+                'sampled': sampled,
+                'duration_seconds': duration_ns / 1e9,
+                'rows': rows,
+                'quantiles': quantiles,
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+query_metrics = QueryMetrics()
+
+class StatementCacheStats:
+    """Counts prepared statement cache hits and misses across connections."""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def record(self, hit, evicted=False):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if evicted:
+                self.evictions += 1
+
+    def snapshot(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': round(self.hits / total, 4) if total else None,
+            }
+
+    def clear(self):
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+statement_cache_stats = StatementCacheStats()
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_prometheus(snapshot, statement_cache=None):
+    """Renders a QueryMetrics snapshot in the Prometheus text exposition format.
+
+    ``statement_cache`` is a StatementCacheStats snapshot, added as counters.
+    """
+    lines = [
+        '# HELP sqlite_queries_total Statements executed, sampled or not.',
+        '# TYPE sqlite_queries_total counter',
+    ]
+    for statement, stats in snapshot.items():
+        lines.append(f'sqlite_queries_total{{statement="{_label(statement)}"}} {stats["count"]}')
+    lines += [
+        '# HELP sqlite_query_rows_total Rows fetched by sampled statements.',
+        '# TYPE sqlite_query_rows_total counter',
+    ]
+    for statement, stats in snapshot.items():
+        lines.append(f'sqlite_query_rows_total{{statement="{_label(statement)}"}} {stats["rows"]}')
+    lines += [
+        '# HELP sqlite_query_duration_seconds Execute plus fetch time of sampled statements.',
+        '# TYPE sqlite_query_duration_seconds summary',
+    ]
+    for statement, stats in snapshot.items():
+        label = _label(statement)
+        for q, value in stats['quantiles'].items():
+            lines.append(f'sqlite_query_duration_seconds{{statement="{label}",quantile="{q}"}} {value:.9f}')
+        lines.append(f'sqlite_query_duration_seconds_sum{{statement="{label}"}} {stats["duration_seconds"]:.9f}')
+        lines.append(f'sqlite_query_duration_seconds_count{{statement="{label}"}} {stats["sampled"]}')
+    if statement_cache is not None:
+        for name in ('hits', 'misses', 'evictions'):
+            lines += [
+                f'# HELP sqlite_statement_cache_{name}_total Prepared statement cache {name}.',
+                f'# TYPE sqlite_statement_cache_{name}_total counter',
+                f'sqlite_statement_cache_{name}_total {statement_cache[name]}',
+            ]
+    return '\n'.join(lines) + '\n'
+
+@bp.route('/', methods=['GET'])
+def get_metrics():
+    """Expose query metrics in the Prometheus text format."""
+    return Response(render_prometheus(query_metrics.snapshot(), statement_cache_stats.snapshot()), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,246 @@
+import csv
+import io
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from flask import Blueprint, current_app, request, Response, stream_with_context
+from backend import db
+from backend.db import query_logs_requested, requested_stream_format, with_query_logs
+from backend.replica import max_staleness, replicas
+
+bp = Blueprint('query', __name__, url_prefix='/api/query')
+
+# Wall-clock budget per query, covering planning, execution and streaming.
+QUERY_TIMEOUT_MS = int(os.environ.get('QUERY_TIMEOUT_MS', 5000))
+# Rows returned at most; the response says when more were available.
+QUERY_MAX_ROWS = int(os.environ.get('QUERY_MAX_ROWS', 10_000))
+# Queries running at once per worker; more are answered with 429, so ad-hoc
+# work never holds more than this many threads.
+QUERY_MAX_CONCURRENT = int(os.environ.get('QUERY_MAX_CONCURRENT', 2))
+QUERY_MAX_SQL_LENGTH = 20_000
+# VM instructions between checks of the time budget.
+QUERY_PROGRESS_STEPS = 10_000
+# Largest string or blob a query may build, in bytes.
+QUERY_MAX_VALUE_BYTES = 10_000_000
+
+# Settings for query connections: no writes even if the authorizer missed
+# one, and sorts that spill to disk rather than grow the process.
+QUERY_PRAGMAS = (
+    'PRAGMA query_only = ON',
+    'PRAGMA cache_size = -20000',
+    'PRAGMA temp_store = FILE',
+)
+
+# What a query may do: read tables and call SQL functions, including in
+# recursive CTEs. Writes, schema changes, ATTACH, transactions and most
+# pragmas are refused before the statement runs.
+ALLOWED_ACTIONS = frozenset((
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+))
+# Pragmas that only describe the schema.
+ALLOWED_PRAGMAS = frozenset((
+    'table_info', 'table_xinfo', 'table_list', 'index_list', 'index_info', 'index_xinfo',
+    'foreign_key_list',
+))
+DENIED_FUNCTIONS = frozenset(('load_extension',))
+
+_slots = threading.BoundedSemaphore(QUERY_MAX_CONCURRENT)
+
+
+def authorize(action, arg1, arg2, database, trigger):
+    """sqlite3 authorizer callback admitting ALLOWED_ACTIONS only."""
+    if action == sqlite3.SQLITE_PRAGMA:
+        # arg2 is set when the pragma assigns a value.
+        return sqlite3.SQLITE_OK if arg1.lower() in ALLOWED_PRAGMAS and arg2 is None else sqlite3.SQLITE_DENY
+    if action == sqlite3.SQLITE_FUNCTION and arg2.lower() in DENIED_FUNCTIONS:
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK if action in ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def _database():
+    """The database file to query and whether it is a replica snapshot.
+
+    A fresh replica snapshot is preferred (see replica.py), so long reads do
+    not hold back WAL checkpoints on the primary.
+    """
+    directory = current_app.config.get('REPLICA_DIR')
+    if directory:
+        manifest, _ = replicas.current(directory)
+        if manifest is not None and time.time() - manifest['asOf'] <= max_staleness():
+            path = os.path.join(directory, manifest['snapshot'])
+            return f'file:{urllib.parse.quote(path)}?mode=ro&immutable=1', 'replica'
+    return f'file:{urllib.parse.quote(db.DATABASE_PATH)}?mode=ro', 'primary'
+
+
+def open_query_connection(deadline):
+    """Open a read-only connection that stops any statement past ``deadline``.
+
+    The connection is separate from the request pools, so its statements
+    stay out of the query metrics and statement cache.
+    """
+    uri, source = _database()
+    conn = sqlite3.connect(uri, uri=True, isolation_level=None, check_same_thread=False)
+    for pragma in QUERY_PRAGMAS:
+        conn.execute(pragma)
+    conn.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, 0)
+    conn.setlimit(sqlite3.SQLITE_LIMIT_LENGTH, QUERY_MAX_VALUE_BYTES)
+    conn.setlimit(sqlite3.SQLITE_LIMIT_SQL_LENGTH, QUERY_MAX_SQL_LENGTH)
+    conn.set_authorizer(authorize)
+    # A true return value interrupts the running statement.
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, QUERY_PROGRESS_STEPS)
+    return conn, source
+
+
+def _query_request():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError('Expected a JSON object with "sql"')
+    sql = data.get('sql')
+    if not isinstance(sql, str) or not sql.strip():
+        raise ValueError('sql is required')
+    if len(sql) > QUERY_MAX_SQL_LENGTH:
+        raise ValueError(f'sql must be at most {QUERY_MAX_SQL_LENGTH} characters')
+    params = data.get('params', [])
+    if not isinstance(params, (list, dict)):
+        raise ValueError('params must be an array or an object')
+    limit = data.get('limit', QUERY_MAX_ROWS)
+    timeout_ms = data.get('timeoutMs', QUERY_TIMEOUT_MS)
+    for name, value in (('limit', limit), ('timeoutMs', timeout_ms)):
+        if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+            raise ValueError(f'{name} must be a positive integer')
+    return sql.strip(), params, min(limit, QUERY_MAX_ROWS), min(timeout_ms, QUERY_TIMEOUT_MS)
+
+
+def _error_status(error, timeout_ms):
+    message = str(error)
+    if message == 'interrupted':
+        # Not 408 or 504, which clients and proxies may retry automatically.
+        return f'Query exceeded its time budget of {timeout_ms} ms; narrow it or raise timeoutMs', 422
+    if message.startswith(('not authorized', 'authorization denied', 'access to ')):
+        return 'Only read-only SELECT statements are allowed', 403
+    return message, 400
+
+
+def _jsonable(row):
+    return [value.hex() if isinstance(value, bytes) else value for value in row]
+
+
+def _stream_json(result, logs):
+    dumps = current_app.json.dumps
+    yield '{"data":{"columns":' + dumps(result['columns']) + ',"plan":' + dumps(result['plan'])
+    yield ',"source":' + dumps(result['source']) + ',"rows":['
+    first = True
+    for rows in result['batches']:
+        chunk = ','.join(dumps(_jsonable(row)) for row in rows)
+        yield chunk if first else ',' + chunk
+        first = False
+    trailer = {key: result[key] for key in ('rowCount', 'truncated', 'duration', 'error')}
+    yield '],' + dumps(trailer)[1:] + ',"query_logs":' + dumps(logs) + '}'
+
+
+def _stream_csv(result, logs):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(result['columns'])
+    for rows in result['batches']:
+        writer.writerows(_jsonable(row) for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+@bp.route('/', methods=['POST'])
+def run_query():
+    """Run one read-only statement and stream its rows.
+
+    The body is ``{"sql", "params"?, "limit"?, "timeoutMs"?}``. The statement
+    runs on its own read-only connection under an authorizer that admits
+    only reads, and is interrupted once ``timeoutMs`` (at most
+    QUERY_TIMEOUT_MS) has passed. At most ``limit`` (at most QUERY_MAX_ROWS)
+    rows are returned. The JSON response carries the columns, the query plan
+    and the rows, then ``rowCount``, ``truncated``, ``duration`` and an
+    ``error`` if the budget ran out mid-stream; the statement is in the
+    query logs when they are requested. ``format=csv`` streams the
+    rows as CSV instead.
+    """
+    try:
+        sql, params, limit, timeout_ms = _query_request()
+    except ValueError as e:
+        return with_query_logs({'error': str(e)}, 400)
+    if not _slots.acquire(blocking=False):
+        return with_query_logs({'error': 'Too many queries are running; try again shortly'}, 429)
+
+    start = time.monotonic()
+    conn = None
+    try:
+        conn, source = open_query_connection(start + timeout_ms / 1000)
+        plan = [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()]
+        cursor = conn.execute(sql, params)
+        columns = [d[0] for d in cursor.description or ()]
+        first = cursor.fetchmany(min(limit, db.STREAM_BATCH_SIZE))
+    except (sqlite3.Error, sqlite3.Warning) as e:
+        if conn is not None:
+            conn.close()
+        _slots.release()
+        message, status = _error_status(e, timeout_ms)
+        return with_query_logs({'error': message}, status)
+    except BaseException:
+        if conn is not None:
+            conn.close()
+        _slots.release()
+        raise
+
+    result = {'columns': columns, 'plan': plan, 'source': source,
+              'rowCount': 0, 'truncated': False, 'duration': 0, 'error': None}
+
+    def batches():
+        # Counts rows as they are sent and stops at the row cap or the budget.
+        rows = first
+        try:
+            while rows:
+                result['rowCount'] += len(rows)
+                yield rows
+                remaining = limit - result['rowCount']
+                if remaining <= 0:
+                    result['truncated'] = cursor.fetchone() is not None
+                    break
+                rows = cursor.fetchmany(min(remaining, db.STREAM_BATCH_SIZE))
+        except sqlite3.Error as e:
+            result['error'], _ = _error_status(e, timeout_ms)
+            result['truncated'] = True
+        result['duration'] = round((time.monotonic() - start) * 1000, 2)
+        if log_queries:
+            logs.append({'sql': sql, 'params': params, 'duration': result['duration'], 'rows': result['rowCount']})
+
+    result['batches'] = batches()
+    # Logged only on request, as for every other endpoint.
+    log_queries = query_logs_requested()
+    logs = []
+    fmt = 'csv' if requested_stream_format() == 'csv' else 'json'
+    generate_format = _stream_csv if fmt == 'csv' else _stream_json
+
+    closed = []
+
+    def close():
+        if not closed:
+            closed.append(True)
+            conn.close()
+            _slots.release()
+
+    def generate():
+        try:
+            yield from generate_format(result, logs)
+        finally:
+            close()
+
+    headers = {'Content-Disposition': 'attachment; filename=query.csv'} if fmt == 'csv' else {}
+    response = Response(stream_with_context(generate()), headers=headers, mimetype=db.STREAM_MIMETYPES[fmt])
+    # Also run when the client goes away before the body is started.
+    response.call_on_close(close)
+    return response
@@ -0,0 +1,322 @@
+"""Read replicas: immutable snapshots of the primary database for GET requests.
+
+A publisher copies the primary into a new snapshot file with the online
+backup API and then points ``manifest.json`` in the replica directory at it.
+Workers open the snapshot named by the manifest read-only and immutable, so
+SQLite takes no locks and never checks the file for changes, and serve
+read-only requests from it while it is fresh enough. The directory can be
+local to one machine or copied to others (snapshot first, manifest last).
+
+    python -m backend.replica publish --dir /var/lib/sql-insight/replicas
+    python -m backend.replica snapshot --dir /var/lib/sql-insight/replicas
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, request
+from backend import db
+
+try:
+    import fcntl
+except ImportError:  # Not on Windows; every process then publishes.
+    fcntl = None
+
+MANIFEST = 'manifest.json'
+# Seconds between publishes. Unchanged databases only refresh the manifest.
+REPLICA_PUBLISH_INTERVAL = 1.0
+# Seconds a snapshot may lag the primary and still serve reads.
+REPLICA_MAX_STALENESS = 5.0
+# Seconds a worker reuses the manifest it read last.
+REPLICA_CHECK_INTERVAL = 0.25
+# Snapshots kept on disk. Older ones are deleted; connections already open
+# on them keep working, and new reads have moved to a newer snapshot.
+REPLICA_KEEP = 3
+
+READ_METHODS = ('GET', 'HEAD')
+
+
+def read_manifest(directory):
+    """Return the manifest of ``directory``, or None if nothing is published."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(directory, manifest):
+    # Written beside the manifest and renamed over it, so readers never see half of it.
+    path = os.path.join(directory, MANIFEST)
+    with open(path + '.partial', 'w') as f:
+        json.dump(manifest, f)
+    os.replace(path + '.partial', path)
+
+
+def _prune(directory, keep):
+    snapshots = sorted(name for name in os.listdir(directory)
+                       if name.startswith('snapshot-') and name.endswith('.db'))
+    for name in snapshots[:-keep]:
+        os.remove(os.path.join(directory, name))
+
+
+def create_snapshot(source, directory):
+    """Copy the connection ``source`` into a new snapshot file in ``directory``.
+
+    The backup runs in one step, so it reads a single consistent state of the
+    primary; under WAL that does not block its writers. Returns the manifest
+    entries for the snapshot, without publishing it.
+    """
+    os.makedirs(directory, exist_ok=True)
+    as_of = time.time()
+    name = f'snapshot-{time.time_ns()}.db'
+    partial = os.path.join(directory, name + '.partial')
+    target = sqlite3.connect(partial)
+    try:
+        source.backup(target)
+        # Immutable readers cannot use a WAL, so the copy is a plain rollback-journal file.
+        target.execute('PRAGMA journal_mode = DELETE')
+        try:
+            seq = target.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+        except sqlite3.OperationalError:
+            seq = None
+    except BaseException:
+        target.close()
+        os.remove(partial)
+        raise
+    target.close()
+    os.replace(partial, os.path.join(directory, name))
+    return {'snapshot': name, 'seq': seq, 'createdAt': as_of, 'asOf': as_of}
+
+
+class ReplicaPublisher:
+    """Publishes snapshots of DATABASE_PATH to a replica directory.
+
+    A new snapshot is only taken when the primary changed since the last
+    one, which PRAGMA data_version on a connection kept open for the purpose
+    reports; otherwise the manifest's ``asOf`` is moved forward, since the
+    snapshot is still current. When several processes run a publisher for
+    the same directory, a lock file lets one of them publish at a time.
+    """
+
+    def __init__(self, directory=None, interval=REPLICA_PUBLISH_INTERVAL, keep=REPLICA_KEEP):
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.published = 0
+        self._conn = None
+        self._path = None
+        self._data_version = None
+        self._manifest = None
+        self._lock_file = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _source(self):
+        if self._conn is None or self._path != db.DATABASE_PATH:
+            if self._conn is not None:
+                self._conn.close()
+            self._path = db.DATABASE_PATH
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._data_version = None
+        return self._conn
+
+    def _holds_lock(self):
+        if fcntl is None:
+            return True
+        if self._lock_file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            lock_file = open(os.path.join(self.directory, 'publisher.lock'), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+        return True
+
+    def publish(self):
+        """Publish a snapshot if the primary changed; return the manifest written."""
+        source = self._source()
+        checked_at = time.time()
+        data_version = source.execute('PRAGMA data_version').fetchone()[0]
+        if self._manifest is not None and data_version == self._data_version:
+            manifest = dict(self._manifest, asOf=checked_at)
+        else:
+            manifest = create_snapshot(source, self.directory)
+            self.published += 1
+        _write_manifest(self.directory, manifest)
+        if self._manifest is None or manifest['snapshot'] != self._manifest['snapshot']:
+            _prune(self.directory, self.keep)
+        self._manifest = manifest
+        self._data_version = data_version
+        return manifest
+
+    def run(self):
+        """Publish every ``interval`` seconds while this process holds the lock."""
+        while True:
+            try:
+                if self._holds_lock():
+                    self.publish()
+            except (sqlite3.Error, OSError) as e:
+                # Readers fall back to the primary once the snapshot is stale.
+                print(f'Replica publish failed: {e}', file=sys.stderr)
+                self._conn = None
+            time.sleep(self.interval)
+
+    def start(self):
+        """Start publishing in a background thread, once per process."""
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is None or self._pid != os.getpid():
+                # A forked child must not share the parent's connection or lock.
+                self._conn = None
+                if self._lock_file is not None:
+                    self._lock_file.close()
+                    self._lock_file = None
+                self._manifest = None
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self.run, name='replica-publisher', daemon=True)
+                self._thread.start()
+
+
+publisher = ReplicaPublisher()
+
+
+class ReplicaSet:
+    """This process's view of the replica directory.
+
+    Holds a read-only connection pool on the published snapshot, replacing
+    it when the manifest names a newer one. The manifest is read at most
+    every REPLICA_CHECK_INTERVAL seconds.
+    """
+
+    def __init__(self):
+        self.manifest = None
+        self.pool = None
+        self._directory = None
+        self._checked = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def current(self, directory):
+        """Return ``(manifest, pool)`` for the published snapshot, or ``(None, None)``."""
+        now = time.monotonic()
+        if (now - self._checked < REPLICA_CHECK_INTERVAL and directory == self._directory
+                and self._pid == os.getpid()):
+            return self.manifest, self.pool
+        with self._lock:
+            if self._pid != os.getpid():
+                # Connections inherited from the parent process are not reused.
+                self.manifest = self.pool = None
+                self._pid = os.getpid()
+            manifest = read_manifest(directory)
+            old = self.pool
+            if manifest is None:
+                self.pool = None
+            elif old is None or self.manifest is None or manifest['snapshot'] != self.manifest['snapshot']:
+                path = os.path.join(directory, manifest['snapshot'])
+                self.pool = db.ConnectionPool(path, read_only=True)
+            if old is not None and old is not self.pool:
+                old.close()
+            self.manifest = manifest
+            self._directory = directory
+            self._checked = now
+            return self.manifest, self.pool
+
+
+replicas = ReplicaSet()
+
+
+def primary(view):
+    """Always serve ``view`` from the primary, e.g. when clients need the newest data."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return view(*args, **kwargs)
+    wrapper.reads_primary = True
+    return wrapper
+
+
+def max_staleness():
+    """The staleness this request accepts: REPLICA_MAX_STALENESS, or less if
+    the client sent ``X-Max-Staleness`` (0 reads the primary)."""
+    limit = current_app.config.get('REPLICA_MAX_STALENESS', REPLICA_MAX_STALENESS)
+    try:
+        return min(limit, float(request.headers.get('X-Max-Staleness', limit)))
+    except ValueError:
+        return limit
+
+
+def route_read():
+    """Send read-only requests to the replica pool while the snapshot is fresh."""
+    directory = current_app.config.get('REPLICA_DIR')
+    if not directory:
+        return
+    if current_app.config.get('REPLICA_PUBLISH'):
+        publisher.directory = directory
+        publisher.interval = current_app.config.get('REPLICA_PUBLISH_INTERVAL', REPLICA_PUBLISH_INTERVAL)
+        publisher.start()
+    view = current_app.view_functions.get(request.endpoint)
+    if request.method not in READ_METHODS or getattr(view, 'reads_primary', False):
+        return
+    manifest, pool = replicas.current(directory)
+    if pool is None:
+        return
+    age = max(0.0, time.time() - manifest['asOf'])
+    if age <= max_staleness():
+        g.read_pool = pool
+        g.replica_age = age
+        g.replica_seq = manifest.get('seq')
+
+
+def add_replica_header(response):
+    # Unset when the read fell back to the primary (see db.get_db_connection).
+    if g.get('read_pool') is not None:
+        response.headers['X-Replica-Age'] = f'{g.replica_age:.3f}'
+        # The change log position the snapshot reflects, to sync from.
+        if g.replica_seq is not None:
+            response.headers['X-Replica-Seq'] = str(g.replica_seq)
+    return response
+
+
+def init_app(app):
+    """Route GET and HEAD requests to replicas when REPLICA_DIR is set."""
+    app.before_request(route_read)
+    app.after_request(add_replica_header)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m backend.replica', description=__doc__.split('\n')[0])
+    parser.add_argument('command', choices=('publish', 'snapshot'),
+                        help='publish continuously, or publish one snapshot and exit')
+    parser.add_argument('--dir', default=os.environ.get('REPLICA_DIR'), required='REPLICA_DIR' not in os.environ,
+                        help='replica directory (default: $REPLICA_DIR)')
+    parser.add_argument('--path', default=db.DATABASE_PATH, help='primary database')
+    parser.add_argument('--interval', type=float, default=REPLICA_PUBLISH_INTERVAL, help='seconds between publishes')
+    parser.add_argument('--keep', type=int, default=REPLICA_KEEP, help='snapshots kept on disk')
+    args = parser.parse_args(argv)
+
+    db.DATABASE_PATH = args.path
+    runner = ReplicaPublisher(args.dir, args.interval, args.keep)
+    if args.command == 'snapshot':
+        manifest = runner.publish()
+        print(f'Published {manifest["snapshot"]} (change log seq {manifest["seq"]}).')
+        return 0
+    if not runner._holds_lock():
+        print(f'Another process is publishing to {args.dir}.')
+        return 1
+    print(f'Publishing snapshots of {args.path} to {args.dir} every {args.interval:g}s.')
+    try:
+        runner.run()
+    except KeyboardInterrupt:
+        return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+import sqlite3
+from backend import bulk
+from backend.db import SCHEMA_PATH
+from backend.listing import ListQuery, Relation
+from backend.utils import to_camel_case
+
+
+class Table:
+    """What the API needs to know about one table, read from its definition.
+
+    * ``key``        -- the primary key column; ``key_type`` converts path values
+    * ``writable``   -- columns a create sets: all but a rowid key and columns
+      with a default, which the database fills in
+    * ``required``   -- writable columns that are NOT NULL or the key
+    * ``updatable``  -- writable columns other than the key
+    * ``filterable`` -- columns leading an index, usable as equality filters
+    * ``conflict_key`` -- the first UNIQUE column, else the key; bulk writes
+      that match it update the existing row
+    * ``foreign_keys`` -- column -> (table, column)
+    """
+
+    def __init__(self, conn, name):
+        info = conn.execute(f'PRAGMA table_info({name})').fetchall()
+        self.name = name
+        self.columns = tuple(row[1] for row in info)
+        key = next(row for row in info if row[5])
+        self.key = key[1]
+        self.key_type = int if key[2].upper() == 'INTEGER' else str
+        rowid_key = self.key_type is int
+        self.writable = tuple(
+            row[1] for row in info if row[4] is None and not (row[5] and rowid_key)
+        )
+        self.required = tuple(row[1] for row in info if row[1] in self.writable and (row[3] or row[5]))
+        self.updatable = tuple(c for c in self.writable if c != self.key)
+
+        leading = set()
+        unique = []
+        for index in conn.execute(f'PRAGMA index_list({name})').fetchall():
+            columns = [row[2] for row in conn.execute(f'PRAGMA index_info({index[1]})').fetchall()]
+            leading.add(columns[0])
+            if index[2] and index[3] == 'u' and len(columns) == 1:
+                unique.append(columns[0])
+        self.filterable = tuple(c for c in self.columns if c in leading and c != self.key)
+        self.conflict_key = next((c for c in self.columns if c in unique), self.key)
+        self.bulk_columns = self.writable
+        if self.conflict_key not in self.writable:
+            self.bulk_columns = (self.conflict_key, *self.writable)
+
+        foreign_keys = {row[3]: (row[2], row[4]) for row in conn.execute(f'PRAGMA foreign_key_list({name})')}
+        self.foreign_keys = {c: foreign_keys[c] for c in self.columns if c in foreign_keys}
+
+
+def load_tables(path=SCHEMA_PATH):
+    """Read every table in a schema file by loading it into a scratch database."""
+    conn = sqlite3.connect(':memory:')
+    try:
+        with open(path, 'r') as f:
+            conn.executescript(f.read())
+        names = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY rowid"
+        )]
+        return {name: Table(conn, name) for name in names}
+    finally:
+        conn.close()
+
+
+class Repository:
+    """Reads and writes the rows of one table.
+
+    Every statement is built once from the table's metadata, so each has a
+    single SQL text and stays prepared in the connection's statement cache.
+    Partial updates and bulk upserts get one statement per set of columns,
+    built on first use.
+    """
+
+    def __init__(self, table, tables):
+        self.table = table
+        t = table
+        self.relations = {
+            # department_id -> department, course_code -> course
+            column.rsplit('_', 1)[0]: Relation(target, column, target_key, tables[target].columns)
+            for column, (target, target_key) in t.foreign_keys.items()
+        }
+        placeholders = ', '.join('?' for _ in t.writable)
+        self.select_sql = f'SELECT * FROM {t.name} WHERE {t.key} = ?'
+        self.insert_sql = f'INSERT INTO {t.name} ({", ".join(t.writable)}) VALUES ({placeholders}) RETURNING *'
+        self.delete_sql = f'DELETE FROM {t.name} WHERE {t.key} = ?'
+        self._update_sql = {}
+        self._upsert_sql = {}
+
+    def update_sql(self, columns):
+        sql = self._update_sql.get(columns)
+        if sql is None:
+            assignments = ', '.join(f'{c} = ?' for c in columns)
+            sql = f'UPDATE {self.table.name} SET {assignments} WHERE {self.table.key} = ? RETURNING *'
+            self._update_sql[columns] = sql
+        return sql
+
+    def upsert_sql(self, columns):
+        sql = self._upsert_sql.get(columns)
+        if sql is None:
+            t = self.table
+            sql = bulk.upsert_sql(t.name, t.bulk_columns, t.conflict_key, columns)
+            self._upsert_sql[columns] = sql
+        return sql
+
+    def statement_count(self):
+        """How many distinct statements this repository can issue."""
+        t = self.table
+        # Bulk upserts always set the required columns and any of the others.
+        optional = [c for c in t.bulk_columns if c != t.conflict_key and c not in t.required]
+        return 3 + 2 ** len(optional) + 2 ** len(t.updatable) - 1
+
+    def missing(self, data):
+        """The camelCase names of required fields absent from ``data``."""
+        return [to_camel_case(c) for c in self.table.required if to_camel_case(c) not in data]
+
+    def list_query(self, args=None):
+        """A ListQuery over this table and its relations; raises ValueError."""
+        t = self.table
+        return ListQuery(t.name, t.columns, key=t.key, key_type=t.key_type,
+                         filterable=t.filterable, args=args, relations=self.relations)
+
+    def get(self, conn, key):
+        return conn.execute(self.select_sql, (key,)).fetchone()
+
+    def create(self, conn, data):
+        """Insert a row from camelCase ``data`` and return it."""
+        return conn.execute(self.insert_sql, [data.get(to_camel_case(c)) for c in self.table.writable]).fetchone()
+
+    def update(self, conn, key, data):
+        """Set the updatable fields present in ``data``; return the row, or None if missing."""
+        columns = tuple(c for c in self.table.updatable if to_camel_case(c) in data)
+        if not columns:
+            return self.get(conn, key)
+        params = [data[to_camel_case(c)] for c in columns]
+        params.append(key)
+        return conn.execute(self.update_sql(columns), params).fetchone()
+
+    def delete(self, conn, key):
+        """Delete a row and return how many were deleted."""
+        return conn.execute(self.delete_sql, (key,)).rowcount
+
+    def bulk_upsert(self):
+        """Upsert the request's records; see bulk.bulk_upsert."""
+        t = self.table
+        return bulk.bulk_upsert(t.name, t.bulk_columns, t.required, t.conflict_key, statement=self.upsert_sql)
+
+
+TABLES = load_tables()
+REPOSITORIES = {name: Repository(table, TABLES) for name, table in TABLES.items()}
+
+
+def statement_count():
+    """How many distinct statements the repositories can issue in total."""
+    return sum(repository.statement_count() for repository in REPOSITORIES.values())
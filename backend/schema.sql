@@ -57,3 +57,13 @@ CREATE TABLE enrollments (
     FOREIGN KEY (student_id) REFERENCES students (id),
     FOREIGN KEY (course_code) REFERENCES courses (code)
 );
+
+-- Indexes for the foreign key and date access paths (migration 1)
+CREATE INDEX idx_students_department_id ON students (department_id);
+CREATE INDEX idx_students_enrollment_year ON students (enrollment_year);
+CREATE INDEX idx_faculty_department_id ON faculty (department_id);
+CREATE INDEX idx_courses_department_id ON courses (department_id);
+CREATE INDEX idx_courses_faculty_id ON courses (faculty_id);
+CREATE INDEX idx_enrollments_student_id ON enrollments (student_id, course_code);
+CREATE INDEX idx_enrollments_course_code ON enrollments (course_code, student_id);
+CREATE INDEX idx_enrollments_enrolled_at ON enrollments (enrolled_at);
@@ -0,0 +1,137 @@
+import re
+from collections import namedtuple
+from flask import Blueprint, request
+from backend.cache import cached
+from backend.db import get_db_connection, with_query_logs
+from backend.listing import decode_cursor, encode_cursor
+from backend.utils import fetch_records
+
+bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+# A table indexed by search.sql: its FTS5 table, the base table column its
+# rowid maps to, its key, and the title and detail shown in mixed results.
+Searchable = namedtuple('Searchable', ('fts', 'rowid', 'key', 'title', 'detail'))
+
+SEARCHABLE = {
+    'students': Searchable(
+        'students_fts', 'id', 'id', "students.first_name || ' ' || students.last_name", 'students.email'),
+    'faculty': Searchable(
+        'faculty_fts', 'id', 'id', "faculty.first_name || ' ' || faculty.last_name", 'faculty.designation'),
+    'courses': Searchable(
+        'courses_fts', 'rowid', 'code', "courses.code || ' ' || courses.name", 'courses.description'),
+}
+
+_TOKEN = re.compile(r'\w+')
+
+
+def match_expression(q):
+    """Turns free text into an FTS5 query matching every word as a prefix.
+
+    Only word characters are kept, so user input can never be parsed as FTS5
+    syntax: ``ali smi`` becomes ``"ali"* "smi"*``.
+    """
+    tokens = _TOKEN.findall(q or '')
+    if not tokens:
+        raise ValueError('q must contain at least one word')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _limit():
+    limit = request.args.get('limit', DEFAULT_SEARCH_LIMIT)
+    try:
+        limit = int(limit)
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be positive')
+    return min(limit, MAX_SEARCH_LIMIT)
+
+
+def _page(sql, params, limit, cursor_of):
+    """Runs a ranked query with a keyset cursor and look-ahead row."""
+    conn = get_db_connection()
+    records = fetch_records(conn.execute(sql + ' LIMIT ?', (*params, limit + 1)))
+    if len(records) <= limit:
+        return records, {}
+    records = records[:limit]
+    return records, {'X-Next-Cursor': encode_cursor(*cursor_of(records[-1]))}
+
+
+@bp.route('/', methods=['GET'])
+@cached('students', 'faculty', 'courses')
+def search():
+    """Search students, faculty and courses, best matches first.
+
+    ``types=students,courses`` restricts the tables searched. Each result has
+    its ``type``, ``id`` (a course's code), a ``title``, a ``detail`` line and
+    its bm25 ``rank``, where lower is better.
+    """
+    try:
+        match = match_expression(request.args.get('q'))
+        limit = _limit()
+        types = request.args.get('types')
+        types = [t.strip() for t in types.split(',')] if types else list(SEARCHABLE)
+        for t in types:
+            if t not in SEARCHABLE:
+                raise ValueError(f'Cannot search: {t}')
+        after = request.args.get('after')
+        # Mixed results resume after a (rank, [type, id]) position.
+        after = decode_cursor(after, key_parts=2) if after else None
+    except ValueError as e:
+        return with_query_logs({'error': str(e)}, 400)
+
+    selects = []
+    params = []
+    for t in types:
+        s = SEARCHABLE[t]
+        selects.append(
+            f"SELECT '{t}' AS type, {t}.{s.key} AS id, {s.title} AS title, {s.detail} AS detail, "
+            f'{s.fts}.rank AS rank FROM {s.fts} JOIN {t} ON {t}.{s.rowid} = {s.fts}.rowid '
+            f'WHERE {s.fts} MATCH ?'
+        )
+        params.append(match)
+    sql = f'SELECT * FROM ({" UNION ALL ".join(selects)})'
+    if after is not None:
+        rank, (type_, id_) = after
+        sql += ' WHERE (rank, type, id) > (?, ?, ?)'
+        params += [rank, type_, id_]
+    sql += ' ORDER BY rank, type, id'
+
+    results, headers = _page(sql, params, limit, lambda r: (r['rank'], [r['type'], r['id']]))
+    return with_query_logs(results, headers=headers)
+
+
+@bp.route('/<table>', methods=['GET'])
+@cached('students', 'faculty', 'courses')
+def search_table(table):
+    """Search one table and return its full records, best matches first.
+
+    Each record carries its bm25 ``searchRank``; pass the X-Next-Cursor
+    header back as ``after`` for the next page.
+    """
+    s = SEARCHABLE.get(table)
+    if s is None:
+        return with_query_logs({'error': f'Cannot search: {table}'}, 404)
+    try:
+        match = match_expression(request.args.get('q'))
+        limit = _limit()
+        after = request.args.get('after')
+        after = decode_cursor(after) if after else None
+    except ValueError as e:
+        return with_query_logs({'error': str(e)}, 400)
+
+    sql = (
+        f'SELECT * FROM (SELECT {table}.*, {s.fts}.rank AS search_rank FROM {s.fts} '
+        f'JOIN {table} ON {table}.{s.rowid} = {s.fts}.rowid WHERE {s.fts} MATCH ?)'
+    )
+    params = [match]
+    if after is not None:
+        sql += f' WHERE (search_rank, {s.key}) > (?, ?)'
+        params += list(after)
+    sql += f' ORDER BY search_rank, {s.key}'
+
+    records, headers = _page(sql, params, limit, lambda r: (r['searchRank'], r[s.key]))
+    return with_query_logs(records, headers=headers)
@@ -0,0 +1,84 @@
+-- Full-text indexes for /api/search. Each FTS5 table indexes the text columns
+-- of its base table without storing a second copy (external content), and the
+-- triggers below keep it in step with every insert, update and delete.
+-- Courses have no INTEGER PRIMARY KEY, so their index is keyed by rowid,
+-- which VACUUM may renumber; run `python -m backend.db rebuild-search` after
+-- a VACUUM. Every statement is idempotent; see MIGRATIONS in db.py.
+
+CREATE VIRTUAL TABLE IF NOT EXISTS students_fts USING fts5(
+    first_name, last_name, email,
+    content='students', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS faculty_fts USING fts5(
+    first_name, last_name, email, designation,
+    content='faculty', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+    code, name, description,
+    content='courses', content_rowid='rowid',
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS search_students_insert AFTER INSERT ON students
+BEGIN
+    INSERT INTO students_fts (rowid, first_name, last_name, email)
+    VALUES (new.id, new.first_name, new.last_name, new.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_students_update AFTER UPDATE OF id, first_name, last_name, email ON students
+BEGIN
+    INSERT INTO students_fts (students_fts, rowid, first_name, last_name, email)
+    VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+    INSERT INTO students_fts (rowid, first_name, last_name, email)
+    VALUES (new.id, new.first_name, new.last_name, new.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_students_delete AFTER DELETE ON students
+BEGIN
+    INSERT INTO students_fts (students_fts, rowid, first_name, last_name, email)
+    VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_faculty_insert AFTER INSERT ON faculty
+BEGIN
+    INSERT INTO faculty_fts (rowid, first_name, last_name, email, designation)
+    VALUES (new.id, new.first_name, new.last_name, new.email, new.designation);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_faculty_update AFTER UPDATE OF id, first_name, last_name, email, designation ON faculty
+BEGIN
+    INSERT INTO faculty_fts (faculty_fts, rowid, first_name, last_name, email, designation)
+    VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.designation);
+    INSERT INTO faculty_fts (rowid, first_name, last_name, email, designation)
+    VALUES (new.id, new.first_name, new.last_name, new.email, new.designation);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_faculty_delete AFTER DELETE ON faculty
+BEGIN
+    INSERT INTO faculty_fts (faculty_fts, rowid, first_name, last_name, email, designation)
+    VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.designation);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_courses_insert AFTER INSERT ON courses
+BEGIN
+    INSERT INTO courses_fts (rowid, code, name, description)
+    VALUES (new.rowid, new.code, new.name, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_courses_update AFTER UPDATE OF code, name, description ON courses
+BEGIN
+    INSERT INTO courses_fts (courses_fts, rowid, code, name, description)
+    VALUES ('delete', old.rowid, old.code, old.name, old.description);
+    INSERT INTO courses_fts (rowid, code, name, description)
+    VALUES (new.rowid, new.code, new.name, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS search_courses_delete AFTER DELETE ON courses
+BEGIN
+    INSERT INTO courses_fts (courses_fts, rowid, code, name, description)
+    VALUES ('delete', old.rowid, old.code, old.name, old.description);
+END;
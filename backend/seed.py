@@ -0,0 +1,214 @@
+"""Generate a new database filled with synthetic, referentially consistent data.
+
+    python -m backend.seed --enrollments 1000000 [--path backend/database.db]
+
+Every student belongs to a department, takes distinct courses mostly from
+that department and is enrolled from their enrollment year on; courses are
+taught by faculty of their own department. The data is deterministic for a
+given --seed.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from itertools import islice
+from backend import db
+
+# Rows per executemany call; bounds the memory used by the row generators.
+SEED_BATCH_SIZE = 50_000
+
+# Pragmas for the load only: the file is new and is deleted if the load fails,
+# so there is nothing a crash could corrupt that would need the journal.
+LOAD_PRAGMAS = (
+    'PRAGMA journal_mode = OFF',
+    'PRAGMA synchronous = OFF',
+    'PRAGMA locking_mode = EXCLUSIVE',
+    'PRAGMA cache_size = -262144',
+    'PRAGMA temp_store = MEMORY',
+)
+
+DEPARTMENTS = (
+    'Computer Science', 'Mathematics', 'Physics', 'Chemistry', 'Biology', 'Economics', 'History',
+    'Philosophy', 'Psychology', 'English', 'Electrical Engineering', 'Mechanical Engineering',
+    'Civil Engineering', 'Statistics', 'Linguistics', 'Sociology', 'Political Science', 'Music',
+    'Fine Arts', 'Geography',
+)
+FIRST_NAMES = (
+    'Aarav', 'Ada', 'Alan', 'Amara', 'Ananya', 'Barbara', 'Carlos', 'Chen', 'Diego', 'Donald', 'Edsger',
+    'Elena', 'Emma', 'Fatima', 'Frances', 'Grace', 'Hana', 'Ibrahim', 'Isabel', 'Jamal', 'John', 'Ken',
+    'Kenji', 'Leila', 'Liam', 'Lucia', 'Maria', 'Mei', 'Mohammed', 'Noah', 'Olivia', 'Omar', 'Priya',
+    'Radia', 'Rahul', 'Sara', 'Sofia', 'Tim', 'Wei', 'Yuki', 'Zara', 'Zoe',
+)
+LAST_NAMES = (
+    'Adams', 'Ali', 'Allen', 'Brown', 'Chen', 'Dijkstra', 'Garcia', 'Gupta', 'Hopper', 'Ivanova', 'Johnson',
+    'Kim', 'Knuth', 'Kowalski', 'Lee', 'Liskov', 'Lopez', 'Lovelace', 'Martin', 'Nguyen', 'Okafor', 'Patel',
+    'Perlman', 'Rossi', 'Sato', 'Schmidt', 'Silva', 'Singh', 'Smith', 'Tanaka', 'Thompson', 'Turing',
+    'Wang', 'Williams', 'Yilmaz', 'Zhang',
+)
+DESIGNATIONS = ('Professor', 'Associate Professor', 'Assistant Professor', 'Lecturer')
+COURSE_TOPICS = (
+    'Foundations', 'Methods', 'Theory', 'Laboratory', 'Seminar', 'Topics', 'Analysis', 'Design',
+    'Systems', 'Research', 'Applications', 'History',
+)
+# Grades with their relative frequency; None is a course still in progress.
+GRADES = ('A+', 'A', 'A-', 'B+', 'B', 'B-', 'C+', 'C', 'C-', 'D+', 'D', 'D-', 'F', None)
+GRADE_WEIGHTS = (3, 12, 10, 10, 12, 8, 7, 6, 4, 2, 2, 1, 3, 20)
+FIRST_YEAR = 2015
+LAST_YEAR = 2025
+# Share of a student's courses taken outside their department.
+ELECTIVE_SHARE = 0.2
+
+
+def table_sizes(enrollments):
+    """Rows per table for a database with ``enrollments`` enrollments."""
+    return {
+        'departments': len(DEPARTMENTS),
+        'faculty': max(enrollments // 500, 2 * len(DEPARTMENTS)),
+        'courses': max(enrollments // 1000 // len(DEPARTMENTS), 3) * len(DEPARTMENTS),
+        'students': max(enrollments // 10, 100),
+        'enrollments': enrollments,
+    }
+
+
+def _batched(rows):
+    while True:
+        batch = list(islice(rows, SEED_BATCH_SIZE))
+        if not batch:
+            return
+        yield batch
+
+
+def _insert(conn, table, columns, rows):
+    sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})'
+    for batch in _batched(rows):
+        conn.executemany(sql, batch)
+
+
+def _people(rng, count, domain):
+    firsts = rng.choices(FIRST_NAMES, k=count)
+    lasts = rng.choices(LAST_NAMES, k=count)
+    for i, (first, last) in enumerate(zip(firsts, lasts), 1):
+        yield i, first, last, f'{first.lower()}.{last.lower()}{i}@{domain}'
+
+
+def _enrollments(rng, sizes, student_years, student_departments):
+    """Distinct courses per student, mostly from their own department.
+
+    Course ``i`` belongs to department ``i % departments + 1``, so stepping by
+    the number of departments stays within one department without repeats.
+    """
+    departments = sizes['departments']
+    courses = sizes['courses']
+    per_department = courses // departments
+    students = sizes['students']
+    each, extra = divmod(sizes['enrollments'], students)
+    days = [f'{m:02d}-{d:02d} 09:00:00' for m in (1, 8) for d in range(10, 29)]
+    grades = iter(rng.choices(GRADES, GRADE_WEIGHTS, k=sizes['enrollments']))
+    for student in range(1, students + 1):
+        department = student_departments[student - 1]
+        year = student_years[student - 1]
+        own = rng.randrange(per_department)
+        taken = set()
+        for k in range(min(each + (student <= extra), courses)):
+            course = (own + k) % per_department * departments + department - 1
+            if k >= per_department or course in taken or rng.random() < ELECTIVE_SHARE:
+                course = rng.randrange(courses)
+                while course in taken:
+                    course = rng.randrange(courses)
+            taken.add(course)
+            enrolled_year = min(year + k // 5, LAST_YEAR)
+            yield student, f'C{course + 1:05d}', next(grades), f'{enrolled_year}-{rng.choice(days)}'
+
+
+def seed_database(path, enrollments, seed=0):
+    """Create a database at ``path`` holding ``enrollments`` enrollments.
+
+    The base tables are loaded with indexes and triggers absent, then every
+    migration is applied, which builds the indexes, summary tables, search
+    indexes and change log in one pass each. Returns the row count per table.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f'{path} already exists')
+    sizes = table_sizes(enrollments)
+    rng = random.Random(seed)
+    partial = path + '.partial'
+    for suffix in ('', '-journal', '-wal', '-shm'):
+        if os.path.exists(partial + suffix):
+            os.remove(partial + suffix)
+
+    conn = sqlite3.connect(partial, isolation_level=None)
+    try:
+        for pragma in LOAD_PRAGMAS:
+            conn.execute(pragma)
+        conn.execute('BEGIN')
+        for statement in db.sql_statements(db.SCHEMA_PATH):
+            # Indexes are built after the load, by migration 1.
+            if not statement.upper().startswith(('DROP', 'CREATE INDEX')):
+                conn.execute(statement)
+
+        departments = sizes['departments']
+        _insert(conn, 'departments', ('id', 'name', 'head'), (
+            (i, name, f'Head of {name}') for i, name in enumerate(DEPARTMENTS, 1)
+        ))
+        _insert(conn, 'faculty', ('id', 'first_name', 'last_name', 'email', 'designation', 'department_id'), (
+            (i, first, last, email, rng.choice(DESIGNATIONS), (i - 1) % departments + 1)
+            for i, first, last, email in _people(rng, sizes['faculty'], 'faculty.example.edu')
+        ))
+        faculty_per_department = sizes['faculty'] // departments
+        _insert(conn, 'courses', ('code', 'name', 'credits', 'description', 'department_id', 'faculty_id'), (
+            (f'C{i + 1:05d}', f'{DEPARTMENTS[i % departments]} {COURSE_TOPICS[i // departments % len(COURSE_TOPICS)]} '
+             f'{i // departments + 1}', rng.choice((2, 3, 3, 4)),
+             f'{COURSE_TOPICS[i // departments % len(COURSE_TOPICS)]} in {DEPARTMENTS[i % departments].lower()}.',
+             i % departments + 1, rng.randrange(faculty_per_department) * departments + i % departments + 1)
+            for i in range(sizes['courses'])
+        ))
+        student_departments = rng.choices(range(1, departments + 1), k=sizes['students'])
+        student_years = rng.choices(range(FIRST_YEAR, LAST_YEAR + 1), k=sizes['students'])
+        _insert(conn, 'students', ('id', 'first_name', 'last_name', 'email', 'phone', 'department_id', 'enrollment_year'), (
+            (i, first, last, email, f'555-{i % 10000:04d}', student_departments[i - 1], student_years[i - 1])
+            for i, first, last, email in _people(rng, sizes['students'], 'students.example.edu')
+        ))
+        _insert(conn, 'enrollments', ('student_id', 'course_code', 'grade', 'enrolled_at'),
+                _enrollments(rng, sizes, student_years, student_departments))
+
+        for version, _, statements in db.MIGRATIONS:
+            for statement in statements:
+                conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {db.MIGRATIONS[-1][0]}')
+        conn.execute('COMMIT')
+        conn.execute('ANALYZE')
+        # Back to the settings the connection pool expects.
+        conn.execute('PRAGMA locking_mode = NORMAL')
+        conn.execute('PRAGMA journal_mode = WAL')
+        counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in sizes}
+    except BaseException:
+        conn.close()
+        os.remove(partial)
+        raise
+    conn.close()
+    os.replace(partial, path)
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m backend.seed', description=__doc__.split('\n')[0])
+    parser.add_argument('--enrollments', type=int, default=100_000)
+    parser.add_argument('--path', default=db.DATABASE_PATH, help='database to create; must not exist')
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        counts = seed_database(args.path, args.enrollments, args.seed)
+    except FileExistsError as e:
+        print(f'{e}; remove it or pass another --path.')
+        return 1
+    elapsed = time.perf_counter() - start
+    print(', '.join(f'{count} {table}' for table, count in counts.items()) + f' in {elapsed:.1f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,21 +1,35 @@
+import sqlite3
 from flask import Blueprint, request
-from backend.db import get_db_connection, with_query_logs
-from backend.utils import format_record, format_records
+from backend.cache import cached
+from backend.db import WriteTimeout, get_db_connection, requested_stream_format, run_write, stream_with_query_logs, with_query_logs
+from backend.repository import REPOSITORIES
+from backend.utils import fetch_records, format_record
 
 bp = Blueprint('students', __name__, url_prefix='/api/students')
 
+repository = REPOSITORIES['students']
+
 @bp.route('/', methods=['GET'])
+@cached('students', relations=repository.relations)
 def get_students():
-    """Get all students."""
+    """Get students, optionally filtered, sorted, projected, paginated and expanded."""
+    try:
+        query = repository.list_query()
+    except ValueError as e:
+        return with_query_logs({'error': str(e)}, 400)
+
     conn = get_db_connection()
-    students = conn.execute('SELECT * FROM students').fetchall()
-    return with_query_logs(format_records(students))
+    stream_format = requested_stream_format()
+    if stream_format:
+        return stream_with_query_logs(conn.execute(*query.build()), stream_format, filename='students', page=query)
+    students, headers = query.paginate(fetch_records(conn.execute(*query.build())))
+    return with_query_logs(students, headers=headers)
 
 @bp.route('/<int:id>', methods=['GET'])
+@cached('students')
 def get_student(id):
     """Get a single student by ID."""
-    conn = get_db_connection()
-    student = conn.execute('SELECT * FROM students WHERE id = ?', (id,)).fetchone()
+    student = repository.get(get_db_connection(), id)
     if student is None:
         return with_query_logs({'error': 'Student not found'}, 404)
     return with_query_logs(format_record(student))
@@ -24,71 +38,52 @@ def get_student(id):
 def create_student():
     """Create a new student."""
     data = request.get_json()
-    if not data or not 'firstName' in data or not 'lastName' in data or not 'email' in data:
+    if not data or repository.missing(data):
         return with_query_logs({'error': 'Missing required fields'}, 400)
 
-    conn = get_db_connection()
     try:
-        cursor = conn.execute(
-            'INSERT INTO students (first_name, last_name, email, phone, department_id, enrollment_year) VALUES (?, ?, ?, ?, ?, ?)',
-            (data['firstName'], data['lastName'], data['email'], data.get('phone'), data.get('departmentId'), data.get('enrollmentYear'))
-        )
-        conn.commit()
-        new_student_id = cursor.lastrowid
-
-        new_student = conn.execute('SELECT * FROM students WHERE id = ?', (new_student_id,)).fetchone()
-        return with_query_logs(format_record(new_student), 201)
-    except conn.IntegrityError:
+        new_student = run_write(lambda conn: repository.create(conn, data))
+    except sqlite3.IntegrityError:
         return with_query_logs({'error': 'Email already exists'}, 409)
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    return with_query_logs(format_record(new_student), 201)
 
-@bp.route('/<int:id>', methods=['PUT'])
+@bp.route('/bulk', methods=['POST'])
+def bulk_create_students():
+    """Create or update many students in one transaction."""
+    return repository.bulk_upsert()
+
+@bp.route('/<int:id>', methods=['PUT', 'PATCH'])
 def update_student(id):
-    """Update an existing student."""
+    """Update the given fields of an existing student."""
     data = request.get_json()
     if not data:
         return with_query_logs({'error': 'No data provided'}, 400)
 
-    conn = get_db_connection()
     try:
-        student = conn.execute('SELECT * FROM students WHERE id = ?', (id,)).fetchone()
-        if student is None:
-            return with_query_logs({'error': 'Student not found'}, 404)
-
-        update_fields = {
-            'firstName': data.get('firstName', student['first_name']),
-            'lastName': data.get('lastName', student['last_name']),
-            'email': data.get('email', student['email']),
-            'phone': data.get('phone', student['phone']),
-            'departmentId': data.get('departmentId', student['department_id']),
-            'enrollmentYear': data.get('enrollmentYear', student['enrollment_year'])
-        }
-
-        conn.execute(
-            'UPDATE students SET first_name = ?, last_name = ?, email = ?, phone = ?, department_id = ?, enrollment_year = ? WHERE id = ?',
-            (update_fields['firstName'], update_fields['lastName'], update_fields['email'], update_fields['phone'], update_fields['departmentId'], update_fields['enrollmentYear'], id)
-        )
-        conn.commit()
-
-        updated_student = conn.execute('SELECT * FROM students WHERE id = ?', (id,)).fetchone()
-        return with_query_logs(format_record(updated_student))
-    except conn.IntegrityError:
+        updated_student = run_write(lambda conn: repository.update(conn, id, data))
+    except sqlite3.IntegrityError:
         return with_query_logs({'error': 'Email already exists'}, 409)
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    if updated_student is None:
+        return with_query_logs({'error': 'Student not found'}, 404)
+    return with_query_logs(format_record(updated_student))
 
 @bp.route('/<int:id>', methods=['DELETE'])
 def delete_student(id):
     """Delete a student."""
-    conn = get_db_connection()
     try:
-        student = conn.execute('SELECT * FROM students WHERE id = ?', (id,)).fetchone()
-        if student is None:
-            return with_query_logs({'error': 'Student not found'}, 404)
-
-        conn.execute('DELETE FROM students WHERE id = ?', (id,))
-        conn.commit()
-        return with_query_logs({'message': 'Student deleted successfully'}, 200)
+        deleted = run_write(lambda conn: repository.delete(conn, id))
+    except WriteTimeout as e:
+        return with_query_logs({'error': str(e)}, 503)
     except Exception as e:
         return with_query_logs({'error': str(e)}, 500)
+    if not deleted:
+        return with_query_logs({'error': 'Student not found'}, 404)
+    return with_query_logs({'message': 'Student deleted successfully'}, 200)
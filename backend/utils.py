@@ -1,14 +1,111 @@
+from datetime import date, datetime
+from decimal import Decimal
+from functools import lru_cache
+from flask import Response
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # Optional: a faster JSON encoder when installed.
+    orjson = None
+
+def to_camel_case(snake_str):
+    """Converts a snake_case column name to camelCase."""
+    components = snake_str.split('_')
+    return components[0] + ''.join(x.title() for x in components[1:])
+
+@lru_cache(maxsize=1024)
+def camel_case_keys(columns):
+    """Returns the camelCase keys for a tuple of column names, computed once per shape."""
+    return tuple(to_camel_case(column) for column in columns)
+
+def cursor_keys(cursor):
+    """Returns the camelCase keys for an executed cursor's columns."""
+    return camel_case_keys(tuple(column[0] for column in cursor.description))
+
 def format_record(record):
     """Converts a database record to a dictionary with camelCase keys."""
     if record is None:
         return None
-
-    def to_camel_case(snake_str):
-        components = snake_str.split('_')
-        return components[0] + ''.join(x.title() for x in components[1:])
-
-    return {to_camel_case(key): value for key, value in record.items()}
+    return dict(zip(camel_case_keys(tuple(record.keys())), record))
 
 def format_records(records):
     """Converts a list of database records to a list of dictionaries with camelCase keys."""
-    return [format_record(record) for record in records]
+    if not records:
+        return []
+    keys = camel_case_keys(tuple(records[0].keys()))
+    return [dict(zip(keys, record)) for record in records]
+
+@lru_cache(maxsize=256)
+def _nesting(keys):
+    """Splits ``relation.column`` keys into (flat positions, {relation: positions})."""
+    flat = []
+    nested = {}
+    for index, key in enumerate(keys):
+        if '.' in key:
+            relation, column = key.split('.', 1)
+            nested.setdefault(relation, []).append((index, column))
+        else:
+            flat.append((index, key))
+    return tuple(flat), tuple((relation, tuple(columns)) for relation, columns in nested.items())
+
+def nest_record(keys, row):
+    """Builds a dictionary from a row, nesting ``relation.column`` keys.
+
+    A relation whose first column (its key) is NULL had no matching row in
+    the LEFT JOIN and becomes None.
+    """
+    flat, nested = _nesting(keys)
+    record = {key: row[index] for index, key in flat}
+    for relation, columns in nested:
+        if row[columns[0][0]] is None:
+            record[relation] = None
+        else:
+            record[relation] = {column: row[index] for index, column in columns}
+    return record
+
+def is_nested(keys):
+    """Returns True if any key belongs to an expanded relation."""
+    return bool(_nesting(keys)[1])
+
+def fetch_records(cursor):
+    """Fetches every row of an executed cursor as a camelCase dictionary.
+
+    Rows are fetched as plain tuples, skipping sqlite3.Row, and zipped with
+    keys computed once for the cursor's columns. Columns of expanded
+    relations are nested under the relation's name.
+    """
+    cursor.row_factory = None
+    keys = cursor_keys(cursor)
+    if is_nested(keys):
+        return [nest_record(keys, row) for row in cursor.fetchall()]
+    return [dict(zip(keys, row)) for row in cursor.fetchall()]
+
+def _orjson_default(value):
+    # Match Flask's default provider so the encoder choice is invisible to clients.
+    if isinstance(value, datetime):
+        return http_date(value)
+    if isinstance(value, date):
+        return http_date(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+class FastJSONProvider(DefaultJSONProvider):
+    """A JSON provider that skips key sorting and uses orjson when available."""
+
+    sort_keys = False
+    compact = True
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=_orjson_default, option=orjson.OPT_PASSTHROUGH_DATETIME)
+        return Response(body, mimetype=self.mimetype)
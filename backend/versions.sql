@@ -0,0 +1,87 @@
+-- Per-table version counters, bumped by every insert, update and delete.
+-- The read cache keys responses by these versions, so any committed write,
+-- from any worker process, invalidates the cached reads of that table.
+-- Every statement is idempotent; see MIGRATIONS in db.py.
+
+CREATE TABLE IF NOT EXISTS table_versions (
+    table_name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO table_versions (table_name, version) VALUES
+    ('departments', 0), ('students', 0), ('faculty', 0), ('courses', 0), ('enrollments', 0);
+
+CREATE TRIGGER IF NOT EXISTS versions_departments_insert AFTER INSERT ON departments
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'departments';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_departments_update AFTER UPDATE ON departments
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'departments';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_departments_delete AFTER DELETE ON departments
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'departments';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_students_insert AFTER INSERT ON students
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'students';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_students_update AFTER UPDATE ON students
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'students';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_students_delete AFTER DELETE ON students
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'students';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_faculty_insert AFTER INSERT ON faculty
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'faculty';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_faculty_update AFTER UPDATE ON faculty
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'faculty';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_faculty_delete AFTER DELETE ON faculty
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'faculty';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_courses_insert AFTER INSERT ON courses
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'courses';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_courses_update AFTER UPDATE ON courses
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'courses';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_courses_delete AFTER DELETE ON courses
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'courses';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_enrollments_insert AFTER INSERT ON enrollments
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'enrollments';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_enrollments_update AFTER UPDATE ON enrollments
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'enrollments';
+END;
+
+CREATE TRIGGER IF NOT EXISTS versions_enrollments_delete AFTER DELETE ON enrollments
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE table_name = 'enrollments';
+END;
@@ -1,10 +1,19 @@
-import { X } from 'lucide-react';
+import { useState } from 'react';
+import { Play, X } from 'lucide-react';
 import { useSqlStore } from '@/stores/sql-store';
 import { Button } from '@/components/ui/button';
 import { ScrollArea } from '@/components/ui/scroll-area';
+import { Textarea } from '@/components/ui/textarea';
+
+// Rows rendered in the panel; the rest of a large result is only counted.
+const MAX_DISPLAYED_ROWS = 200;
 
 export const SqlDebuggerPanel = () => {
-  const { logs, isPanelOpen, setPanelOpen, clearLogs } = useSqlStore();
+  const {
+    logs, isPanelOpen, setPanelOpen, clearLogs,
+    queryResult, queryError, isQueryRunning, runQuery,
+  } = useSqlStore();
+  const [sql, setSql] = useState('SELECT * FROM students LIMIT 10');
 
   if (!isPanelOpen) return null;
 
@@ -41,6 +50,57 @@ export const SqlDebuggerPanel = () => {
           </div>
         </div>
 
+        {/* Query console: read-only statements run through /api/query */}
+        <div className="p-4 border-b border-border space-y-3">
+          <Textarea
+            value={sql}
+            onChange={(e) => setSql(e.target.value)}
+            className="font-mono text-xs"
+            rows={4}
+          />
+          <div className="flex items-center justify-between">
+            <span className="text-xs text-muted-foreground">
+              {queryResult && `${queryResult.rowCount} rows${queryResult.truncated ? ' (truncated)' : ''} in ${queryResult.duration}ms from the ${queryResult.source}`}
+            </span>
+            <Button size="sm" onClick={() => runQuery(sql)} disabled={isQueryRunning || !sql.trim()}>
+              <Play className="h-4 w-4 mr-1" />
+              {isQueryRunning ? 'Running...' : 'Run'}
+            </Button>
+          </div>
+          {queryError && (
+            <div className="text-xs text-destructive">{queryError}</div>
+          )}
+          {queryResult && (
+            <>
+              <pre className="text-xs bg-background p-3 rounded border border-border overflow-x-auto font-mono text-muted-foreground">
+{queryResult.plan.join('\n')}
+              </pre>
+              <div className="max-h-64 overflow-auto border border-border rounded">
+                <table className="w-full text-xs font-mono">
+                  <thead className="bg-muted sticky top-0">
+                    <tr>
+                      {queryResult.columns.map((column) => (
+                        <th key={column} className="px-2 py-1 text-left font-semibold">{column}</th>
+                      ))}
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {queryResult.rows.slice(0, MAX_DISPLAYED_ROWS).map((row, i) => (
+                      <tr key={i} className="border-t border-border">
+                        {row.map((value, j) => (
+                          <td key={j} className="px-2 py-1 whitespace-nowrap">
+                            {value === null ? <span className="text-muted-foreground">NULL</span> : String(value)}
+                          </td>
+                        ))}
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+              </div>
+            </>
+          )}
+        </div>
+
         {/* Content */}
         <ScrollArea className="flex-1 p-4">
           {logs.length === 0 ? (
@@ -1,6 +1,8 @@
-import { useState, useMemo } from 'react';
+import { useState, useEffect } from 'react';
 import { Pencil, Trash2, Search } from 'lucide-react';
 import { useStudentStore } from '@/stores/student-store';
+import { API_URL, queryLogHeaders } from '@/stores/generic-store';
+import { useSqlStore } from '@/stores/sql-store';
 import { Student } from '@/types/schema';
 import { Button } from '@/components/ui/button';
 import { Input } from '@/components/ui/input';
@@ -41,17 +43,37 @@ export const StudentTable = () => {
   const [editStudent, setEditStudent] = useState<Student | null>(null);
   const [searchQuery, setSearchQuery] = useState('');
 
-  const filteredStudents = useMemo(() => {
-    if (!searchQuery.trim()) return students;
-    
-    const query = searchQuery.toLowerCase();
-    return students.filter(student => 
-      student.firstName.toLowerCase().includes(query) ||
-      student.lastName.toLowerCase().includes(query) ||
-      student.email?.toLowerCase().includes(query) ||
-      student.departmentId?.toString().includes(query)
-    );
-  }, [students, searchQuery]);
+  const [searchResults, setSearchResults] = useState<Student[] | null>(null);
+
+  // Search runs server-side against the full-text index, debounced while typing.
+  useEffect(() => {
+    const query = searchQuery.trim();
+    if (!query) {
+      setSearchResults(null);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(
+          `${API_URL}/search/students?q=${encodeURIComponent(query)}&limit=100`,
+          { headers: queryLogHeaders(), signal: controller.signal }
+        );
+        if (!response.ok) return;
+        const result = await response.json();
+        setSearchResults(result.data);
+        useSqlStore.getState().addLogs(result.query_logs);
+      } catch (error) {
+        // Superseded by a newer query.
+      }
+    }, 150);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [searchQuery, students]);
+
+  const filteredStudents = searchResults ?? students;
 
   const handleEdit = async (e: React.FormEvent<HTMLFormElement>) => {
     e.preventDefault();
@@ -1,4 +1,5 @@
 import { Student, Department, Course, Enrollment } from '@/types/schema';
+import { API_URL } from '@/stores/generic-store';
 
 export const exportToJSON = (data: any, filename: string) => {
   const blob = new Blob([JSON.stringify(data, null, 2)], { type: 'application/json' });
@@ -12,81 +13,29 @@ export const exportToJSON = (data: any, filename: string) => {
   URL.revokeObjectURL(url);
 };
 
-export const exportToCSV = (data: any[], filename: string) => {
-  if (data.length === 0) return;
-  
-  const headers = Object.keys(data[0]);
-  const csvContent = [
-    headers.join(','),
-    ...data.map(row => headers.map(header => {
-      const value = row[header];
-      if (value === null || value === undefined) return '';
-      if (typeof value === 'object') return JSON.stringify(value);
-      return `"${value.toString().replace(/"/g, '""')}"`;
-    }).join(','))
-  ].join('\n');
-  
-  const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
-  const url = URL.createObjectURL(blob);
+// Streams the CSV straight from the backend, so large tables are written to
+// disk as they are read instead of being assembled in memory first.
+export const exportToCSV = (entity: string, filename: string) => {
   const link = document.createElement('a');
-  link.href = url;
+  link.href = `${API_URL}/${entity}/?format=csv`;
   link.download = `${filename}.csv`;
   document.body.appendChild(link);
   link.click();
   document.body.removeChild(link);
-  URL.revokeObjectURL(url);
 };
 
-export const importFromJSON = (file: File): Promise<any> => {
-  return new Promise((resolve, reject) => {
-    const reader = new FileReader();
-    reader.onload = (e) => {
-      try {
-        const data = JSON.parse(e.target?.result as string);
-        resolve(data);
-      } catch (error) {
-        reject(new Error('Invalid JSON file'));
-      }
-    };
-    reader.onerror = () => reject(new Error('Failed to read file'));
-    reader.readAsText(file);
+// Sends an import file to the bulk endpoint as-is; the backend parses JSON
+// arrays, NDJSON and CSV and writes every row in one transaction.
+export const bulkImport = async (entity: string, file: File): Promise<{ written: number; errors: { row: number; error: string }[] }> => {
+  const contentType = file.name.endsWith('.csv')
+    ? 'text/csv'
+    : file.name.endsWith('.ndjson') ? 'application/x-ndjson' : 'application/json';
+  const response = await fetch(`${API_URL}/${entity}/bulk`, {
+    method: 'POST',
+    headers: { 'Content-Type': contentType },
+    body: file,
   });
+  const result = await response.json();
+  if (!response.ok) throw new Error(result.data?.error || 'Import failed');
+  return result.data;
 };
-
-export const importFromCSV = (file: File): Promise<any[]> => {
-  return new Promise((resolve, reject) => {
-    const reader = new FileReader();
-    reader.onload = (e) => {
-      try {
-        const text = e.target?.result as string;
-        const lines = text.split('\n').filter(line => line.trim());
-        if (lines.length < 2) {
-          reject(new Error('CSV file is empty or invalid'));
-          return;
-        }
-        
-        const headers = lines[0].split(',').map(h => h.trim().replace(/^"|"$/g, ''));
-        const data = lines.slice(1).map(line => {
-          const values = line.match(/(".*?"|[^,]+)(?=\s*,|\s*$)/g) || [];
-          const row: any = {};
-          headers.forEach((header, index) => {
-            let value = values[index]?.trim().replace(/^"|"$/g, '') || '';
-            // Try to parse as number
-            if (value && !isNaN(Number(value))) {
-              row[header] = Number(value);
-            } else {
-              row[header] = value;
-            }
-          });
-          return row;
-        });
-        
-        resolve(data);
-      } catch (error) {
-        reject(new Error('Failed to parse CSV file'));
-      }
-    };
-    reader.onerror = () => reject(new Error('Failed to read file'));
-    reader.readAsText(file);
-  });
-};
\ No newline at end of file
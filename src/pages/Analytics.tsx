@@ -1,72 +1,50 @@
-import { useEffect, useMemo } from 'react';
+import { useEffect, useState } from 'react';
 import { ArrowLeft, TrendingUp, Users, BookOpen, Building2 } from 'lucide-react';
 import { Button } from '@/components/ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from '@/components/ui/card';
-import { useStudentStore } from '@/stores/student-store';
-import { useDepartmentStore } from '@/stores/department-store';
-import { useEnrollmentStore } from '@/stores/enrollment-store';
-import { useCourseStore } from '@/stores/course-store';
+import { API_URL, queryLogHeaders } from '@/stores/generic-store';
+import { useSqlStore } from '@/stores/sql-store';
 import { Link } from 'react-router-dom';
 import { BarChart, Bar, PieChart, Pie, Cell, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
 
 const COLORS = ['hsl(var(--chart-1))', 'hsl(var(--chart-2))', 'hsl(var(--chart-3))', 'hsl(var(--chart-4))', 'hsl(var(--chart-5))'];
 
+// Aggregates computed server-side by GET /api/analytics.
+interface DashboardData {
+  totals: { students: number; departments: number; courses: number; enrollments: number };
+  studentsByDepartment: { name: string; students: number }[];
+  studentsByEnrollmentYear: { year: number; count: number }[];
+  topCourses: { course: string; enrollments: number }[];
+  gradeDistribution: { grade: string; count: number }[];
+}
+
+const EMPTY_DASHBOARD: DashboardData = {
+  totals: { students: 0, departments: 0, courses: 0, enrollments: 0 },
+  studentsByDepartment: [],
+  studentsByEnrollmentYear: [],
+  topCourses: [],
+  gradeDistribution: [],
+};
+
 const Analytics = () => {
-  const { students, fetchStudents } = useStudentStore();
-  const { departments, fetchDepartments } = useDepartmentStore();
-  const { enrollments, fetchEnrollments } = useEnrollmentStore();
-  const { courses, fetchCourses } = useCourseStore();
+  const [dashboard, setDashboard] = useState<DashboardData>(EMPTY_DASHBOARD);
 
   useEffect(() => {
-    fetchStudents();
-    fetchDepartments();
-    fetchEnrollments();
-    fetchCourses();
+    const fetchDashboard = async () => {
+      const response = await fetch(`${API_URL}/analytics/`, { headers: queryLogHeaders() });
+      if (!response.ok) return;
+      const result = await response.json();
+      setDashboard(result.data);
+      useSqlStore.getState().addLogs(result.query_logs);
+    };
+    fetchDashboard();
   }, []);
 
-  const departmentData = useMemo(() => {
-    return departments.map(dept => ({
-      name: dept.name,
-      students: students.filter(s => s.departmentId === dept.id).length
-    }));
-  }, [departments, students]);
-
-  const enrollmentYearData = useMemo(() => {
-    const yearCounts: { [key: number]: number } = {};
-    students.forEach(s => {
-      if (s.enrollmentYear) {
-        yearCounts[s.enrollmentYear] = (yearCounts[s.enrollmentYear] || 0) + 1;
-      }
-    });
-    return Object.entries(yearCounts).map(([year, count]) => ({
-      year,
-      count
-    })).sort((a, b) => Number(a.year) - Number(b.year));
-  }, [students]);
-
-  const courseEnrollmentData = useMemo(() => {
-    const courseCounts: { [key: string]: number } = {};
-    enrollments.forEach(e => {
-      courseCounts[e.courseCode] = (courseCounts[e.courseCode] || 0) + 1;
-    });
-    return Object.entries(courseCounts).map(([code, count]) => ({
-      course: courses.find(c => c.code === code)?.name || code,
-      enrollments: count
-    })).sort((a, b) => b.enrollments - a.enrollments).slice(0, 5);
-  }, [enrollments, courses]);
-
-  const gradeDistribution = useMemo(() => {
-    const grades: { [key: string]: number } = {};
-    enrollments.forEach(e => {
-      if (e.grade) {
-        grades[e.grade] = (grades[e.grade] || 0) + 1;
-      }
-    });
-    return Object.entries(grades).map(([grade, count]) => ({
-      grade,
-      count
-    }));
-  }, [enrollments]);
+  const { totals } = dashboard;
+  const departmentData = dashboard.studentsByDepartment;
+  const enrollmentYearData = dashboard.studentsByEnrollmentYear;
+  const courseEnrollmentData = dashboard.topCourses;
+  const gradeDistribution = dashboard.gradeDistribution;
 
   return (
     <div className="min-h-screen bg-background">
@@ -90,7 +68,7 @@ const Analytics = () => {
               <Users className="h-4 w-4 text-muted-foreground" />
             </CardHeader>
             <CardContent>
-              <div className="text-2xl font-bold">{students.length}</div>
+              <div className="text-2xl font-bold">{totals.students}</div>
             </CardContent>
           </Card>
           <Card>
@@ -99,7 +77,7 @@ const Analytics = () => {
               <Building2 className="h-4 w-4 text-muted-foreground" />
             </CardHeader>
             <CardContent>
-              <div className="text-2xl font-bold">{departments.length}</div>
+              <div className="text-2xl font-bold">{totals.departments}</div>
             </CardContent>
           </Card>
           <Card>
@@ -108,7 +86,7 @@ const Analytics = () => {
               <BookOpen className="h-4 w-4 text-muted-foreground" />
             </CardHeader>
             <CardContent>
-              <div className="text-2xl font-bold">{courses.length}</div>
+              <div className="text-2xl font-bold">{totals.courses}</div>
             </CardContent>
           </Card>
           <Card>
@@ -117,7 +95,7 @@ const Analytics = () => {
               <TrendingUp className="h-4 w-4 text-muted-foreground" />
             </CardHeader>
             <CardContent>
-              <div className="text-2xl font-bold">{enrollments.length}</div>
+              <div className="text-2xl font-bold">{totals.enrollments}</div>
             </CardContent>
           </Card>
         </div>
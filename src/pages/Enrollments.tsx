@@ -26,19 +26,28 @@ const Enrollments = () => {
 
   useEffect(() => {
     fetchEnrollments();
-    fetchStudents();
-    fetchCourses();
   }, []);
 
+  // The student and course lists are only needed by the form.
+  const formOpen = isAddOpen || !!editEnrollment;
+  useEffect(() => {
+    if (formOpen) {
+      fetchStudents();
+      fetchCourses();
+    }
+  }, [formOpen]);
+
   const handleSubmit = async (e: React.FormEvent) => {
     e.preventDefault();
     try {
       if (editEnrollment) {
         await updateEnrollment(editEnrollment.id, formData);
+        fetchEnrollments();
         toast({ title: 'Enrollment updated successfully' });
         setEditEnrollment(null);
       } else {
         await createEnrollment(formData);
+        fetchEnrollments();
         toast({ title: 'Enrollment added successfully' });
         setIsAddOpen(false);
       }
@@ -96,8 +105,7 @@ const Enrollments = () => {
               </TableHeader>
               <TableBody>
                 {enrollments.map((enrollment) => {
-                  const student = students.find(s => s.id === enrollment.studentId);
-                  const course = courses.find(c => c.code === enrollment.courseCode);
+                  const { student, course } = enrollment;
                   return (
                     <TableRow key={enrollment.id}>
                       <TableCell className="font-medium">
@@ -138,7 +146,7 @@ const Enrollments = () => {
         </Card>
       </main>
 
-      <Dialog open={isAddOpen || !!editEnrollment} onOpenChange={(open) => {
+      <Dialog open={formOpen} onOpenChange={(open) => {
         if (!open) {
           setIsAddOpen(false);
           setEditEnrollment(null);
@@ -6,7 +6,7 @@ import { SqlDebuggerPanel } from '@/components/sql-debugger/sql-panel';
 import { StudentForm } from '@/components/students/student-form';
 import { StudentTable } from '@/components/students/student-table';
 import { Link } from 'react-router-dom';
-import { exportToJSON, exportToCSV, importFromJSON, importFromCSV } from '@/lib/import-export';
+import { exportToJSON, exportToCSV, bulkImport } from '@/lib/import-export';
 import { useStudentStore } from '@/stores/student-store';
 import { useDepartmentStore } from '@/stores/department-store';
 import { useToast } from '@/hooks/use-toast';
@@ -26,7 +26,7 @@ const Index = () => {
     if (type === 'json') {
       exportToJSON({ students, departments }, 'student_data');
     } else {
-      exportToCSV(students, 'students');
+      exportToCSV('students', 'students');
     }
     toast({ title: `Data exported as ${type.toUpperCase()}` });
   };
@@ -36,13 +36,12 @@ const Index = () => {
     if (!file) return;
 
     try {
-      if (file.name.endsWith('.json')) {
-        const data = await importFromJSON(file);
-        toast({ title: 'JSON import successful', description: 'Please refresh to see changes' });
-      } else if (file.name.endsWith('.csv')) {
-        const data = await importFromCSV(file);
-        toast({ title: 'CSV import successful', description: 'Please refresh to see changes' });
-      }
+      const result = await bulkImport('students', file);
+      toast({
+        title: 'Import successful',
+        description: `${result.written} rows imported${result.errors.length ? `, ${result.errors.length} rejected` : ''}`,
+      });
+      fetchStudents();
     } catch (error: any) {
       toast({ title: 'Import failed', description: error.message, variant: 'destructive' });
     }
@@ -57,7 +56,7 @@ const Index = () => {
       <input
         ref={fileInputRef}
         type="file"
-        accept=".json,.csv"
+        accept=".json,.ndjson,.csv"
         onChange={handleImport}
         className="hidden"
       />
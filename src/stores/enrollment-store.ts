@@ -1,7 +1,11 @@
 import { createGenericStore } from './generic-store';
 import { Enrollment } from '@/types/schema';
 
-const useEnrollmentStoreBase = createGenericStore<Enrollment>('enrollments');
+// Join the student and course names the table shows into the same request.
+const useEnrollmentStoreBase = createGenericStore<Enrollment>(
+  'enrollments',
+  '?fields=studentId,courseCode,grade,enrolledAt,student.firstName,student.lastName,course.name'
+);
 
 const enrollmentSelector = (state: any) => ({
   enrollments: state.items,
@@ -1,43 +1,142 @@
 import { create } from 'zustand';
 import { useSqlStore } from './sql-store';
 
-const API_URL = 'http://127.0.0.1:5000/api';
+export const API_URL = 'http://127.0.0.1:5000/api';
+
+// The backend only attaches query logs when asked, so request them while the
+// SQL panel is open.
+export const queryLogHeaders = (): Record<string, string> =>
+  useSqlStore.getState().isPanelOpen ? { 'X-Query-Logs': '1' } : {};
+
+// Lists are requested in the columnar representation: keys once, rows as arrays.
+const COLUMNS_MIMETYPE = 'application/vnd.columns+json';
+
+const fromColumns = <T,>({ columns, rows }: { columns: string[]; rows: unknown[][] }) =>
+  rows.map((row) => Object.fromEntries(columns.map((column, i) => [column, row[i]])) as T);
+
+interface TableChanges<T> {
+  upserts: T[];
+  deletes: (number | string)[];
+}
+
+// Every store shares one event stream and is told which tables changed.
+type ChangeListener = (tables: string[]) => void;
+const changeListeners = new Set<ChangeListener>();
+let changeSource: EventSource | null = null;
+
+const subscribeToChanges = (listener: ChangeListener) => {
+  changeListeners.add(listener);
+  if (changeSource) return;
+  changeSource = new EventSource(`${API_URL}/changes/stream`);
+  changeSource.addEventListener('change', (event) => {
+    const { tables } = JSON.parse((event as MessageEvent).data);
+    changeListeners.forEach((notify) => notify(tables));
+  });
+};
+
+const itemKey = (item: { id?: number; code?: string }) => item.id ?? item.code;
+
+// Replaces changed items in place, drops deleted ones and puts new ones first.
+const applyChanges = <T extends { id?: number; code?: string }>(items: T[], changes: TableChanges<T>) => {
+  const deleted = new Set(changes.deletes);
+  const upserts = new Map(changes.upserts.map((row) => [itemKey(row), row]));
+  const merged = items
+    .filter((item) => !deleted.has(itemKey(item)!))
+    .map((item) => {
+      const row = upserts.get(itemKey(item));
+      if (!row) return item;
+      upserts.delete(itemKey(item));
+      return { ...item, ...row };
+    });
+  return [...upserts.values(), ...merged];
+};
 
 interface GenericState<T> {
   items: T[];
   loading: boolean;
   error: string | null;
+  // Change log position the items reflect; null until the first fetch.
+  seq: number | null;
   fetchItems: () => Promise<void>;
+  syncChanges: () => Promise<void>;
   createItem: (data: Omit<T, 'id' | 'code'>) => Promise<void>;
   updateItem: (id: number | string, data: Partial<Omit<T, 'id' | 'code'>>) => Promise<void>;
   deleteItem: (id: number | string) => Promise<void>;
 }
 
-export const createGenericStore = <T extends { id?: number; code?: string }>(name: string) => {
-  return create<GenericState<T>>((set) => ({
+// `listQuery` is appended to the list request, e.g. to expand related records.
+export const createGenericStore = <T extends { id?: number; code?: string }>(name: string, listQuery = '') => {
+  // Reads the change log position before the list, so no change made while
+  // the list loads is missed.
+  const load = async () => {
+    const seqResponse = await fetch(`${API_URL}/changes/`);
+    if (!seqResponse.ok) throw new Error(`Failed to fetch ${name}`);
+    const { data: { seq } } = await seqResponse.json();
+    const response = await fetch(`${API_URL}/${name}/${listQuery}`, {
+      headers: { Accept: COLUMNS_MIMETYPE, ...queryLogHeaders() },
+    });
+    if (!response.ok) throw new Error(`Failed to fetch ${name}`);
+    const result = await response.json();
+    useSqlStore.getState().addLogs(result.query_logs);
+    // A list served from a replica snapshot reflects the snapshot's change
+    // log position, which may be behind the one read above.
+    const replicaSeq = response.headers.get('X-Replica-Seq');
+    return { items: fromColumns<T>(result.data), seq: replicaSeq === null ? seq as number : Number(replicaSeq) };
+  };
+  let subscribed = false;
+
+  return create<GenericState<T>>((set, get) => ({
     items: [],
     loading: false,
     error: null,
+    seq: null,
 
     fetchItems: async () => {
       set({ loading: true, error: null });
       try {
-        const response = await fetch(`${API_URL}/${name}`);
-        if (!response.ok) throw new Error(`Failed to fetch ${name}`);
-        const result = await response.json();
-        set({ items: result.data, loading: false });
-        useSqlStore.getState().addLogs(result.query_logs);
+        set({ ...(await load()), loading: false });
+        if (!subscribed) {
+          subscribed = true;
+          subscribeToChanges((tables) => {
+            if (tables.includes(name)) get().syncChanges();
+          });
+        }
       } catch (error) {
         const errorMessage = error instanceof Error ? error.message : 'An unknown error occurred';
         set({ error: errorMessage, loading: false });
       }
     },
 
+    syncChanges: async () => {
+      const { seq } = get();
+      if (seq === null) return;
+      try {
+        // Deltas carry plain rows, which cannot stand in for expanded or
+        // projected list items, and a 410 means the log has moved on; both
+        // reload the list instead.
+        const response = listQuery ? null : await fetch(`${API_URL}/changes/?since=${seq}&tables=${name}`);
+        if (!response || response.status === 410) {
+          set(await load());
+          return;
+        }
+        if (!response.ok) throw new Error(`Failed to sync ${name}`);
+        const { data } = await response.json();
+        const changes: TableChanges<T> | undefined = data.changes[name];
+        set((state) => ({
+          seq: Math.max(state.seq ?? 0, data.seq),
+          items: changes ? applyChanges(state.items, changes) : state.items,
+        }));
+      } catch (error) {
+        const errorMessage = error instanceof Error ? error.message : 'An unknown error occurred';
+        set({ error: errorMessage });
+      }
+    },
+
     createItem: async (data) => {
       try {
-        const response = await fetch(`${API_URL}/${name}`, {
+        const response = await fetch(`${API_URL}/${name}/`, {
           method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
+          headers: { 'Content-Type': 'application/json', ...queryLogHeaders() },
           body: JSON.stringify(data),
         });
         if (!response.ok) throw new Error(`Failed to create ${name}`);
@@ -51,11 +150,17 @@ export const createGenericStore = <T extends { id?: number; code?: string }>(nam
     },
 
     updateItem: async (id, data) => {
+      // Send only the fields that differ from the loaded item.
+      const current = get().items.find((item) => item.id === id || item.code === id);
+      const changes = current
+        ? Object.fromEntries(Object.entries(data).filter(([key, value]) => current[key as keyof T] !== value))
+        : data;
+      if (Object.keys(changes).length === 0) return;
       try {
         const response = await fetch(`${API_URL}/${name}/${id}`, {
-          method: 'PUT',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify(data),
+          method: 'PATCH',
+          headers: { 'Content-Type': 'application/json', ...queryLogHeaders() },
+          body: JSON.stringify(changes),
         });
         if (!response.ok) throw new Error(`Failed to update ${name}`);
         const result = await response.json();
@@ -75,6 +180,7 @@ export const createGenericStore = <T extends { id?: number; code?: string }>(nam
       try {
         const response = await fetch(`${API_URL}/${name}/${id}`, {
           method: 'DELETE',
+          headers: queryLogHeaders(),
         });
         if (!response.ok) throw new Error(`Failed to delete ${name}`);
         const result = await response.json();
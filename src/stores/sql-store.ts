@@ -1,5 +1,6 @@
 import { create } from 'zustand';
 import { v4 as uuidv4 } from 'uuid';
+import { API_URL, queryLogHeaders } from './generic-store';
 
 export interface QueryLog {
   id: string;
@@ -10,13 +11,29 @@ export interface QueryLog {
   operation: 'SELECT' | 'INSERT' | 'UPDATE' | 'DELETE' | 'UNKNOWN';
 }
 
+// Result of an ad-hoc query run through /api/query.
+export interface QueryResult {
+  columns: string[];
+  plan: string[];
+  source: 'primary' | 'replica';
+  rows: unknown[][];
+  rowCount: number;
+  truncated: boolean;
+  duration: number;
+  error: string | null;
+}
+
 interface SqlStore {
   logs: QueryLog[];
   isPanelOpen: boolean;
+  queryResult: QueryResult | null;
+  queryError: string | null;
+  isQueryRunning: boolean;
   setPanelOpen: (isOpen: boolean) => void;
   addLog: (log: Omit<QueryLog, 'id' | 'timestamp'>) => void;
   addLogs: (logs: Omit<QueryLog, 'id' | 'timestamp' | 'operation'>[]) => void;
   clearLogs: () => void;
+  runQuery: (sql: string, params?: unknown[]) => Promise<void>;
 }
 
 const getOperation = (sql: string): 'SELECT' | 'INSERT' | 'UPDATE' | 'DELETE' | 'UNKNOWN' => {
@@ -27,9 +44,12 @@ const getOperation = (sql: string): 'SELECT' | 'INSERT' | 'UPDATE' | 'DELETE' |
   return 'UNKNOWN';
 };
 
-export const useSqlStore = create<SqlStore>((set) => ({
+export const useSqlStore = create<SqlStore>((set, get) => ({
   logs: [],
   isPanelOpen: false,
+  queryResult: null,
+  queryError: null,
+  isQueryRunning: false,
   setPanelOpen: (isOpen) => set({ isPanelOpen: isOpen }),
   addLog: (log) =>
     set((state) => ({
@@ -51,4 +71,26 @@ export const useSqlStore = create<SqlStore>((set) => ({
       ],
     })),
   clearLogs: () => set({ logs: [] }),
+  runQuery: async (sql, params = []) => {
+    set({ isQueryRunning: true, queryError: null });
+    try {
+      const response = await fetch(`${API_URL}/query/`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json', ...queryLogHeaders() },
+        body: JSON.stringify({ sql, params }),
+      });
+      const result = await response.json();
+      if (!response.ok) {
+        set({ queryResult: null, queryError: result.data.error });
+        return;
+      }
+      // A query that ran out of time mid-stream still returns the rows read so far.
+      set({ queryResult: result.data, queryError: result.data.error });
+      get().addLogs(result.query_logs);
+    } catch (error) {
+      set({ queryResult: null, queryError: (error as Error).message });
+    } finally {
+      set({ isQueryRunning: false });
+    }
+  },
 }));
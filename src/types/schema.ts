@@ -38,6 +38,9 @@ export interface Enrollment {
   courseCode: string;
   grade?: string;
   enrolledAt: Date;
+  // Present when fetched with ?expand=student,course.
+  student?: Pick<Student, 'id' | 'firstName' | 'lastName'> | null;
+  course?: Pick<Course, 'code' | 'name'> | null;
 }
 
 export interface QueryLog {